@@ -1,6 +1,6 @@
 # accounting/admin.py
-from django.contrib import admin
-from .models import Lease, Cheque
+from django.contrib import admin, messages
+from .models import Lease, Cheque, ChequeStatusChange
 
 # This makes the cheques for a lease visible on the lease page itself
 class ChequeInline(admin.TabularInline):
@@ -16,10 +16,51 @@ class LeaseAdmin(admin.ModelAdmin):
     search_fields = ('office__office_number', 'company_name')
     # This adds the ChequeInline to the bottom of the Lease detail page
     inlines = [ChequeInline]
+    actions = ['renew']
+
+    @admin.action(description="Renew selected leases (same terms, next period)")
+    def renew(self, request, queryset):
+        # All of them in one transaction, cheques included (accounting/leases.py)
+        from .leases import renew_leases
+        renewals = renew_leases(queryset)
+        self.message_user(request, f"Renewed {len(renewals)} lease(s).", messages.SUCCESS)
 
     
+def _change_status(modeladmin, request, queryset, status):
+    # One UPDATE for the whole selection, audited (accounting/transitions.py)
+    from .transitions import ChequeTransitionError, change_cheque_statuses
+    try:
+        updated = change_cheque_statuses(queryset.values_list('pk', flat=True), status, request.user)
+    except (ChequeTransitionError, ValueError) as error:
+        details = getattr(error, 'errors', {})
+        reasons = sorted(set(details.values()))
+        modeladmin.message_user(request, f"Nothing changed: {error} {' '.join(reasons)}", messages.ERROR)
+        return
+    modeladmin.message_user(request, f"{updated} cheque(s) marked {status}.", messages.SUCCESS)
+
 @admin.register(Cheque)
 class ChequeAdmin(admin.ModelAdmin):
     list_display = ('lease', 'due_date', 'amount', 'status')
     list_filter = ('status', 'due_date')
-    search_fields = ('lease__office__office_number',)
\ No newline at end of file
+    search_fields = ('lease__office__office_number',)
+    actions = ['mark_deposited', 'mark_cleared', 'mark_bounced']
+
+    @admin.action(description="Mark selected cheques as Deposited")
+    def mark_deposited(self, request, queryset):
+        _change_status(self, request, queryset, 'Deposited')
+
+    @admin.action(description="Mark selected cheques as Cleared")
+    def mark_cleared(self, request, queryset):
+        _change_status(self, request, queryset, 'Cleared')
+
+    @admin.action(description="Mark selected cheques as Bounced")
+    def mark_bounced(self, request, queryset):
+        _change_status(self, request, queryset, 'Bounced')
+
+@admin.register(ChequeStatusChange)
+class ChequeStatusChangeAdmin(admin.ModelAdmin):
+    list_display = ('cheque', 'from_status', 'to_status', 'changed_by', 'changed_at', 'source')
+    list_filter = ('source', 'to_status')
+    search_fields = ('cheque__lease__office__office_number',)
+    # An audit trail is read-only
+    readonly_fields = ('cheque', 'from_status', 'to_status', 'changed_by', 'changed_at', 'source')
@@ -0,0 +1,118 @@
+# accounting/leases.py
+#
+# Cheque schedules for leases, and importing or renewing many leases at once.
+#
+# A lease's annual rent is paid in `number_of_cheques` cheques spread evenly over the
+# year from its start date:
+#   - up to 12 cheques fall on the start day of the month, i * 12 // n months in (4 ->
+#     every 3 months, 5 -> months 0, 2, 4, 7, 9), clamped to the end of shorter months;
+#   - more than 12 are spread by days over the year instead.
+# The rent is split in whole cents and the leftover cents go one each to the first
+# cheques, so the cheques always add up to the annual rent exactly.
+#
+# cheque_schedule() works out the cheques of any number of leases in one vectorised
+# NumPy pass. The post_save signal uses it for a single new lease; import_leases() and
+# renew_leases() use it for a whole batch, inserting the leases and then the cheques with
+# one chunked bulk_create each instead of a save (and a signal) per lease.
+
+import datetime
+from decimal import Decimal
+
+import numpy as np
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+
+from .models import Cheque, Lease
+from .summary import cheques_added, drop_dashboard_totals
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def _months_later(starts, months):
+    """Start dates plus whole months (datetime64[D] arrays), clamped like relativedelta."""
+    first_of_month = starts.astype('datetime64[M]') + months
+    days_in_month = ((first_of_month + 1).astype('datetime64[D]') - first_of_month.astype('datetime64[D]')).astype(np.int64)
+    day = (starts - starts.astype('datetime64[M]').astype('datetime64[D]')).astype(np.int64)
+    return first_of_month.astype('datetime64[D]') + np.minimum(day, days_in_month - 1)
+
+
+def cheque_schedule(leases):
+    """
+    The cheques (unsaved, status Pending) for the leases, which must already have pks.
+    Leases with no cheques get none.
+    """
+    leases = [lease for lease in leases if lease.number_of_cheques]
+    if not leases:
+        return []
+
+    counts = np.array([lease.number_of_cheques for lease in leases], dtype=np.int64)
+    cents = np.array([int(Decimal(str(lease.annual_rent)) * 100) for lease in leases], dtype=np.int64)
+    starts = np.array([lease.start_date for lease in leases], dtype='datetime64[D]')
+
+    # One entry per cheque: which lease it belongs to and its number within the lease
+    owner = np.repeat(np.arange(len(leases)), counts)
+    number = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    n, start = counts[owner], starts[owner]
+    base, leftover = cents[owner] // n, cents[owner] % n
+    amounts = base + (number < leftover)
+
+    by_month = _months_later(start, number * 12 // n)
+    year_days = (_months_later(start, np.full_like(number, 12)) - start).astype(np.int64)
+    by_day = start + number * year_days // n
+    due_dates = np.where(n <= 12, by_month, by_day)
+
+    return [
+        Cheque(lease=leases[index], due_date=due_date, amount=Decimal(amount).scaleb(-2), status='Pending')
+        for index, due_date, amount in zip(owner.tolist(), due_dates.tolist(), amounts.tolist())
+    ]
+
+
+def import_leases(leases, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Saves the (unsaved) leases and their cheques in one transaction: a chunked bulk_create
+    for the leases, then one for all the cheques. Returns the leases, now with pks.
+    """
+    leases = list(leases)
+    with transaction.atomic():
+        # The pks come back from the insert (RETURNING), which the cheques need
+        Lease.objects.bulk_create(leases, batch_size=chunk_size)
+        cheques = cheque_schedule(leases)
+        Cheque.objects.bulk_create(cheques, batch_size=chunk_size)
+        # bulk_create sends no signals: do what they would have done
+        cheques_added(cheques)
+        drop_dashboard_totals()
+    return leases
+
+
+def renewal_of(lease, rent_increase=Decimal('0')):
+    """
+    The (unsaved) lease that follows `lease`: same office, tenant and number of cheques,
+    starting the day after it ends and running for as long, at the rent raised by
+    `rent_increase` percent.
+    """
+    start = lease.end_date + datetime.timedelta(days=1)
+    term = relativedelta(start, lease.start_date)
+    rent = (Decimal(str(lease.annual_rent)) * (1 + Decimal(rent_increase) / 100)).quantize(Decimal('0.01'))
+    return Lease(
+        office_id=lease.office_id,
+        company_name=lease.company_name,
+        contact_person=lease.contact_person,
+        start_date=start,
+        end_date=start + term - datetime.timedelta(days=1),
+        annual_rent=rent,
+        number_of_cheques=lease.number_of_cheques,
+        is_active=True,
+    )
+
+
+def renew_leases(leases, rent_increase=Decimal('0'), chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Renews the leases (see renewal_of) and makes the old ones inactive, in one
+    transaction. Returns the new leases.
+    """
+    leases = list(leases)
+    with transaction.atomic():
+        renewals = import_leases([renewal_of(lease, rent_increase) for lease in leases], chunk_size)
+        Lease.objects.filter(pk__in=[lease.pk for lease in leases]).update(is_active=False)
+    return renewals
@@ -0,0 +1,59 @@
+# accounting/management/commands/mature_cheques.py
+#
+# Run it daily from cron (`manage.py mature_cheques`), or leave `manage.py mature_cheques
+# --loop` running and it wakes up itself shortly after every midnight. Either way a run
+# that finds nothing to do changes nothing.
+
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from accounting.transitions import DEFAULT_CHUNK_SIZE, mature_due_cheques, matured_cheques
+
+
+class Command(BaseCommand):
+    help = "Moves every Pending cheque whose due date has arrived to Due."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Treat this day (YYYY-MM-DD) as today.")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Cheques per UPDATE.")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the matured cheques.")
+        parser.add_argument('--loop', action='store_true', help="Keep running, once a day just after midnight.")
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            today = parse_date(options['date'])
+            if today is None:
+                raise CommandError("--date must be YYYY-MM-DD.")
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be at least 1.")
+
+        if options['dry_run']:
+            count = matured_cheques(today).count()
+            self.stdout.write(f"{count} Pending cheque(s) have matured.")
+            return
+        if not options['loop']:
+            self.run(today, options['chunk_size'])
+            return
+        try:
+            while True:
+                self.run(None, options['chunk_size'])
+                time.sleep(self.seconds_until_tomorrow())
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped.")
+
+    def run(self, today, chunk_size):
+        moved = mature_due_cheques(today, chunk_size)
+        self.stdout.write(self.style.SUCCESS(f"Moved {moved} cheque(s) from Pending to Due."))
+
+    @staticmethod
+    def seconds_until_tomorrow():
+        now = timezone.localtime()
+        tomorrow = timezone.make_aware(
+            datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time(0, 1))
+        )
+        return max((tomorrow - now).total_seconds(), 60)
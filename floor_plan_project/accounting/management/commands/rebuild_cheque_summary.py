@@ -0,0 +1,20 @@
+# accounting/management/commands/rebuild_cheque_summary.py
+
+from django.core.management.base import BaseCommand
+
+from accounting.summary import rebuild_cheque_summary
+
+
+class Command(BaseCommand):
+    help = "Recomputes the monthly cheque summary behind the cheque dashboard from the cheques table."
+
+    def handle(self, *args, **options):
+        drift = rebuild_cheque_summary()
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Cheque summary is correct."))
+            return
+        for (year, month, status), (stored, actual) in sorted(drift.items()):
+            self.stdout.write(self.style.WARNING(
+                f"  {year}-{month:02d} {status}: {stored[0]} / {stored[1]} -> {actual[0]} / {actual[1]}"
+            ))
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the summary; {len(drift)} row(s) were wrong."))
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:12
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0003_lease_company_name_lease_contact_person'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChequeStatusChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(choices=[('Pending', 'Pending'), ('Due', 'Due for Deposit'), ('Deposited', 'Deposited'), ('Cleared', 'Cleared'), ('Bounced', 'Bounced')], max_length=20)),
+                ('to_status', models.CharField(choices=[('Pending', 'Pending'), ('Due', 'Due for Deposit'), ('Deposited', 'Deposited'), ('Cleared', 'Cleared'), ('Bounced', 'Bounced')], max_length=20)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('source', models.CharField(choices=[('manual', 'Changed by a user'), ('schedule', 'Scheduled job')], default='manual', max_length=20)),
+            ],
+            options={
+                'ordering': ['-changed_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='cheque',
+            index=models.Index(fields=['status', 'due_date'], name='cheque_status_due_idx'),
+        ),
+        migrations.AddField(
+            model_name='chequestatuschange',
+            name='changed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='chequestatuschange',
+            name='cheque',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_changes', to='accounting.cheque'),
+        ),
+    ]
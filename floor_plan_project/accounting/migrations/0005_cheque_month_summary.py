@@ -0,0 +1,48 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:14
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear, Round
+
+
+def fill_summary(apps, schema_editor):
+    Cheque = apps.get_model('accounting', 'Cheque')
+    rows = (
+        Cheque.objects.annotate(year=ExtractYear('due_date'), month=ExtractMonth('due_date'))
+        .order_by().values('year', 'month', 'status')
+        .annotate(count=Count('pk'), total=Sum(Round('amount', 2)))
+    )
+    ChequeMonthSummary = apps.get_model('accounting', 'ChequeMonthSummary')
+    ChequeMonthSummary.objects.bulk_create([
+        ChequeMonthSummary(
+            year=row['year'], month=row['month'], status=row['status'], count=row['count'], amount=row['total'],
+        )
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0004_cheque_status_changes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChequeMonthSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Due', 'Due for Deposit'), ('Deposited', 'Deposited'), ('Cleared', 'Cleared'), ('Bounced', 'Bounced')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name_plural': 'cheque month summaries',
+                'ordering': ['year', 'month', 'status'],
+                'constraints': [models.UniqueConstraint(fields=('year', 'month', 'status'), name='cheque_summary_month_status')],
+            },
+        ),
+        migrations.RunPython(fill_summary, migrations.RunPython.noop),
+    ]
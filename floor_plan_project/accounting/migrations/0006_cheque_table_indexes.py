@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0005_cheque_month_summary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cheque',
+            index=models.Index(fields=['due_date', 'id'], name='cheque_due_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cheque',
+            index=models.Index(fields=['amount', 'id'], name='cheque_amount_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cheque',
+            index=models.Index(fields=['bank_name', 'due_date'], name='cheque_bank_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cheque',
+            index=models.Index(fields=['cheque_number'], name='cheque_number_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0006_cheque_table_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chequestatuschange',
+            name='source',
+            field=models.CharField(choices=[('manual', 'Changed by a user'), ('schedule', 'Scheduled job'), ('bulk', 'Bulk update')], default='manual', max_length=20),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-18 11:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0007_bulk_status_source'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountingSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('totals_version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
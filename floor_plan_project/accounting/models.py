@@ -1,12 +1,11 @@
 # accounting/models.py
 
-from django.db import models
+from django.db import models, transaction
 from offices.models import Office
 from django.contrib.auth.models import User
 from django.utils import timezone
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
-from dateutil.relativedelta import relativedelta
 
 class Lease(models.Model):
     office = models.ForeignKey(Office, on_delete=models.CASCADE, related_name="leases")
@@ -45,42 +44,146 @@ class Cheque(models.Model):
     def __str__(self):
         return f"Cheque for {self.lease.office} - {self.amount} due {self.due_date}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so the monthly summary can subtract the old values on save
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    # The monthly summary is updated by the signals below: keep it in the same
+    # transaction as the cheque row itself
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
     class Meta:
         ordering = ['due_date']
+        indexes = [
+            # The scheduled Pending -> Due pass walks (status='Pending', due_date <= today)
+            models.Index(fields=['status', 'due_date'], name='cheque_status_due_idx'),
+            # The cheque table API's keyset pages and filters (accounting/search.py)
+            models.Index(fields=['due_date', 'id'], name='cheque_due_id_idx'),
+            models.Index(fields=['amount', 'id'], name='cheque_amount_id_idx'),
+            models.Index(fields=['bank_name', 'due_date'], name='cheque_bank_due_idx'),
+            models.Index(fields=['cheque_number'], name='cheque_number_idx'),
+        ]
+
+
+class ChequeStatusChange(models.Model):
+    """Audit trail of cheque status changes: by hand, in bulk, or by the scheduled job."""
+    SOURCE_CHOICES = [
+        ('manual', 'Changed by a user'),
+        ('schedule', 'Scheduled job'),
+        ('bulk', 'Bulk update'),
+    ]
+
+    cheque = models.ForeignKey(Cheque, on_delete=models.CASCADE, related_name="status_changes")
+    from_status = models.CharField(max_length=20, choices=Cheque.STATUS_CHOICES)
+    to_status = models.CharField(max_length=20, choices=Cheque.STATUS_CHOICES)
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    changed_at = models.DateTimeField(default=timezone.now)
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default='manual')
+
+    class Meta:
+        ordering = ['-changed_at']
+
+    def __str__(self):
+        return f"Cheque {self.cheque_id}: {self.from_status} -> {self.to_status}"
+
+class ChequeMonthSummary(models.Model):
+    """
+    Running count and amount of the cheques due in one month with one status, kept up to
+    date by the signals below (see accounting/summary.py). The cheque dashboard reads these
+    rows instead of aggregating the cheques table. Rebuild with `manage.py rebuild_cheque_summary`.
+    """
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    status = models.CharField(max_length=20, choices=Cheque.STATUS_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['year', 'month', 'status']
+        constraints = [
+            models.UniqueConstraint(fields=['year', 'month', 'status'], name='cheque_summary_month_status'),
+        ]
+        verbose_name_plural = "cheque month summaries"
+
+    def __str__(self):
+        return f"{self.year}-{self.month:02d} {self.status}: {self.count} cheque(s), {self.amount}"
+
+class AccountingSyncState(models.Model):
+    """
+    A single row holding the version of the dashboard totals (year list, active-lease
+    rent) cached by accounting/summary.py. It lives in the database rather than the
+    cache so a change made by one worker reaches the cached totals of every other.
+    """
+    totals_version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Dashboard totals at version {self.totals_version}"
 
 @receiver(post_save, sender=Lease)
 def create_cheques_for_new_lease(sender, instance, created, **kwargs):
     """
     This function is automatically called by Django after a Lease is saved.
     'created' will be True if it's a brand new lease.
+
+    Leases saved in bulk (accounting/leases.py: import_leases, renew_leases) get their
+    cheques there, in one go; this covers leases created one at a time.
     """
     # We only want to run this logic ONE TIME, when the lease is first created.
     if created:
-        lease = instance
-        num_cheques = lease.number_of_cheques
-
-        # Safety check: if there are no cheques, do nothing.
-        if num_cheques == 0:
-            return
-
-        cheque_amount = lease.annual_rent / num_cheques
-        
-        # Calculate the interval between cheques (e.g., 12 months / 4 cheques = 3 months apart)
-        interval_months = 12 // num_cheques
-        
-        cheques_to_create = []
-        for i in range(num_cheques):
-            # Calculate the due date for each cheque
-            due_date = lease.start_date + relativedelta(months=i * interval_months)
-            
-            # Prepare a new Cheque object (but don't save it yet)
-            cheque = Cheque(
-                lease=lease,
-                due_date=due_date,
-                amount=cheque_amount,
-                status='Pending' # All new cheques start as Pending
-            )
-            cheques_to_create.append(cheque)
+        from .leases import cheque_schedule
+        from .summary import cheques_added
+
+        # Due dates and amounts: see accounting/leases.py
+        cheques_to_create = cheque_schedule([instance])
 
         # Save all the new cheque objects to the database in one efficient operation
-        Cheque.objects.bulk_create(cheques_to_create)
\ No newline at end of file
+        Cheque.objects.bulk_create(cheques_to_create)
+        # bulk_create sends no post_save, so count them into the monthly summary here
+        cheques_added(cheques_to_create)
+
+@receiver(post_save, sender=Cheque)
+def publish_cheque_change(sender, instance, raw=False, **kwargs):
+    from core.events import publish
+    if not raw:
+        publish('cheques', {
+            'id': instance.pk,
+            'office_number': instance.lease.office_id,
+            'status': instance.status,
+            'due_date': instance.due_date,
+            'amount': instance.amount,
+        })
+
+
+# --- MONTHLY SUMMARY ---
+# Bulk changes (the scheduled Pending -> Due pass, new leases' cheques) adjust it themselves.
+
+@receiver(pre_save, sender=Cheque)
+def remember_cheque_summary(sender, instance, **kwargs):
+    from .summary import cheque_saving
+    cheque_saving(instance)
+
+@receiver(post_save, sender=Cheque)
+def update_summary_on_cheque_save(sender, instance, created, **kwargs):
+    from .summary import cheque_saved
+    cheque_saved(instance, created)
+
+@receiver(post_delete, sender=Cheque)
+def update_summary_on_cheque_delete(sender, instance, **kwargs):
+    from .summary import cheque_deleted
+    cheque_deleted(instance)
+
+# The active-lease rent total is cached by version; any lease change may move it
+@receiver(post_save, sender=Lease)
+@receiver(post_delete, sender=Lease)
+def drop_cached_rent_total(sender, instance, **kwargs):
+    from .summary import drop_dashboard_totals
+    drop_dashboard_totals()
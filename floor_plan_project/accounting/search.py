@@ -0,0 +1,183 @@
+# accounting/search.py
+#
+# Filters and keyset pagination for the cheque table API, /accounting/api/cheques/
+# (see ChequeViewSet), which the cheque dashboard loads its table from.
+#
+#   year=2025                     status=Due (repeatable)
+#   office=<office number>        bank=<bank name, exact>
+#   due_from= / due_to=           (YYYY-MM-DD, inclusive)
+#   cheque_number=<start of the number>
+#   ordering=due_date|-due_date|amount|-amount
+#
+# Pages are keyset pages: the cursor is the (sort value, id) of the last row sent and the
+# next page starts right after it, so a page deep into ten years of cheques costs the same
+# as the first one. Each ordering has an index on (sort value, id); the status and bank
+# filters have (status, due_date) and (bank_name, due_date).
+
+import base64
+import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ParseError
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .models import Cheque
+
+STATUSES = {value for value, _ in Cheque.STATUS_CHOICES}
+
+
+class ChequeFilterError(ValueError):
+    pass
+
+
+def _int(params, name):
+    value = params.get(name, '').strip()
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ChequeFilterError(f"{name} must be a whole number.")
+
+
+def _date(params, name):
+    value = params.get(name, '').strip()
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ChequeFilterError(f"{name} must be a date (YYYY-MM-DD).")
+    return parsed
+
+
+def filter_cheques(params, cheques=None, hide_cleared=False):
+    """
+    Applies the query parameters to `cheques` (all cheques by default). hide_cleared
+    leaves out Cleared cheques when no status is asked for. Raises ChequeFilterError.
+    """
+    if cheques is None:
+        cheques = Cheque.objects.all()
+
+    statuses = [status for status in params.getlist('status') if status]
+    if statuses:
+        if not STATUSES.issuperset(statuses):
+            raise ChequeFilterError(f"status must be one of: {', '.join(sorted(STATUSES))}.")
+        cheques = cheques.filter(status__in=statuses)
+    elif hide_cleared:
+        cheques = cheques.exclude(status='Cleared')
+
+    year = _int(params, 'year')
+    if year is not None:
+        # A range rather than __year, so it stays a plain due_date range on the index
+        if not datetime.MINYEAR <= year <= datetime.MAXYEAR:
+            raise ChequeFilterError("year is out of range.")
+        cheques = cheques.filter(due_date__gte=datetime.date(year, 1, 1), due_date__lte=datetime.date(year, 12, 31))
+    office = _int(params, 'office')
+    if office is not None:
+        cheques = cheques.filter(lease__office_id=office)
+    due_from = _date(params, 'due_from')
+    if due_from is not None:
+        cheques = cheques.filter(due_date__gte=due_from)
+    due_to = _date(params, 'due_to')
+    if due_to is not None:
+        cheques = cheques.filter(due_date__lte=due_to)
+
+    bank = params.get('bank', '').strip()
+    if bank:
+        cheques = cheques.filter(bank_name=bank)
+    number = params.get('cheque_number', '').strip()
+    if number:
+        cheques = cheques.filter(cheque_number__startswith=number)
+    return cheques
+
+
+class ChequeSearchFilter(BaseFilterBackend):
+    def filter_queryset(self, request, queryset, view):
+        try:
+            return filter_cheques(request.query_params, queryset)
+        except ChequeFilterError as error:
+            raise ParseError(str(error))
+
+
+class ChequeKeysetPagination(BasePagination):
+    # ordering parameter -> (field, parse the field's value back from a cursor)
+    orderings = {
+        'due_date': ('due_date', datetime.date.fromisoformat),
+        'amount': ('amount', Decimal),
+    }
+    default_ordering = 'due_date'
+    page_size = 50
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+
+    def _ordering(self, request):
+        ordering = request.query_params.get('ordering', '').strip() or self.default_ordering
+        descending = ordering.startswith('-')
+        if ordering.lstrip('-') not in self.orderings:
+            raise ParseError(f"ordering must be one of: {', '.join(sorted(self.orderings))} (- for descending).")
+        return ordering.lstrip('-'), descending
+
+    def _page_size(self, request):
+        try:
+            size = int(request.query_params.get('page_size', self.page_size))
+        except ValueError:
+            raise ParseError("page_size must be a whole number.")
+        return max(1, min(size, self.max_page_size))
+
+    def _decode(self, cursor, parse):
+        try:
+            value, pk = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+            return parse(value), int(pk)
+        except (ValueError, InvalidOperation, UnicodeDecodeError):
+            raise ParseError("Invalid cursor.")
+
+    def _encode(self, value, pk):
+        return base64.urlsafe_b64encode(f"{value}|{pk}".encode()).decode()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        key, descending = self._ordering(request)
+        field, parse = self.orderings[key]
+        size = self._page_size(request)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            value, pk = self._decode(cursor, parse)
+            after = 'lt' if descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{field}__{after}': value}) | Q(**{field: value, f'id__{after}': pk})
+            )
+        prefix = '-' if descending else ''
+        # One extra row says whether there is a next page
+        rows = list(queryset.order_by(f'{prefix}{field}', f'{prefix}id')[:size + 1])
+
+        self.request = request
+        self.next_cursor = None
+        if len(rows) > size:
+            rows = rows[:size]
+            self.next_cursor = self._encode(getattr(rows[-1], field), rows[-1].pk)
+        return rows
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,18 @@
+# accounting/serializers.py
+
+from django.urls import reverse
+from rest_framework import serializers
+from .models import Cheque
+
+class ChequeSerializer(serializers.ModelSerializer):
+    office = serializers.IntegerField(source='lease.office_id', read_only=True)
+    last_updated_by = serializers.StringRelatedField()
+    update_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Cheque
+        fields = ['id', 'office', 'lease', 'due_date', 'amount', 'status', 'cheque_number', 'bank_name',
+                  'last_updated_by', 'last_updated_at', 'update_url']
+
+    def get_update_url(self, cheque):
+        return reverse('update-cheque-status', args=[cheque.pk])
@@ -0,0 +1,182 @@
+# accounting/summary.py
+#
+# Keeps the ChequeMonthSummary rows (count and amount per due month and status) in step
+# with the cheques, so the cheque dashboard reads a dozen small rows for a year instead
+# of aggregating the whole cheques table on every visit.
+#
+# As with the office occupancy counters (offices/occupancy.py), every change is applied
+# as a delta with F() expressions, inside the transaction that changes the cheque:
+#   - saving or deleting one cheque: the signals in accounting/models.py;
+#   - bulk changes, which send no signals: cheques_added() for bulk_create and
+#     cheques_status_changed() for status UPDATEs.
+# rebuild_cheque_summary() recomputes the table from scratch (backfills, drift repair).
+#
+# The dashboard's year list and active-lease rent total change rarely and live in the cache,
+# under a key carrying AccountingSyncState.totals_version: moving the version in the database
+# retires the cached copy in every worker, not just the one that made the change.
+
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear, Round
+
+from .models import AccountingSyncState, Cheque, ChequeMonthSummary, Lease
+
+DASHBOARD_TOTALS_KEY = 'accounting:dashboard-totals'
+DASHBOARD_TOTALS_TIMEOUT = 60 * 60
+CENT = Decimal('0.01')
+
+
+def _empty_deltas():
+    return defaultdict(lambda: [0, Decimal(0)])  # (year, month, status) -> [count, amount]
+
+
+def _add_cheque(deltas, status, due_date, amount, sign=1):
+    delta = deltas[(due_date.year, due_date.month, status)]
+    delta[0] += sign
+    # To the cent, like the amount column (SQLite keeps whatever it was given, so rebuilds round too)
+    delta[1] += sign * Decimal(str(amount or 0)).quantize(CENT, ROUND_HALF_UP)
+
+
+def apply_summary_deltas(deltas):
+    deltas = {key: value for key, value in deltas.items() if value[0] or value[1]}
+    if not deltas:
+        return
+    with transaction.atomic():
+        # Sorted, so concurrent writers lock the rows in the same order
+        for (year, month, status), (count, amount) in sorted(deltas.items()):
+            row = ChequeMonthSummary.objects.filter(year=year, month=month, status=status)
+            if row.update(count=F('count') + count, amount=F('amount') + amount):
+                continue
+            try:
+                with transaction.atomic():
+                    ChequeMonthSummary.objects.create(year=year, month=month, status=status, count=count, amount=amount)
+            except IntegrityError:
+                # Created by someone else in the meantime
+                row.update(count=F('count') + count, amount=F('amount') + amount)
+        # The year list only changes when a row appears or a year loses cheques
+        net = defaultdict(int)
+        for (year, _, _), (count, _) in deltas.items():
+            net[year] += count
+        if any(count != 0 for count in net.values()):
+            drop_dashboard_totals()
+
+
+def cheque_saving(cheque):
+    """pre_save: makes sure the cheque's old values are known before they are overwritten."""
+    fields = ('status', 'due_date', 'amount')
+    old = getattr(cheque, '_loaded_values', None) or {}
+    if cheque.pk is not None and any(field not in old for field in fields):
+        # Not loaded from the database, or loaded with .only()/.defer()
+        stored = Cheque.objects.filter(pk=cheque.pk).values(*fields).first()
+        if stored is not None:
+            cheque._loaded_values = dict(old, **stored)
+
+
+def cheque_saved(cheque, created):
+    deltas = _empty_deltas()
+    old = getattr(cheque, '_loaded_values', None) or {}
+    if not created and 'status' in old:
+        _add_cheque(deltas, old['status'], old['due_date'], old['amount'], -1)
+    _add_cheque(deltas, cheque.status, cheque.due_date, cheque.amount)
+    apply_summary_deltas(deltas)
+    cheque._loaded_values = dict(old, status=cheque.status, due_date=cheque.due_date, amount=cheque.amount)
+
+
+def cheque_deleted(cheque):
+    deltas = _empty_deltas()
+    _add_cheque(deltas, cheque.status, cheque.due_date, cheque.amount, -1)
+    apply_summary_deltas(deltas)
+
+
+def cheques_added(cheques):
+    """For cheques saved with bulk_create."""
+    deltas = _empty_deltas()
+    for cheque in cheques:
+        _add_cheque(deltas, cheque.status, cheque.due_date, cheque.amount)
+    apply_summary_deltas(deltas)
+
+
+def cheques_status_changed(rows, to_status):
+    """For a status UPDATE: `rows` are the (old status, due_date, amount) of the updated cheques."""
+    deltas = _empty_deltas()
+    for status, due_date, amount in rows:
+        if status != to_status:
+            _add_cheque(deltas, status, due_date, amount, -1)
+            _add_cheque(deltas, to_status, due_date, amount)
+    apply_summary_deltas(deltas)
+
+
+def month_summary(year):
+    """(month, status, count, amount) rows for the year, one small indexed query."""
+    return list(
+        ChequeMonthSummary.objects.filter(year=year, count__gt=0)
+        .order_by('month', 'status')
+        .values_list('month', 'status', 'count', 'amount')
+    )
+
+
+def get_dashboard_totals():
+    """{'years': years with cheques, newest first, 'active_rent': annual rent of the active leases}."""
+    version = AccountingSyncState.objects.values_list('totals_version', flat=True).first() or 0
+    cache_key = f'{DASHBOARD_TOTALS_KEY}:{version}'
+    totals = cache.get(cache_key)
+    if totals is None:
+        totals = {
+            'years': list(
+                ChequeMonthSummary.objects.filter(count__gt=0)
+                .order_by('-year').values_list('year', flat=True).distinct()
+            ),
+            'active_rent': Lease.objects.filter(is_active=True).aggregate(total=Sum('annual_rent'))['total'] or 0,
+        }
+        cache.set(cache_key, totals, DASHBOARD_TOTALS_TIMEOUT)
+    return totals
+
+
+def drop_dashboard_totals():
+    """
+    Moves the totals version. The UPDATE runs in the caller's transaction, so the new
+    version becomes visible with the change itself.
+    """
+    with transaction.atomic():
+        if not AccountingSyncState.objects.filter(pk=1).update(totals_version=F('totals_version') + 1):
+            AccountingSyncState.objects.get_or_create(pk=1)
+            AccountingSyncState.objects.filter(pk=1).update(totals_version=F('totals_version') + 1)
+
+
+def rebuild_cheque_summary():
+    """
+    Recomputes the summary from the cheques table. Returns {(year, month, status):
+    ((stored count, amount), (actual count, amount))} for every row that was wrong.
+    """
+    with transaction.atomic():
+        stored = {
+            (year, month, status): (count, amount)
+            for year, month, status, count, amount in ChequeMonthSummary.objects.select_for_update()
+            .values_list('year', 'month', 'status', 'count', 'amount')
+            if count or amount
+        }
+        actual = {
+            (year, month, status): (count, amount)
+            for year, month, status, count, amount in Cheque.objects
+            .annotate(year=ExtractYear('due_date'), month=ExtractMonth('due_date'))
+            .order_by().values('year', 'month', 'status')
+            .annotate(count=Count('pk'), total=Sum(Round('amount', 2)))
+            .values_list('year', 'month', 'status', 'count', 'total')
+        }
+        drift = {
+            key: (stored.get(key, (0, 0)), actual.get(key, (0, 0)))
+            for key in stored.keys() | actual.keys()
+            if stored.get(key, (0, 0)) != actual.get(key, (0, 0))
+        }
+        if drift:
+            ChequeMonthSummary.objects.all().delete()
+            ChequeMonthSummary.objects.bulk_create([
+                ChequeMonthSummary(year=year, month=month, status=status, count=count, amount=amount)
+                for (year, month, status), (count, amount) in actual.items()
+            ])
+        drop_dashboard_totals()
+    return drift
@@ -1,3 +1,431 @@
+import csv
+import datetime
+import gzip
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import User, Group
+from django.core.management import call_command
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from offices.models import Office
+from .models import Lease, Cheque, ChequeMonthSummary, ChequeStatusChange
+from .summary import get_dashboard_totals, month_summary, rebuild_cheque_summary
+from .leases import cheque_schedule, import_leases, renew_leases
+from .transitions import ChequeTransitionError, change_cheque_statuses, mature_due_cheques
+
+
+def changed_first(cheque_id, status):
+    """
+    Patches timezone.now(), which the transitions call between their locking read and the
+    UPDATE, so that another writer saves the cheque with `status` in between.
+    """
+    real_now, changed = timezone.now, []
+
+    def now():
+        if not changed:
+            changed.append(cheque_id)
+            cheque = Cheque.objects.get(pk=cheque_id)
+            cheque.status = status
+            cheque.save()
+        return real_now()
+    return mock.patch('accounting.transitions.timezone.now', side_effect=now)
+
+
+class ChequeMaturingTests(TestCase):
+    def setUp(self):
+        office = Office.objects.create(office_number=301, size_sqft=400.0, annual_rent=48000, status='rented')
+        # Four quarterly cheques: 2025-01-01, 04-01, 07-01, 10-01
+        self.lease = Lease.objects.create(
+            office=office, company_name="Acme", start_date=datetime.date(2025, 1, 1),
+            end_date=datetime.date(2025, 12, 31), annual_rent=48000, number_of_cheques=4,
+        )
+        self.cheques = list(self.lease.cheques.order_by('due_date'))
+
+    def statuses(self):
+        return list(self.lease.cheques.order_by('due_date').values_list('status', flat=True))
+
+    def test_moves_only_matured_pending_cheques(self):
+        Cheque.objects.filter(pk=self.cheques[0].pk).update(status='Deposited')
+        moved = mature_due_cheques(today=datetime.date(2025, 4, 1), chunk_size=1)
+        self.assertEqual(moved, 1)
+        self.assertEqual(self.statuses(), ['Deposited', 'Due', 'Pending', 'Pending'])
+
+        change = ChequeStatusChange.objects.get()
+        self.assertEqual(change.cheque_id, self.cheques[1].pk)
+        self.assertEqual((change.from_status, change.to_status, change.source), ('Pending', 'Due', 'schedule'))
+
+    def test_runs_in_chunks_and_is_idempotent(self):
+        self.assertEqual(mature_due_cheques(today=datetime.date(2025, 12, 31), chunk_size=3), 4)
+        self.assertEqual(self.statuses(), ['Due'] * 4)
+        self.assertEqual(mature_due_cheques(today=datetime.date(2025, 12, 31)), 0)
+        self.assertEqual(ChequeStatusChange.objects.count(), 4)
+
+    def test_cheque_changed_by_another_writer_is_not_recorded(self):
+        with changed_first(self.cheques[0].pk, 'Deposited'):
+            self.assertEqual(mature_due_cheques(today=datetime.date(2025, 4, 1)), 1)
+        self.assertEqual(self.statuses(), ['Deposited', 'Due', 'Pending', 'Pending'])
+        self.assertEqual(list(ChequeStatusChange.objects.filter(source='schedule').values_list('cheque_id', flat=True)), [self.cheques[1].pk])
+        self.assertEqual(rebuild_cheque_summary(), {})
+
+    def test_command(self):
+        out = StringIO()
+        call_command('mature_cheques', date='2025-07-01', dry_run=True, stdout=out)
+        self.assertIn("3 Pending cheque(s)", out.getvalue())
+        self.assertEqual(self.statuses(), ['Pending'] * 4)
+        call_command('mature_cheques', date='2025-07-01', stdout=out)
+        self.assertEqual(self.statuses(), ['Due', 'Due', 'Due', 'Pending'])
+
+    def test_manual_change_is_recorded(self):
+        user = User.objects.create_user(username='accountant', password='pass')
+        user.groups.add(Group.objects.get_or_create(name='Accountant')[0])
+        self.client.force_login(user)
+        url = reverse('update-cheque-status', args=[self.cheques[0].pk])
+        self.client.post(url, {'status': 'Deposited'})
+        self.client.post(url, {'status': 'Deposited'})
+        change = ChequeStatusChange.objects.get()
+        self.assertEqual((change.from_status, change.to_status, change.changed_by), ('Pending', 'Deposited', user))
+
+    @skipUnless(connection.vendor == 'sqlite', "query plans are checked on SQLite")
+    def test_matured_range_uses_the_index(self):
+        plan = Cheque.objects.filter(status='Pending', due_date__lte='2025-07-01').order_by('due_date', 'id').explain()
+        self.assertIn('cheque_status_due_idx', plan)
+
+
+class ChequeSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.office = Office.objects.create(office_number=302, size_sqft=400.0, annual_rent=10000, status='rented')
+        # 10000 / 3 does not divide evenly: the cheques are 3333.34, 3333.33 and 3333.33
+        self.lease = Lease.objects.create(
+            office=self.office, company_name="Acme", start_date=datetime.date(2025, 11, 1),
+            end_date=datetime.date(2026, 10, 31), annual_rent=10000, number_of_cheques=3,
+        )
+
+    def assertSummaryCorrect(self):
+        self.assertEqual(rebuild_cheque_summary(), {})
+
+    def test_follows_cheque_changes(self):
+        self.assertSummaryCorrect()
+        self.assertEqual(get_dashboard_totals()['years'], [2026, 2025])
+
+        cheque = self.lease.cheques.order_by('due_date').first()
+        cheque.status = 'Deposited'
+        cheque.save()
+        cheque = Cheque.objects.only('pk').get(pk=cheque.pk)
+        cheque.status = 'Cleared'
+        cheque.due_date = datetime.date(2025, 12, 15)
+        cheque.save()
+        self.assertEqual(month_summary(2025), [(12, 'Cleared', 1, Decimal('3333.34'))])
+        self.assertSummaryCorrect()
+
+        mature_due_cheques(today=datetime.date(2026, 12, 31))
+        self.assertSummaryCorrect()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cheque.delete()
+        self.assertSummaryCorrect()
+        self.assertEqual(get_dashboard_totals()['years'], [2026])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lease.delete()
+        self.assertFalse(ChequeMonthSummary.objects.filter(count__gt=0).exists())
+        self.assertSummaryCorrect()
+
+    def test_rebuild_repairs_drift(self):
+        ChequeMonthSummary.objects.update(count=0)
+        drift = rebuild_cheque_summary()
+        self.assertEqual(len(drift), 3)
+        self.assertSummaryCorrect()
+
+    def test_rent_total_is_cached_until_a_lease_changes(self):
+        self.assertEqual(get_dashboard_totals()['active_rent'], 10000)
+        # Only the version is read
+        with self.assertNumQueries(1):
+            get_dashboard_totals()
+        # Made by another worker: nothing is dropped from this process's cache
+        with mock.patch.object(cache, 'delete'), mock.patch.object(cache, 'delete_many'):
+            Lease.objects.filter(pk=self.lease.pk).get().delete()
+        self.assertEqual(get_dashboard_totals()['active_rent'], 0)
+
+    def test_dashboard_reads_the_summary(self):
+        user = User.objects.create_user(username='accountant', password='pass')
+        user.groups.add(Group.objects.get_or_create(name='Accountant')[0])
+        self.client.force_login(user)
+        url = reverse('cheque-dashboard') + '?year=2026'
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['status_data_json'], '{"Pending": 2}')
+        self.assertEqual(response.context['upcoming_cashflow'], Decimal('6666.66'))
+        self.assertEqual(response.context['cashflow_labels_json'], '["Mar 2026", "Jul 2026"]')
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('SUM(', sql.upper())
+
+
+class ChequeReportTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='accountant', password='pass')
+        user.groups.add(Group.objects.get_or_create(name='Accountant')[0])
+        self.client.force_login(user)
+        for number, start in [(401, datetime.date(2025, 1, 1)), (402, datetime.date(2026, 1, 1))]:
+            office = Office.objects.create(office_number=number, size_sqft=400.0, annual_rent=40000, status='rented')
+            Lease.objects.create(
+                office=office, company_name=f"Tenant {number}", start_date=start,
+                end_date=start.replace(month=12, day=31), annual_rent=40000, number_of_cheques=4,
+            )
+        Cheque.objects.filter(due_date=datetime.date(2025, 1, 1)).update(status='Cleared')
+
+    def report(self, **params):
+        response = self.client.get(reverse('download-report'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content)
+        if params.get('gzip') == '1':
+            content = gzip.decompress(content)
+        rows = list(csv.reader(content.decode().splitlines()))
+        self.assertEqual(rows[0][0], 'Office')
+        return rows[1:]
+
+    def test_default_leaves_out_cleared_cheques(self):
+        rows = self.report()
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(rows[0][:5], ['Office 401', str(Lease.objects.get(office_id=401).pk), '2025-04-01', '10000.00', 'Pending'])
+
+    def test_filters(self):
+        self.assertEqual(len(self.report(year='2026')), 4)
+        self.assertEqual(len(self.report(office='402', due_to='2026-06-30')), 2)
+        self.assertEqual([row[2] for row in self.report(status='Cleared')], ['2025-01-01'])
+        self.assertEqual(len(self.report(due_from='2025-06-01', due_to='2026-03-31', status=['Pending', 'Cleared'])), 3)
+
+    def test_gzip(self):
+        response = self.client.get(reverse('download-report'), {'gzip': '1'})
+        self.assertIn('cheques_report.csv.gz', response['Content-Disposition'])
+        self.assertEqual(len(self.report(gzip='1', year='2025')), 3)
+
+    async def test_streams_under_asgi(self):
+        # A sync generator would be read whole before the first byte under ASGI
+        await self.async_client.aforce_login(await User.objects.aget(username='accountant'))
+        response = await self.async_client.get(reverse('download-report'), {'year': '2026'})
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(content.decode().splitlines()), 5)
+
+    def test_bad_filters_are_rejected(self):
+        for params in ({'year': 'last'}, {'due_from': '2025-13-01'}, {'status': 'Lost'}):
+            self.assertEqual(self.client.get(reverse('download-report'), params).status_code, 400)
+
+
+class ChequeApiTests(TestCase):
+    url = '/accounting/api/cheques/'
+
+    def setUp(self):
+        user = User.objects.create_user(username='accountant', password='pass')
+        user.groups.add(Group.objects.get_or_create(name='Accountant')[0])
+        self.client.force_login(user)
+        for number in (501, 502, 503):
+            office = Office.objects.create(office_number=number, size_sqft=400.0, annual_rent=12000 * number, status='rented')
+            # Twelve monthly cheques each, all three leases due on the same days
+            Lease.objects.create(
+                office=office, company_name=f"Tenant {number}", start_date=datetime.date(2025, 1, 1),
+                end_date=datetime.date(2025, 12, 31), annual_rent=12000 * number, number_of_cheques=12,
+            )
+        for cheque in Cheque.objects.filter(lease__office_id=502):
+            cheque.bank_name = 'Emirates NBD'
+            cheque.cheque_number = f"00{cheque.due_date.month:02d}"
+            cheque.save()
+
+    def rows(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_keyset_pages_cover_every_cheque_once_in_order(self):
+        for ordering, key in [('due_date', lambda c: (c['due_date'], c['id'])),
+                              ('-amount', lambda c: (-Decimal(c['amount']), -c['id']))]:
+            seen, url, params = [], self.url, {'page_size': 5, 'ordering': ordering}
+            while url:
+                data = self.client.get(url, params).json()
+                seen.extend(data['results'])
+                url, params = data['next'], None
+            self.assertEqual(len(seen), 36)
+            self.assertEqual(seen, sorted(seen, key=key))
+
+    def test_filters_and_search(self):
+        self.assertEqual({c['office'] for c in self.rows(bank='Emirates NBD')['results']}, {502})
+        self.assertEqual(len(self.rows(office=501, year=2025, status='Pending')['results']), 12)
+        self.assertEqual(self.rows(year=2024)['results'], [])
+        found = self.rows(cheque_number='001')['results']
+        self.assertEqual(sorted(c['cheque_number'] for c in found), ['0010', '0011', '0012'])
+        self.assertEqual(found[0]['update_url'], reverse('update-cheque-status', args=[found[0]['id']]))
+        for params in ({'status': 'Lost'}, {'ordering': 'bank_name'}, {'cursor': 'nonsense'}):
+            self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+    def test_only_accounting_staff(self):
+        self.client.force_login(User.objects.create_user(username='frontdesk', password='pass'))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_dashboard_no_longer_renders_the_rows(self):
+        response = self.client.get(reverse('cheque-dashboard'), {'year': 2025})
+        self.assertContains(response, 'id="cheque-rows"')
+        self.assertNotContains(response, reverse('update-cheque-status', args=[Cheque.objects.first().pk]))
+
+    @skipUnless(connection.vendor == 'sqlite', "query plans are checked on SQLite")
+    def test_pages_use_the_indexes(self):
+        plan = Cheque.objects.filter(due_date__gt='2025-03-01').order_by('due_date', 'id').explain()
+        self.assertIn('cheque_due_id_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+        plan = Cheque.objects.filter(bank_name='Emirates NBD', due_date__gte='2025-01-01').explain()
+        self.assertIn('cheque_bank_due_idx', plan)
+        plan = Cheque.objects.filter(cheque_number='0010').explain()
+        self.assertIn('cheque_number_idx', plan)
+
+
+class BulkChequeStatusTests(TestCase):
+    url = '/accounting/api/cheques/bulk-status/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='accountant', password='pass')
+        self.user.groups.add(Group.objects.get_or_create(name='Accountant')[0])
+        self.client.force_login(self.user)
+        office = Office.objects.create(office_number=601, size_sqft=400.0, annual_rent=12000, status='rented')
+        self.lease = Lease.objects.create(
+            office=office, company_name="Acme", start_date=datetime.date(2025, 1, 1),
+            end_date=datetime.date(2025, 12, 31), annual_rent=12000, number_of_cheques=12,
+        )
+        self.ids = list(self.lease.cheques.order_by('due_date').values_list('id', flat=True))
+
+    def post(self, ids, status):
+        return self.client.post(self.url, {'ids': ids, 'status': status}, content_type='application/json')
+
+    def test_moves_the_batch_in_one_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post(self.ids[:6], 'Deposited')
+        self.assertEqual(response.json(), {'updated': 6, 'status': 'Deposited'})
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "accounting_cheque"')]
+        self.assertEqual(len(updates), 1)
+
+        deposited = Cheque.objects.filter(status='Deposited')
+        self.assertEqual(sorted(deposited.values_list('id', flat=True)), self.ids[:6])
+        self.assertEqual(set(deposited.values_list('last_updated_by', flat=True)), {self.user.pk})
+        changes = ChequeStatusChange.objects.filter(source='bulk')
+        self.assertEqual(changes.count(), 6)
+        self.assertEqual(set(changes.values_list('from_status', 'to_status', 'changed_by')), {('Pending', 'Deposited', self.user.pk)})
+        self.assertEqual(rebuild_cheque_summary(), {})
+
+        # Cheques already there count as done, not as errors
+        self.assertEqual(self.post(self.ids[:7], 'Deposited').json()['updated'], 1)
+
+    def test_only_cheques_that_moved_are_recorded(self):
+        # Another writer deposits the first cheque between our read and our UPDATE
+        with changed_first(self.ids[0], 'Deposited'):
+            self.assertEqual(change_cheque_statuses(self.ids[:3], 'Due', self.user), 2)
+        self.assertEqual(Cheque.objects.get(pk=self.ids[0]).status, 'Deposited')
+        changes = ChequeStatusChange.objects.filter(source='bulk')
+        self.assertEqual(sorted(changes.values_list('cheque_id', flat=True)), self.ids[1:3])
+        self.assertEqual(rebuild_cheque_summary(), {})
+
+    def test_refuses_the_whole_batch_on_a_bad_transition(self):
+        change_cheque_statuses(self.ids[:1], 'Deposited', self.user)
+        change_cheque_statuses(self.ids[:1], 'Cleared', self.user)
+        response = self.post(self.ids[:3] + [999999], 'Pending')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()['errors']), {str(self.ids[0]), '999999'})
+        self.assertFalse(Cheque.objects.filter(id__in=self.ids[1:3]).exclude(status='Pending').exists())
+        with self.assertRaises(ChequeTransitionError):
+            change_cheque_statuses(self.ids[:1], 'Bounced')
+
+        for ids, status in ([], 'Deposited'), ('1,2', 'Deposited'), (self.ids[:1], 'Lost'):
+            self.assertEqual(self.post(ids, status).status_code, 400)
+
+    def test_admin_action(self):
+        self.user.is_staff = self.user.is_superuser = True
+        self.user.save()
+        response = self.client.post(reverse('admin:accounting_cheque_changelist'), {
+            'action': 'mark_deposited', '_selected_action': self.ids[:4],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Cheque.objects.filter(status='Deposited').count(), 4)
+        self.assertEqual(ChequeStatusChange.objects.filter(source='bulk', changed_by=self.user).count(), 4)
+
+
+class LeaseBatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.offices = [
+            Office.objects.create(office_number=number, size_sqft=400.0, annual_rent=40000, status='rented')
+            for number in range(701, 711)
+        ]
+
+    def lease(self, office, count, rent='40000', start=datetime.date(2025, 1, 31)):
+        return Lease(office=office, company_name=f"Tenant {office.pk}", start_date=start,
+                     end_date=start + datetime.timedelta(days=364), annual_rent=Decimal(rent), number_of_cheques=count)
+
+    def schedule(self, count, rent='40000', start=datetime.date(2025, 1, 31)):
+        lease = self.lease(self.offices[0], count, rent, start)
+        return [(cheque.due_date, cheque.amount) for cheque in cheque_schedule([lease])]
+
+    def test_schedule(self):
+        quarterly = self.schedule(4, start=datetime.date(2025, 1, 1))
+        self.assertEqual([due for due, _ in quarterly],
+                         [datetime.date(2025, 1, 1), datetime.date(2025, 4, 1), datetime.date(2025, 7, 1), datetime.date(2025, 10, 1)])
+        self.assertEqual({amount for _, amount in quarterly}, {Decimal('10000.00')})
+
+        # 5 does not divide 12, and the 31st does not exist in every month
+        five = self.schedule(5, rent='10000.01')
+        self.assertEqual([due for due, _ in five], [datetime.date(2025, 1, 31), datetime.date(2025, 3, 31),
+                                                   datetime.date(2025, 5, 31), datetime.date(2025, 8, 31),
+                                                   datetime.date(2025, 10, 31)])
+        self.assertEqual([amount for _, amount in five], [Decimal('2000.01')] + [Decimal('2000.00')] * 4)
+        self.assertEqual([due for due, _ in self.schedule(12)][1:3], [datetime.date(2025, 2, 28), datetime.date(2025, 3, 31)])
+
+        # More cheques than months: spread by days, all within the year and all different
+        weekly = self.schedule(52, rent='1000')
+        dates = [due for due, _ in weekly]
+        self.assertEqual(len(set(dates)), 52)
+        self.assertLess(dates[-1], datetime.date(2026, 1, 31))
+        self.assertEqual(sum(amount for _, amount in weekly), Decimal('1000'))
+        self.assertEqual(self.schedule(0), [])
+
+    def test_single_create_uses_the_same_schedule(self):
+        lease = self.lease(self.offices[0], 5, rent='10000.01')
+        lease.save()
+        self.assertEqual(list(lease.cheques.order_by('due_date').values_list('due_date', 'amount')), self.schedule(5, rent='10000.01'))
+
+    def test_import_is_two_bulk_inserts(self):
+        leases = [self.lease(office, count) for office, count in zip(self.offices, [1, 2, 3, 4, 5, 6, 7, 12, 24, 4])]
+        with CaptureQueriesContext(connection) as queries:
+            import_leases(leases, chunk_size=4)
+        inserts = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('INSERT')]
+        lease_inserts = [sql for sql in inserts if 'accounting_lease' in sql]
+        cheque_inserts = [sql for sql in inserts if '"accounting_cheque"' in sql]
+        self.assertEqual(len(lease_inserts), 3)  # 10 leases in chunks of 4
+        self.assertEqual(len(cheque_inserts), 17)  # 68 cheques in chunks of 4
+        self.assertEqual(Cheque.objects.count(), 68)
+        for lease in leases:
+            self.assertEqual(lease.cheques.count(), lease.number_of_cheques)
+            self.assertEqual(sum(lease.cheques.values_list('amount', flat=True)), Decimal('40000'))
+        self.assertEqual(rebuild_cheque_summary(), {})
+        self.assertEqual(get_dashboard_totals()['active_rent'], Decimal('400000'))
 
-# Create your tests here.
+    def test_renew(self):
+        old = import_leases([self.lease(office, 4, start=datetime.date(2025, 1, 1)) for office in self.offices[:3]])
+        with self.captureOnCommitCallbacks(execute=True):
+            get_dashboard_totals()
+            renewals = renew_leases(Lease.objects.filter(pk__in=[lease.pk for lease in old]), rent_increase=Decimal('5'))
+        self.assertEqual(len(renewals), 3)
+        renewal = Lease.objects.get(pk=renewals[0].pk)
+        self.assertEqual((renewal.start_date, renewal.end_date), (datetime.date(2026, 1, 1), datetime.date(2026, 12, 31)))
+        self.assertEqual(renewal.annual_rent, Decimal('42000.00'))
+        self.assertEqual(renewal.cheques.count(), 4)
+        self.assertEqual(Lease.objects.filter(is_active=True).count(), 3)
+        self.assertFalse(Lease.objects.filter(pk__in=[lease.pk for lease in old], is_active=True).exists())
+        self.assertEqual(get_dashboard_totals()['active_rent'], Decimal('126000'))
+        self.assertEqual(rebuild_cheque_summary(), {})
@@ -0,0 +1,144 @@
+# accounting/transitions.py
+#
+# Cheque status changes in bulk, as set-based UPDATEs with their audit rows
+# (ChequeStatusChange) written by bulk_create:
+#   - mature_due_cheques(): the scheduled Pending -> Due pass;
+#   - change_cheque_statuses(): a batch of cheques picked by hand (a deposit day), from the
+#     bulk-status API and the admin actions.
+#
+# A cheque whose due date has arrived is due for deposit. Matured cheques are moved a
+# chunk at a time, each chunk in its own short transaction: the ids come off the
+# (status, due_date) index, one UPDATE moves them, one bulk_create records the
+# transitions. Moved cheques leave the index range, so the next chunk starts where the
+# last one ended and the whole job is one pass over the range. Running it again (or
+# twice at once) finds nothing left to move.
+#
+# Both lock the rows they change first, and each UPDATE only matches a row still in the
+# status it was read with. A cheque another writer changed in between is left alone, and
+# only the cheques that really moved get an audit row and a move in the monthly summary
+# (accounting/summary.py).
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.events import publish
+from .models import Cheque, ChequeStatusChange
+from .summary import cheques_status_changed
+
+DEFAULT_CHUNK_SIZE = 5000
+# Most cheques one change_cheque_statuses() call takes (keeps the id IN (...) list sane)
+MAX_BATCH = 1000
+
+# Where each status may go in a bulk change. Undoing a mistake (say Deposited back to Due)
+# is allowed; a Cleared cheque is final.
+ALLOWED_TRANSITIONS = {
+    'Pending': {'Due', 'Deposited'},
+    'Due': {'Pending', 'Deposited'},
+    'Deposited': {'Due', 'Cleared', 'Bounced'},
+    'Bounced': {'Due', 'Deposited'},
+    'Cleared': set(),
+}
+
+
+class ChequeTransitionError(ValueError):
+    """The batch was refused; `errors` maps cheque ids to the reason."""
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} cheque(s) cannot be changed.")
+        self.errors = errors
+
+
+def _move_rows(rows, to_status, **changes):
+    """
+    Moves the (id, status, due_date, amount) rows to `to_status` with one UPDATE per
+    status they were read with, and returns the rows that actually moved.
+    """
+    by_status = defaultdict(list)
+    for row in rows:
+        by_status[row[1]].append(row)
+    moved = []
+    for from_status, group in by_status.items():
+        ids = [row[0] for row in group]
+        count = Cheque.objects.filter(id__in=ids, status=from_status).update(status=to_status, **changes)
+        if count < len(group):
+            # Someone else got to some of them first: ours are the ones carrying our timestamp
+            ours = set(Cheque.objects.filter(
+                id__in=ids, status=to_status, last_updated_at=changes['last_updated_at'],
+            ).values_list('id', flat=True))
+            group = [row for row in group if row[0] in ours]
+        moved.extend(group)
+    return moved
+
+
+def matured_cheques(today=None):
+    today = today or timezone.localdate()
+    return Cheque.objects.filter(status='Pending', due_date__lte=today)
+
+
+def mature_due_cheques(today=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Moves every Pending cheque due on or before `today` to Due. Returns how many moved."""
+    today = today or timezone.localdate()
+    moved = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                matured_cheques(today).select_for_update().order_by('due_date', 'id')
+                .values_list('id', 'status', 'due_date', 'amount')[:chunk_size]
+            )
+            if not rows:
+                break
+            now = timezone.now()
+            matured = _move_rows(rows, 'Due', last_updated_at=now, last_updated_by=None)
+            # An UPDATE sends no signals: move the chunk in the monthly summary here
+            cheques_status_changed(((status, due_date, amount) for _, status, due_date, amount in matured), 'Due')
+            ChequeStatusChange.objects.bulk_create([
+                ChequeStatusChange(cheque_id=row[0], from_status='Pending', to_status='Due', changed_at=now, source='schedule')
+                for row in matured
+            ])
+            publish('cheques', {'status': 'Due', 'matured': len(matured), 'due_on_or_before': today})
+        moved += len(matured)
+        if len(rows) < chunk_size:
+            break
+    return moved
+
+
+def change_cheque_statuses(ids, to_status, user=None):
+    """
+    Moves the cheques to `to_status` (one UPDATE per status they are in now) and returns
+    how many changed. Cheques already there are left alone. All or nothing: if any cheque
+    is missing or may not make the move, nothing changes and ChequeTransitionError says
+    which and why.
+    """
+    ids = set(ids)
+    if to_status not in ALLOWED_TRANSITIONS:
+        raise ValueError(f"Unknown cheque status: {to_status}")
+    if len(ids) > MAX_BATCH:
+        raise ValueError(f"At most {MAX_BATCH} cheques can be changed at once.")
+
+    with transaction.atomic():
+        rows = list(
+            Cheque.objects.select_for_update().filter(id__in=ids)
+            .values_list('id', 'status', 'due_date', 'amount')
+        )
+        errors = {cheque_id: "No such cheque." for cheque_id in ids - {row[0] for row in rows}}
+        for cheque_id, status, _, _ in rows:
+            if status != to_status and to_status not in ALLOWED_TRANSITIONS[status]:
+                errors[cheque_id] = f"A {status} cheque cannot become {to_status}."
+        if errors:
+            raise ChequeTransitionError(errors)
+
+        rows = [row for row in rows if row[1] != to_status]
+        if not rows:
+            return 0
+        now = timezone.now()
+        rows = _move_rows(rows, to_status, last_updated_at=now, last_updated_by=user)
+        cheques_status_changed(((status, due_date, amount) for _, status, due_date, amount in rows), to_status)
+        ChequeStatusChange.objects.bulk_create([
+            ChequeStatusChange(cheque_id=cheque_id, from_status=status, to_status=to_status,
+                               changed_by=user, changed_at=now, source='bulk')
+            for cheque_id, status, _, _ in rows
+        ])
+        publish('cheques', {'status': to_status, 'ids': sorted(row[0] for row in rows)})
+    return len(rows)
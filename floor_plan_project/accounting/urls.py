@@ -1,5 +1,9 @@
-from django.urls import path
-from .views import ChequeDashboardView, update_cheque_status, download_report
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import ChequeDashboardView, ChequeViewSet, update_cheque_status, download_report
+
+router = DefaultRouter()
+router.register(r'cheques', ChequeViewSet, basename='cheque')
 
 urlpatterns = [
     # The URL /accounting/ will go to the ChequeDashboardView
@@ -7,4 +11,6 @@ urlpatterns = [
     # e.g., /accounting/cheque/5/update/ will go to the update status view for cheque #5
     path('cheque/<int:pk>/update/', update_cheque_status, name='update-cheque-status'),
     path('download-report/', download_report, name='download-report'),
-]
\ No newline at end of file
+    # The dashboard's cheque table loads from /accounting/api/cheques/
+    path('api/', include(router.urls)),
+]
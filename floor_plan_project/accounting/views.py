@@ -1,16 +1,28 @@
 # accounting/views.py
 
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.views import View
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.decorators import login_required, user_passes_test
-from .models import Cheque
+from .models import Cheque, ChequeStatusChange
 from django.utils import timezone
 from dateutil.relativedelta import relativedelta
+from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import BasePermission
+from rest_framework.response import Response
+from core.roles import has_role
+from .serializers import ChequeSerializer
+from .search import ChequeSearchFilter, ChequeKeysetPagination
 
 # This is a helper function to check permissions
 def is_accountant_or_manager(user):
-    return user.is_superuser or user.groups.filter(name__iregex=r'^(Accountant|Manager)$').exists()
+    return has_role(user, 'Accountant', 'Manager')
+
+class IsAccountantOrManager(BasePermission):
+    def has_permission(self, request, view):
+        return is_accountant_or_manager(request.user)
 
 
 
@@ -24,9 +36,14 @@ def update_cheque_status(request, pk):
         new_status = request.POST.get('status')
         # Check that the submitted status is a valid choice
         if new_status in [choice[0] for choice in Cheque.STATUS_CHOICES]:
+            old_status = cheque.status
             cheque.status = new_status
             cheque.last_updated_by = request.user
             cheque.save()
+            if new_status != old_status:
+                ChequeStatusChange.objects.create(
+                    cheque=cheque, from_status=old_status, to_status=new_status, changed_by=request.user,
+                )
             
     return redirect('cheque-dashboard')
 
@@ -38,19 +55,20 @@ class ChequeDashboardView(LoginRequiredMixin, UserPassesTestMixin, View):
         return redirect('dashboard')
     
     def get(self, request):
-        from django.db.models import Sum, Count
-        from django.db.models.functions import TruncMonth, ExtractYear
-        from .models import Lease
-        from offices.models import Office
+        from .summary import get_dashboard_totals, month_summary
+        from offices.occupancy import get_office_occupancy
+        import datetime
         import json
         from django.core.serializers.json import DjangoJSONEncoder
 
+        # The metrics and charts come from the monthly cheque summary (accounting/summary.py)
+        # and the occupancy counters, never from aggregating the cheques table itself.
+        # The year list and the active-lease rent total are cached.
+        totals = get_dashboard_totals()
+
         # --- YEAR FILTER PREPARATION ---
-        # 1. Get all available years from the cheques
-        # values_list returns a list of tuples, flat=True makes it a list of values
-        available_years = Cheque.objects.annotate(
-            year=ExtractYear('due_date')
-        ).values_list('year', flat=True).distinct().order_by('-year')
+        # 1. All years that have cheques, newest first
+        available_years = totals['years']
         
         # 2. Determine selected year
         current_year = timezone.now().year
@@ -66,41 +84,28 @@ class ChequeDashboardView(LoginRequiredMixin, UserPassesTestMixin, View):
         if not available_years:
             available_years = [current_year]
 
-        # --- FILTERED QUERIES ---
-        # Base Query: All cheques for the selected year
-        cheques_for_year = Cheque.objects.filter(
-            due_date__year=selected_year
-        )
-
-        # 1. Active/Detailed List for the Table
-        # We show ALL cheques for that year so the accountant can see history (Cleared/Bounced) too.
-        # Ordered by due_date.
-        detailed_cheques = cheques_for_year.select_related(
-            'lease__office', 
-            'last_updated_by'
-        ).order_by('due_date')
+        # The detailed cheque list is not rendered here: the page loads it a page at a
+        # time from /accounting/api/cheques/ (ChequeViewSet below)
 
         # --- DASHBOARD METRICS (Scoped to Selected Year) ---
+        # One query: (month, status, count, amount) for every month of the year with cheques
+        summary = month_summary(selected_year)
 
         # 1. Total Rented Value (This remains ALL active leases regardless of year, 
         # as it's a current state metric, not historical)
-        total_rented_value = Lease.objects.filter(is_active=True).aggregate(
-            total=Sum('annual_rent')
-        )['total'] or 0
+        total_rented_value = totals['active_rent']
 
         # 2. Cash Flow for Selected Year (Sum of Pending & Due for that year)
-        # Note: If looking at a past year, this might be 0 if everything is cleared.
-        # This metric might change meaning slightly: "Amount Outstanding for [Year]" vs "Total Flow for [Year]"
         # Let's keep it as "Pending + Due" to see what's left to collect for that year.
-        upcoming_cashflow = cheques_for_year.filter(
-            status__in=['Pending', 'Due']
-        ).aggregate(
-            total=Sum('amount')
-        )['total'] or 0
+        upcoming_cashflow = sum(
+            amount for _, status, _, amount in summary if status in ('Pending', 'Due')
+        )
 
         # 3. Occupancy Rate (Current state, not historical)
-        total_offices = Office.objects.count()
-        rented_offices = Office.objects.filter(status='rented').count()
+        # Read from the occupancy counters row (offices/occupancy.py), not by counting offices
+        occupancy = get_office_occupancy()
+        total_offices = occupancy['total_count']
+        rented_offices = occupancy['rented_count']
         if total_offices > 0:
             occupancy_rate = (rented_offices / total_offices) * 100
         else:
@@ -109,30 +114,23 @@ class ChequeDashboardView(LoginRequiredMixin, UserPassesTestMixin, View):
         # --- CHARTS DATA PREPARATION ---
 
         # A. Status Distribution (Pie Chart) for Selected Year
-        status_counts = cheques_for_year.values('status').annotate(count=Count('status'))
-        status_data = {item['status']: item['count'] for item in status_counts}
-        
-        # B. Monthly Cash Flow (Bar Chart) for Selected Year
-        monthly_cashflow = cheques_for_year.annotate(
-            month=TruncMonth('due_date')
-        ).values('month').annotate(
-            total=Sum('amount')
-        ).order_by('month')
+        status_data = {}
+        # B. Monthly Cash Flow (Bar Chart) for Selected Year, months with cheques only
+        monthly_cashflow = {}
+        for month, status, count, amount in summary:
+            status_data[status] = status_data.get(status, 0) + count
+            monthly_cashflow[month] = monthly_cashflow.get(month, 0) + amount
 
         # Format for Chart.js: labels (Month YYYY) and data (amounts)
         cashflow_labels = []
         cashflow_data = []
-        
-        # We want to show all months of the selected year potentially, or just months with data?
-        # Usually easier to just show months with data or fill gaps. 
-        # For simplicity, we stick to existing logic: iterating the query result.
-        for entry in monthly_cashflow:
-            if entry['month']:
-                cashflow_labels.append(entry['month'].strftime('%b %Y'))
-                cashflow_data.append(float(entry['total']))
+        for month, total in sorted(monthly_cashflow.items()):
+            cashflow_labels.append(datetime.date(selected_year, month, 1).strftime('%b %Y'))
+            cashflow_data.append(float(total))
         
         context = {
-            'active_cheques': detailed_cheques, # Renaming variable in template might be clearer, but keeping 'active_cheques' for min diff
+            'cheque_api_url': reverse('cheque-list'),
+            'status_choices': Cheque.STATUS_CHOICES,
             'total_rented_value': total_rented_value,
             'upcoming_cashflow': upcoming_cashflow,
             'occupancy_rate': round(occupancy_rate, 1),
@@ -148,34 +146,65 @@ class ChequeDashboardView(LoginRequiredMixin, UserPassesTestMixin, View):
         }
         return render(request, 'accounting/cheque_dashboard.html', context)
 
-import csv
-from django.http import HttpResponse
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 
 @login_required
 @user_passes_test(is_accountant_or_manager)
 def download_report(request):
-    # Create the HttpResponse object with the appropriate CSV header.
-    response = HttpResponse(
+    # Streamed, with optional filters and gzip: see accounting/export.py
+    from core.streaming import streaming_content
+    from .export import csv_chunks, gzip_chunks
+    from .search import ChequeFilterError, filter_cheques
+
+    try:
+        cheques = filter_cheques(request.GET, hide_cleared=True)
+    except ChequeFilterError as error:
+        return HttpResponseBadRequest(str(error))
+
+    chunks = csv_chunks(cheques)
+    if request.GET.get('gzip') == '1':
+        return StreamingHttpResponse(
+            streaming_content(request, gzip_chunks(chunks)),
+            content_type='application/gzip',
+            headers={'Content-Disposition': 'attachment; filename="cheques_report.csv.gz"'},
+        )
+    return StreamingHttpResponse(
+        streaming_content(request, chunks),
         content_type='text/csv',
         headers={'Content-Disposition': 'attachment; filename="cheques_report.csv"'},
     )
 
-    writer = csv.writer(response)
-    # Write the header row
-    writer.writerow(['Office', 'Lease ID', 'Due Date', 'Amount', 'Status', 'Cheque Number', 'Bank Name'])
-
-    # Get the data (same query as the dashboard)
-    cheques = Cheque.objects.exclude(status='Cleared').select_related('lease__office').order_by('due_date')
-
-    for cheque in cheques:
-        writer.writerow([
-            str(cheque.lease.office),
-            cheque.lease.id,
-            cheque.due_date,
-            cheque.amount,
-            cheque.status,
-            cheque.cheque_number,
-            cheque.bank_name
-        ])
-
-    return response
\ No newline at end of file
+
+# --- API VIEWS FOR THE ACCOUNTING APP ---
+
+class ChequeViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    The cheque dashboard's table: filtered, sorted and keyset-paginated cheques
+    (parameters: see accounting/search.py).
+    """
+    queryset = Cheque.objects.select_related('lease', 'last_updated_by')
+    serializer_class = ChequeSerializer
+    permission_classes = [IsAccountantOrManager]
+    filter_backends = [ChequeSearchFilter]
+    pagination_class = ChequeKeysetPagination
+
+    @action(detail=False, methods=['post'], url_path='bulk-status', filter_backends=[], pagination_class=None)
+    def bulk_status(self, request):
+        """
+        POST {"ids": [...], "status": "Deposited"}: moves every listed cheque in one go
+        (accounting/transitions.py). All or nothing; a refused batch lists the reasons.
+        """
+        from .transitions import ChequeTransitionError, change_cheque_statuses
+
+        ids, status = request.data.get('ids'), request.data.get('status')
+        if not isinstance(ids, list) or not ids or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids):
+            return Response({'error': 'ids must be a non-empty list of cheque ids.'}, status=400)
+        if status not in [choice[0] for choice in Cheque.STATUS_CHOICES]:
+            return Response({'error': 'status must be a cheque status.'}, status=400)
+        try:
+            updated = change_cheque_statuses(ids, status, request.user)
+        except ChequeTransitionError as error:
+            return Response({'error': str(error), 'errors': error.errors}, status=400)
+        except ValueError as error:
+            return Response({'error': str(error)}, status=400)
+        return Response({'updated': updated, 'status': status})
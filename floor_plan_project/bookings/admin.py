@@ -1,6 +1,6 @@
 # bookings/admin.py
 from django.contrib import admin
-from .models import MeetingRoom, Booking
+from .models import MeetingRoom, Booking, RecurrenceRule, RecurrenceException
 
 @admin.register(MeetingRoom)
 class MeetingRoomAdmin(admin.ModelAdmin):
@@ -10,4 +10,16 @@ class MeetingRoomAdmin(admin.ModelAdmin):
 class BookingAdmin(admin.ModelAdmin):
     list_display = ('title', 'meeting_room', 'start_time', 'end_time', 'booked_by')
     list_filter = ('meeting_room', 'start_time')
-    search_fields = ('title', 'booked_by__username')
\ No newline at end of file
+    search_fields = ('title', 'booked_by__username')
+
+# Cancelled or moved occurrences are edited on the series page itself
+class RecurrenceExceptionInline(admin.TabularInline):
+    model = RecurrenceException
+    extra = 0
+
+@admin.register(RecurrenceRule)
+class RecurrenceRuleAdmin(admin.ModelAdmin):
+    list_display = ('title', 'meeting_room', 'frequency', 'start_time', 'until', 'booked_by')
+    list_filter = ('meeting_room', 'frequency')
+    search_fields = ('title', 'booked_by__username')
+    inlines = [RecurrenceExceptionInline]
@@ -0,0 +1,238 @@
+# bookings/analytics.py
+#
+# Room utilisation heatmap: when do rooms actually get used?
+#
+# Booking intervals for a date range are loaded as NumPy arrays and rasterised into a
+# room x day x 15-minute-slot coverage array with vectorised operations (no loop over
+# bookings), then folded into room x day-of-week x slot utilisation. Partly covered slots
+# count by the fraction covered, so a 10-minute booking fills 2/3 of its slot.
+
+import datetime
+
+import numpy as np
+from django.db import NotSupportedError, connections
+from django.db.models import BigIntegerField, Func
+from django.utils import timezone
+
+from .models import MeetingRoom, Booking
+from .recurrence import expand_rules, rules_in_window
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+WEEKDAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+
+class EpochSeconds(Func):
+    """
+    UTC epoch seconds of a datetime column, computed by the database. Reading plain
+    integers skips Django's per-row datetime parsing, which is most of the cost of
+    loading a year of bookings.
+    """
+    output_field = BigIntegerField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        raise NotSupportedError(f"EpochSeconds is not implemented for {connection.vendor}.")
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # '%%%%s' ends up as strftime('%s', ...) once both formatting passes are done
+        return super().as_sql(
+            compiler, connection, template="CAST(strftime('%%%%s', %(expressions)s) AS INTEGER)", **extra_context
+        )
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection, template="EXTRACT(EPOCH FROM %(expressions)s)::bigint", **extra_context
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, template="UNIX_TIMESTAMP(%(expressions)s)", **extra_context)
+
+
+def _local_minutes(timestamps, origin, hour_count):
+    """
+    Minutes since `origin` (local midnight) in LOCAL wall-clock time, for an array of UTC
+    epoch seconds within `hour_count` hours of it. The UTC offset is looked up once per
+    hour of the range, so DST is handled without converting every timestamp in Python.
+    """
+    origin_ts = int(origin.timestamp())
+    tz = timezone.get_current_timezone()
+    offsets = np.array([
+        datetime.datetime.fromtimestamp(origin_ts + hour * 3600, tz).utcoffset().total_seconds()
+        for hour in range(hour_count)
+    ], dtype=np.int64)
+    local_origin = origin_ts + int(origin.utcoffset().total_seconds())
+    # Starts and ends are converted together, so the table above is built once
+    hour_index = np.clip((timestamps - origin_ts) // 3600, 0, hour_count - 1)
+    return (timestamps + offsets[hour_index] - local_origin) // 60
+
+
+def load_intervals(first_day, last_day, room_ids):
+    """
+    (room_index, start_ts, end_ts) arrays for every booking and series occurrence that
+    overlaps [first_day, last_day] in the given rooms. Timestamps are UTC epoch seconds.
+    """
+    window_start = timezone.make_aware(datetime.datetime.combine(first_day, datetime.time.min))
+    window_end = timezone.make_aware(datetime.datetime.combine(last_day + datetime.timedelta(days=1), datetime.time.min))
+    bookings = (
+        Booking.objects.filter(meeting_room_id__in=room_ids, start_time__lt=window_end, end_time__gt=window_start)
+        .order_by()
+        .values_list('meeting_room_id', EpochSeconds('start_time'), EpochSeconds('end_time'))
+    )
+    # The rows are plain integers already: run the ORM's SQL on a raw cursor and skip the
+    # per-row converter pass of the queryset iterator
+    sql, params = bookings.query.sql_with_params()
+    with connections[bookings.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    rules = rules_in_window(window_start, window_end).filter(meeting_room_id__in=room_ids)
+    rows.extend(
+        (occurrence.meeting_room_id, int(occurrence.start_time.timestamp()), int(occurrence.end_time.timestamp()))
+        for occurrence in expand_rules(window_start, window_end, rules=rules)
+    )
+
+    intervals = np.array(rows, dtype=np.int64).reshape(-1, 3)
+    # Room ids -> row numbers of the matrix
+    lookup = np.full(max(room_ids, default=0) + 1, -1, dtype=np.int64)
+    lookup[room_ids] = np.arange(len(room_ids))
+    rooms, starts, ends = lookup[intervals[:, 0]], intervals[:, 1], intervals[:, 2]
+    return rooms, starts, ends, window_start
+
+
+def rasterise(rooms, start_minutes, end_minutes, room_count, day_count):
+    """
+    Coverage (0..1) of every 15-minute slot: an array of shape (room_count, day_count * SLOTS_PER_DAY).
+    Intervals are in minutes since the start of the range and are clipped to it.
+    """
+    total_slots = day_count * SLOTS_PER_DAY
+    start_minutes = np.clip(start_minutes, 0, total_slots * SLOT_MINUTES)
+    end_minutes = np.clip(end_minutes, 0, total_slots * SLOT_MINUTES)
+    keep = end_minutes > start_minutes
+    rooms, start_minutes, end_minutes = rooms[keep], start_minutes[keep], end_minutes[keep]
+
+    first_slot, start_offset = np.divmod(start_minutes, SLOT_MINUTES)
+    last_slot, end_offset = np.divmod(end_minutes, SLOT_MINUTES)
+
+    # Whole slots in between go through a difference array (+1 where they begin, -1 after),
+    # partial first/last slots are added as fractions directly
+    steps = np.zeros((room_count, total_slots + 1))
+    fractions = np.zeros((room_count, total_slots + 1))
+
+    same_slot = first_slot == last_slot
+    np.add.at(fractions, (rooms[same_slot], first_slot[same_slot]),
+              (end_minutes - start_minutes)[same_slot] / SLOT_MINUTES)
+
+    spans = ~same_slot
+    rooms, first_slot, last_slot = rooms[spans], first_slot[spans], last_slot[spans]
+    start_offset, end_offset = start_offset[spans], end_offset[spans]
+    np.add.at(fractions, (rooms, first_slot), (SLOT_MINUTES - start_offset) / SLOT_MINUTES)
+    np.add.at(fractions, (rooms, last_slot), end_offset / SLOT_MINUTES)
+    np.add.at(steps, (rooms, first_slot + 1), 1)
+    np.add.at(steps, (rooms, last_slot), -1)
+
+    coverage = np.cumsum(steps, axis=1) + fractions
+    # Overlapping bookings (legacy data) can't make a room more than fully used
+    return np.minimum(coverage[:, :total_slots], 1.0)
+
+
+def utilisation_matrix(first_day, last_day, room_ids):
+    """
+    Returns (matrix, days_per_weekday): matrix[room, weekday, slot] is the fraction of that
+    slot the room was booked on average, over the days of that weekday in the range.
+    """
+    day_count = (last_day - first_day).days + 1
+    rooms, starts, ends, origin = load_intervals(first_day, last_day, room_ids)
+    # Bookings sticking out of the range only count inside it
+    range_start = int(origin.timestamp())
+    range_end = range_start + (day_count + 1) * 86400  # a spare day for DST
+    starts, ends = np.clip(starts, range_start, range_end), np.clip(ends, range_start, range_end)
+    start_minutes, end_minutes = _local_minutes(np.stack([starts, ends]), origin, (day_count + 1) * 24)
+    coverage = rasterise(rooms, start_minutes, end_minutes, len(room_ids), day_count).reshape(
+        len(room_ids), day_count, SLOTS_PER_DAY
+    )
+
+    weekdays = (first_day.weekday() + np.arange(day_count)) % 7
+    one_hot = np.eye(7)[weekdays]  # (days, 7)
+    days_per_weekday = one_hot.sum(axis=0)
+    totals = np.einsum('rds,dw->rws', coverage, one_hot)
+    matrix = np.divide(totals, days_per_weekday[None, :, None], out=np.zeros_like(totals),
+                       where=days_per_weekday[None, :, None] > 0)
+    return matrix, days_per_weekday
+
+
+def _slot_time(slot):
+    minutes = int(slot) * SLOT_MINUTES
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def _idle_ranges(idle_row):
+    """Start/end slot pairs of each run of True in a boolean slot row."""
+    edges = np.diff(np.concatenate(([0], idle_row.astype(np.int8), [0])))
+    return zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1))
+
+
+def utilisation_report(first_day, last_day, hour_from=8, hour_to=18, weekdays=range(5), peak_count=5):
+    """
+    Utilisation percentages, peak hours and always-idle slots per room, within the
+    chosen opening hours and weekdays.
+    """
+    rooms = list(MeetingRoom.objects.order_by('name').values('id', 'name', 'capacity'))
+    room_ids = [room['id'] for room in rooms]
+    matrix, days_per_weekday = utilisation_matrix(first_day, last_day, room_ids)
+
+    # Only weekdays that actually occur in the range, between the opening hours
+    weekdays = [day for day in sorted(set(weekdays)) if days_per_weekday[day] > 0]
+    slot_from, slot_to = hour_from * 60 // SLOT_MINUTES, hour_to * 60 // SLOT_MINUTES
+    window = matrix[:, weekdays, slot_from:slot_to]  # (rooms, weekdays, slots)
+
+    # Hourly utilisation averaged over all rooms: (weekdays, hours)
+    # (no rooms, or none of the weekdays in the range, leaves it empty rather than failing)
+    slots_per_hour = 60 // SLOT_MINUTES
+    hour_count = (slot_to - slot_from) // slots_per_hour
+    hourly = (window.mean(axis=0).reshape(len(weekdays), hour_count, slots_per_hour).mean(axis=2)
+              if window.size else np.zeros((len(weekdays), hour_count)))
+    peak_order = np.argsort(hourly, axis=None)[::-1][:peak_count]
+    peak_hours = [
+        {
+            'weekday': WEEKDAY_NAMES[weekdays[day]],
+            'hour': f"{hour_from + hour:02d}:00",
+            'utilisation': round(float(hourly[day, hour]) * 100, 1),
+        }
+        for day, hour in zip(*np.unravel_index(peak_order, hourly.shape))
+        if hourly[day, hour] > 0
+    ]
+
+    room_reports = []
+    for index, room in enumerate(rooms):
+        room_window = window[index]
+        busiest_day, busiest_slot = np.unravel_index(np.argmax(room_window), room_window.shape) if room_window.size else (0, 0)
+        idle = []
+        for day_index, day in enumerate(weekdays):
+            for start, end in _idle_ranges(room_window[day_index] == 0):
+                idle.append({
+                    'weekday': WEEKDAY_NAMES[day],
+                    'from': _slot_time(slot_from + start),
+                    'to': _slot_time(slot_from + end),
+                })
+        room_reports.append({
+            'id': room['id'],
+            'name': room['name'],
+            'capacity': room['capacity'],
+            'utilisation': round(float(room_window.mean()) * 100, 1) if room_window.size else 0.0,
+            'peak': {
+                'weekday': WEEKDAY_NAMES[weekdays[busiest_day]],
+                'time': _slot_time(slot_from + busiest_slot),
+                'utilisation': round(float(room_window[busiest_day, busiest_slot]) * 100, 1),
+            } if room_window.size and room_window.max() > 0 else None,
+            'always_idle': idle,
+        })
+
+    return {
+        'start': first_day,
+        'end': last_day,
+        'hours': [f"{hour_from:02d}:00", f"{hour_to:02d}:00"],
+        'weekdays': [WEEKDAY_NAMES[day] for day in weekdays],
+        'slot_minutes': SLOT_MINUTES,
+        'overall_utilisation': round(float(window.mean()) * 100, 1) if window.size else 0.0,
+        'peak_hours': peak_hours,
+        'rooms': room_reports,
+    }
@@ -0,0 +1,120 @@
+# bookings/availability.py
+#
+# "Which rooms with capacity >= N are free for X minutes in this window?"
+# One range query for the busy intervals of every candidate room (plus the
+# rooms' recurring series), then a sweep-line pass per room that merges them
+# and reads off the gaps.
+
+import datetime
+from collections import defaultdict
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import MeetingRoom, Booking
+from .recurrence import expand_rules, rules_in_window
+
+
+def merge_busy(intervals):
+    """Merges (start, end) intervals, sorted by start, into non-overlapping blocks."""
+    merged = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def free_slots(busy, windows, duration):
+    """
+    Gaps of at least `duration` inside each (start, end) window, given merged busy blocks.
+    Both lists are sorted, so one forward pass over the busy blocks covers every window.
+    """
+    slots = []
+    position = 0
+    for window_start, window_end in windows:
+        # Skip blocks that finished before this window
+        while position < len(busy) and busy[position][1] <= window_start:
+            position += 1
+        cursor = window_start
+        index = position
+        while index < len(busy) and busy[index][0] < window_end:
+            block_start, block_end = busy[index]
+            if block_start - cursor >= duration:
+                slots.append((cursor, block_start))
+            cursor = max(cursor, block_end)
+            index += 1
+        if window_end - cursor >= duration:
+            slots.append((cursor, window_end))
+    return slots
+
+
+def daily_windows(window_start, window_end, time_from=None, time_to=None):
+    """
+    Splits the window into one (start, end) per local day between time_from and time_to.
+    Without a time range the whole window is a single search window.
+    """
+    if time_from is None and time_to is None:
+        return [(window_start, window_end)]
+
+    time_from = time_from or datetime.time.min
+    windows = []
+    day = timezone.localtime(window_start).date()
+    last_day = timezone.localtime(window_end).date()
+    while day <= last_day:
+        day_start = timezone.make_aware(datetime.datetime.combine(day, time_from))
+        if time_to is None:
+            day_end = timezone.make_aware(datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time.min))
+        else:
+            day_end = timezone.make_aware(datetime.datetime.combine(day, time_to))
+        start, end = max(day_start, window_start), min(day_end, window_end)
+        if start < end:
+            windows.append((start, end))
+        day += datetime.timedelta(days=1)
+    return windows
+
+
+def find_free_rooms(window_start, window_end, duration, min_capacity=0, time_from=None, time_to=None):
+    """
+    Returns [{'room': {...}, 'free_slots': [(start, end), ...]}] for every room with
+    capacity >= min_capacity that has at least one free slot of `duration`.
+    """
+    windows = daily_windows(window_start, window_end, time_from, time_to)
+    rooms = list(
+        MeetingRoom.objects.filter(capacity__gte=min_capacity).order_by('name').values('id', 'name', 'capacity')
+    )
+    if not windows or not rooms:
+        return []
+
+    room_ids = [room['id'] for room in rooms]
+    search_start, search_end = windows[0][0], windows[-1][1]
+
+    # One range query: room IN (...) AND start < search_end AND end > search_start walks the
+    # (meeting_room, start_time, end_time) index. The extra OR of the daily windows is evaluated
+    # on the index entries, so only rows that can matter reach Python, as plain tuples.
+    overlaps_a_window = Q()
+    for start, end in windows:
+        overlaps_a_window |= Q(start_time__lt=end, end_time__gt=start)
+    busy_by_room = defaultdict(list)
+    rows = (
+        Booking.objects.filter(meeting_room_id__in=room_ids, start_time__lt=search_end, end_time__gt=search_start)
+        .filter(overlaps_a_window)
+        .order_by()
+        .values_list('meeting_room_id', 'start_time', 'end_time')
+    )
+    for room_id, start, end in rows:
+        busy_by_room[room_id].append((start, end))
+
+    # Recurring series go through the shared expansion API, only for this window
+    rules = rules_in_window(search_start, search_end).filter(meeting_room_id__in=room_ids)
+    for occurrence in expand_rules(search_start, search_end, rules=rules):
+        busy_by_room[occurrence.meeting_room_id].append((occurrence.start_time, occurrence.end_time))
+
+    results = []
+    for room in rooms:
+        slots = free_slots(merge_busy(sorted(busy_by_room[room['id']])), windows, duration)
+        if slots:
+            results.append({'room': room, 'free_slots': slots})
+    return results
@@ -0,0 +1,70 @@
+# bookings/calendar_grid.py
+
+import datetime
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import MeetingRoom, Booking, get_booking_version
+from .recurrence import occurrences_in_window
+
+# Cached grids are keyed by version, so old entries simply stop being read and expire.
+WEEK_GRID_TIMEOUT = 60 * 60
+
+
+def week_bounds(day):
+    """Returns (start_of_week, end_of_week) dates for the Monday-Sunday week containing `day`."""
+    start_of_week = day - datetime.timedelta(days=day.weekday())
+    return start_of_week, start_of_week + datetime.timedelta(days=6)
+
+
+def local_day_range(first_day, last_day):
+    """Aware datetimes covering [first_day 00:00, last_day + 1 00:00) in the current timezone."""
+    window_start = timezone.make_aware(datetime.datetime.combine(first_day, datetime.time.min))
+    window_end = timezone.make_aware(
+        datetime.datetime.combine(last_day + datetime.timedelta(days=1), datetime.time.min)
+    )
+    return window_start, window_end
+
+
+def build_week_grid(start_of_week):
+    """
+    Builds the room x day grid for one week in a single pass over the bookings.
+
+    Returns a list of rows: {'room': {...}, 'days': [[booking, ...] x 7]}.
+    Bookings and recurring series occurrences are read through the shared expansion
+    API with aware datetime bounds (no __date casts, so the time index can be used).
+    A booking that crosses midnight is placed on every day it covers.
+    """
+    days = [start_of_week + datetime.timedelta(days=i) for i in range(7)]
+    window_start, window_end = local_day_range(days[0], days[-1])
+
+    rooms = list(MeetingRoom.objects.order_by('name').values('id', 'name', 'capacity'))
+    buckets = {room['id']: [[] for _ in days] for room in rooms}
+
+    bookings = Booking.objects.only(
+        'id', 'title', 'start_time', 'end_time', 'meeting_room_id', 'associated_office_id', 'recurrence_id'
+    )
+    for booking in occurrences_in_window(window_start, window_end, bookings=bookings):
+        day_slots = buckets.get(booking.meeting_room_id)
+        if day_slots is None:
+            continue
+        first_day = timezone.localtime(max(booking.start_time, window_start)).date()
+        # A booking ending exactly at midnight does not spill into the next day
+        last_day = timezone.localtime(
+            min(booking.end_time, window_end) - datetime.timedelta(microseconds=1)
+        ).date()
+        for offset in range((first_day - days[0]).days, (last_day - days[0]).days + 1):
+            day_slots[offset].append(booking)
+
+    return [{'room': room, 'days': buckets[room['id']]} for room in rooms]
+
+
+def get_week_grid(start_of_week):
+    """Cached wrapper around build_week_grid(), keyed by the current booking-version stamp."""
+    cache_key = f"bookings:week-grid:{start_of_week.isoformat()}:{timezone.get_current_timezone_name()}:{get_booking_version()}"
+    grid = cache.get(cache_key)
+    if grid is None:
+        grid = build_week_grid(start_of_week)
+        cache.set(cache_key, grid, WEEK_GRID_TIMEOUT)
+    return grid
@@ -0,0 +1,81 @@
+# bookings/conflicts.py
+
+import heapq
+
+from .models import RecurrenceRule
+from .recurrence import expand_rule, occurrences_in_window
+
+
+def build_occurrences(start_time, end_time, recurrence='none', end_recurrence=None):
+    """
+    Returns the list of (start, end) pairs for a booking series.
+    A non-recurring booking (or one without an end date) is a single pair.
+    """
+    if recurrence not in RecurrenceRule.FREQUENCIES or not end_recurrence:
+        return [(start_time, end_time)]
+
+    # Expand through the same rule logic that stored series use
+    rule = RecurrenceRule(frequency=recurrence, start_time=start_time, end_time=end_time, until=end_recurrence)
+    return [(occurrence.start_time, occurrence.end_time) for occurrence in expand_rule(rule)]
+
+
+def sweep_overlaps(occurrences, existing):
+    """
+    Sorted-interval sweep between two lists of intervals.
+
+    `occurrences` is a list of (start, end) pairs and `existing` a list of
+    (start, end, payload) tuples. Both are sorted by start here, and every
+    existing interval is pushed on a heap (keyed by end) once it starts before
+    the current occurrence ends. After popping the ones that already finished,
+    what's left overlaps the occurrence if it also starts before the occurrence
+    ends: occurrences may differ in length (imported rows do), so one pushed for
+    an earlier, longer occurrence can start after a shorter one is over.
+
+    Returns a list of (occurrence, [payload, ...]) for each clashing occurrence.
+    """
+    occurrences = sorted(occurrences)
+    existing = sorted(existing, key=lambda item: (item[0], item[1]))
+
+    clashes = []
+    active = []  # heap of (end, index, start, payload)
+    position = 0
+    for occ_start, occ_end in occurrences:
+        while position < len(existing) and existing[position][0] < occ_end:
+            ex_start, ex_end, payload = existing[position]
+            heapq.heappush(active, (ex_end, position, ex_start, payload))
+            position += 1
+        # Occurrences are sorted by start, so anything that ended already can never clash again
+        while active and active[0][0] <= occ_start:
+            heapq.heappop(active)
+        overlapping = [payload for _, _, ex_start, payload in sorted(active) if ex_start < occ_end]
+        if overlapping:
+            clashes.append(((occ_start, occ_end), overlapping))
+    return clashes
+
+
+def find_conflicts(meeting_room, occurrences, exclude_pks=None):
+    """
+    Checks a whole booking series against the room's existing bookings and series.
+
+    Reads ONE window covering the span of the series (a range query backed by the
+    (meeting_room, start_time, end_time) index, plus the room's overlapping rules
+    expanded lazily), then sweeps both sorted lists.
+    Returns a list of (occurrence, [Booking, ...]).
+    """
+    if not occurrences:
+        return []
+
+    window_start = min(start for start, _ in occurrences)
+    window_end = max(end for _, end in occurrences)
+
+    existing = occurrences_in_window(window_start, window_end, meeting_room=meeting_room, exclude_pks=exclude_pks)
+    intervals = [(booking.start_time, booking.end_time, booking) for booking in existing]
+    return sweep_overlaps(occurrences, intervals)
+
+
+def conflict_message(meeting_room, conflicts):
+    clashing_dates = ", ".join(occ_start.strftime("%Y-%m-%d %H:%M") for (occ_start, _), _ in conflicts)
+    return (
+        f"This time slot in '{meeting_room.name}' is already booked on {len(conflicts)} "
+        f"occurrence(s): {clashing_dates}. Please choose a different time."
+    )
@@ -3,6 +3,7 @@ from django import forms
 from .models import Booking, MeetingRoom
 from offices.models import Office
 from django.core.exceptions import ValidationError
+from .conflicts import build_occurrences, find_conflicts, conflict_message
 import datetime
 
 class BookingForm(forms.ModelForm):
@@ -45,15 +46,19 @@ class BookingForm(forms.ModelForm):
             if start_time >= end_time:
                 raise ValidationError("End time must be after start time.")
 
+            recurrence = cleaned_data.get('recurrence') or 'none'
+            end_recurrence = cleaned_data.get('end_recurrence')
+            if recurrence != 'none' and end_recurrence and end_recurrence < start_time.date():
+                raise ValidationError("The recurrence end date must be on or after the first booking.")
+
             # --- CRITICAL: Double-booking prevention logic ---
-            overlapping_bookings = Booking.objects.filter(
-                meeting_room=meeting_room,
-                start_time__lt=end_time,
-                end_time__gt=start_time
-            ).exclude(pk=self.instance.pk) # Exclude self if updating
-
-            if overlapping_bookings.exists():
-                raise ValidationError(
-                    f"This time slot in '{meeting_room.name}' is already booked. Please choose a different time."
-                )
-        return cleaned_data
\ No newline at end of file
+            # Check EVERY occurrence of the series in one query, not just the first one.
+            occurrences = build_occurrences(start_time, end_time, recurrence, end_recurrence)
+            exclude_pks = [self.instance.pk] if self.instance.pk else None  # Exclude self if updating
+            conflicts = find_conflicts(meeting_room, occurrences, exclude_pks=exclude_pks)
+
+            # This is the early check for a friendly form error; the view re-checks under
+            # a lock on the room when it writes (see bookings/reservations.py).
+            if conflicts:
+                raise ValidationError(conflict_message(meeting_room, conflicts))
+        return cleaned_data
@@ -0,0 +1,153 @@
+# bookings/ical.py
+#
+# iCalendar (RFC 5545) feeds for one meeting room or one office, for mail clients to subscribe to.
+#
+# The feed is generated while it is sent: plain bookings come from a queryset .iterator(),
+# so a room with years of history never sits in memory as a list (under ASGI too: the
+# views hand the stream over through core.streaming). Recurring series are
+# written as ONE event with an RRULE (plus EXDATEs and moved occurrences) instead of being
+# expanded, which is what calendar clients expect anyway.
+
+import datetime
+
+from django.core import signing
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .models import Booking, RecurrenceRule
+
+# How far back the feeds go; everything in the future is always included
+FEED_HISTORY = datetime.timedelta(days=90)
+FEED_TOKEN_SALT = 'bookings.ical-feed'
+PRODID = '-//Floor Plan//Meeting Rooms//EN'
+
+
+# --- SUBSCRIPTION TOKENS ---
+# Mail clients can't log in, so the subscribe URL carries a signed token naming the user.
+
+def feed_token(user):
+    return signing.Signer(salt=FEED_TOKEN_SALT).sign(str(user.pk))
+
+def user_from_feed_token(token):
+    try:
+        pk = signing.Signer(salt=FEED_TOKEN_SALT).unsign(token or '')
+    except signing.BadSignature:
+        return None
+    return User.objects.filter(pk=pk, is_active=True).first()
+
+
+# --- SERIALISATION ---
+
+def escape_text(value):
+    return (
+        (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+def fold(line):
+    """Splits a content line into 75-octet pieces (never inside a UTF-8 character)."""
+    if len(line.encode()) <= 75:
+        return line + '\r\n'
+    pieces, current, size = [], '', 0
+    for char in line:
+        width = len(char.encode())
+        # Continuation lines start with a space, which counts towards their 75 octets
+        if size + width > (75 if not pieces else 74):
+            pieces.append(current)
+            current, size = '', 0
+        current += char
+        size += width
+    pieces.append(current)
+    return '\r\n '.join(pieces) + '\r\n'
+
+def utc_stamp(moment):
+    return moment.astimezone(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+def local_stamp(moment):
+    return timezone.localtime(moment).strftime('%Y%m%dT%H%M%S')
+
+def _event(uid, dtstamp, summary, location, properties):
+    lines = ['BEGIN:VEVENT', f'UID:{uid}', f'DTSTAMP:{dtstamp}']
+    lines.extend(properties)
+    lines.append(f'SUMMARY:{escape_text(summary)}')
+    lines.append(f'LOCATION:{escape_text(location)}')
+    lines.append('END:VEVENT')
+    return ''.join(fold(line) for line in lines)
+
+def booking_event(pk, title, start_time, end_time, room_name, dtstamp):
+    return _event(
+        f'booking-{pk}@floor-plan', dtstamp, title, room_name,
+        [f'DTSTART:{utc_stamp(start_time)}', f'DTEND:{utc_stamp(end_time)}'],
+    )
+
+def series_events(rule, dtstamp):
+    """The series itself plus one override event per moved occurrence."""
+    # Series repeat in local time (see RecurrenceRule.to_rrule), so they are written with a TZID
+    tzid = timezone.get_current_timezone_name()
+    uid = f'series-{rule.pk}@floor-plan'
+    until = rule._until_datetime(timezone.get_current_timezone())
+    properties = [
+        f'DTSTART;TZID={tzid}:{local_stamp(rule.start_time)}',
+        f'DTEND;TZID={tzid}:{local_stamp(rule.end_time)}',
+        f'RRULE:FREQ={rule.frequency.upper()};INTERVAL={rule.interval};UNTIL={utc_stamp(until)}',
+    ]
+    overrides = []
+    for exception in rule.exceptions.all():
+        if exception.is_cancelled:
+            properties.append(f'EXDATE;TZID={tzid}:{local_stamp(exception.original_start)}')
+        else:
+            start_time = exception.start_time or exception.original_start
+            end_time = exception.end_time or start_time + rule.duration
+            overrides.append(_event(
+                uid, dtstamp, exception.title or rule.title, rule.meeting_room.name,
+                [
+                    f'RECURRENCE-ID;TZID={tzid}:{local_stamp(exception.original_start)}',
+                    f'DTSTART:{utc_stamp(start_time)}', f'DTEND:{utc_stamp(end_time)}',
+                ],
+            ))
+    return [_event(uid, dtstamp, rule.title, rule.meeting_room.name, properties)] + overrides
+
+
+# --- FEEDS ---
+
+def stream_feed(calendar_name, bookings, rules, stamp):
+    """
+    Yields the calendar piece by piece. `bookings` is a Booking queryset, `rules` a
+    RecurrenceRule queryset; `stamp` (ns) is the feed's change stamp, used as DTSTAMP.
+    """
+    dtstamp = utc_stamp(datetime.datetime.fromtimestamp(stamp / 1e9, tz=datetime.timezone.utc))
+    since = timezone.now() - FEED_HISTORY
+
+    yield ''.join(fold(line) for line in [
+        'BEGIN:VCALENDAR', 'VERSION:2.0', f'PRODID:{PRODID}', 'CALSCALE:GREGORIAN',
+        f'X-WR-CALNAME:{escape_text(calendar_name)}',
+    ])
+
+    rows = (
+        bookings.filter(end_time__gte=since)
+        .order_by('start_time')
+        .values_list('pk', 'title', 'start_time', 'end_time', 'meeting_room__name')
+    )
+    for pk, title, start_time, end_time, room_name in rows.iterator(chunk_size=500):
+        yield booking_event(pk, title, start_time, end_time, room_name, dtstamp)
+
+    for rule in rules.filter(series_end__gte=since).select_related('meeting_room').prefetch_related('exceptions'):
+        yield ''.join(series_events(rule, dtstamp))
+
+    yield 'END:VCALENDAR\r\n'
+
+def room_feed(room, stamp):
+    return stream_feed(
+        f"{room.name} bookings",
+        Booking.objects.filter(meeting_room=room),
+        RecurrenceRule.objects.filter(meeting_room=room),
+        stamp,
+    )
+
+def office_feed(office, stamp):
+    return stream_feed(
+        f"Office {office.office_number} meeting room bookings",
+        Booking.objects.filter(associated_office=office),
+        RecurrenceRule.objects.filter(associated_office=office),
+        stamp,
+    )
@@ -0,0 +1,70 @@
+# bookings/management/commands/benchmark_availability.py
+
+import datetime
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from bookings.models import MeetingRoom, Booking
+from bookings.availability import find_free_rooms
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds rooms and bookings inside a transaction, times the free-room finder "
+        "and rolls everything back. Nothing is left in the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=300)
+        parser.add_argument('--bookings', type=int, default=200_000)
+        parser.add_argument('--days', type=int, default=365, help="Spread the bookings over this many days.")
+        parser.add_argument('--runs', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        with transaction.atomic():
+            first_day = timezone.localdate() + datetime.timedelta(days=1)
+            day_start = timezone.make_aware(datetime.datetime.combine(first_day, datetime.time(8)))
+
+            self.stdout.write(f"Seeding {options['rooms']} rooms and {options['bookings']} bookings...")
+            rooms = MeetingRoom.objects.bulk_create([
+                MeetingRoom(name=f"Benchmark Room {i}", capacity=rng.choice([4, 6, 8, 12, 20]))
+                for i in range(options['rooms'])
+            ])
+            bookings = []
+            for _ in range(options['bookings']):
+                start = day_start + datetime.timedelta(
+                    days=rng.randrange(options['days']), minutes=15 * rng.randrange(40)
+                )
+                bookings.append(Booking(
+                    meeting_room=rng.choice(rooms), title="Benchmark",
+                    start_time=start, end_time=start + datetime.timedelta(minutes=15 * rng.randint(1, 8)),
+                ))
+            Booking.objects.bulk_create(bookings, batch_size=5000)
+
+            # "Which rooms with capacity >= 8 are free for 90 minutes between 14:00 and 15:30 this week?"
+            window_start = timezone.make_aware(datetime.datetime.combine(first_day, datetime.time.min))
+            window_end = window_start + datetime.timedelta(days=7)
+            timings = []
+            for _ in range(options['runs']):
+                started = time.perf_counter()
+                results = find_free_rooms(
+                    window_start, window_end, datetime.timedelta(minutes=90), 8,
+                    datetime.time(14), datetime.time(15, 30)
+                )
+                timings.append((time.perf_counter() - started) * 1000)
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"Rooms with a free slot: {len(results)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"find_free_rooms over {options['runs']} runs: "
+            f"median {statistics.median(timings):.1f} ms, max {max(timings):.1f} ms"
+        ))
@@ -0,0 +1,122 @@
+# bookings/management/commands/benchmark_booking_contention.py
+
+import datetime
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from bookings.models import MeetingRoom, Booking
+from bookings.conflicts import find_conflicts
+from bookings.reservations import save_booking, BookingConflictError
+
+
+class Command(BaseCommand):
+    help = (
+        "Books a small set of slots from many threads at once, then checks that no room "
+        "ended up double-booked and reports bookings/sec. Creates its own rooms and deletes "
+        "them (and their bookings) afterwards. Commits for real: run it against a dev database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--rooms', type=int, default=8)
+        parser.add_argument('--attempts', type=int, default=100, help="Booking attempts per thread.")
+        parser.add_argument('--slots', type=int, default=40, help="Half-hour start slots per room; fewer means more collisions.")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--unsafe', action='store_true',
+            help="Check and save WITHOUT the room lock (the old behaviour), to show the race.",
+        )
+
+    def handle(self, *args, **options):
+        rooms = MeetingRoom.objects.bulk_create([
+            MeetingRoom(name=f"Contention Room {i}", capacity=10) for i in range(options['rooms'])
+        ])
+        try:
+            self.run(rooms, options)
+        finally:
+            MeetingRoom.objects.filter(pk__in=[room.pk for room in rooms]).delete()
+
+    def run(self, rooms, options):
+        day_start = timezone.make_aware(
+            datetime.datetime.combine(timezone.localdate() + datetime.timedelta(days=400), datetime.time(8))
+        )
+        created, rejected, errors = [0], [0], []
+        counter_lock = threading.Lock()
+        start_line = threading.Barrier(options['threads'])
+
+        def book(booking):
+            if not options['unsafe']:
+                save_booking(booking)
+                return
+            conflicts = find_conflicts(booking.meeting_room, [(booking.start_time, booking.end_time)])
+            if conflicts:
+                raise BookingConflictError(booking.meeting_room, conflicts)
+            booking.save()
+
+        def worker(index):
+            rng = random.Random(options['seed'] + index)
+            mine_created = mine_rejected = 0
+            try:
+                start_line.wait()
+                for _ in range(options['attempts']):
+                    start = day_start + datetime.timedelta(minutes=30 * rng.randrange(options['slots']))
+                    # 30 or 60 minutes, so bookings also overlap partially, not just exactly
+                    end = start + datetime.timedelta(minutes=rng.choice([30, 60]))
+                    try:
+                        book(Booking(meeting_room=rng.choice(rooms), title=f"Thread {index}", start_time=start, end_time=end))
+                        mine_created += 1
+                    except BookingConflictError:
+                        mine_rejected += 1
+            except Exception as error:  # report it instead of losing it in the thread
+                errors.append(repr(error))
+            finally:
+                connection.close()
+                with counter_lock:
+                    created[0] += mine_created
+                    rejected[0] += mine_rejected
+
+        mode = "WITHOUT locking" if options['unsafe'] else "with per-room locking"
+        self.stdout.write(
+            f"{options['threads']} threads x {options['attempts']} attempts on {len(rooms)} rooms, {mode}..."
+        )
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        double_bookings = self.count_double_bookings(rooms)
+        attempts = options['threads'] * options['attempts']
+        self.stdout.write(f"Created {created[0]}, rejected as conflicts {rejected[0]}, errors {len(errors)}")
+        for error in errors[:5]:
+            self.stdout.write(self.style.WARNING(f"  {error}"))
+        self.stdout.write(
+            f"{attempts / elapsed:.0f} attempts/sec, {created[0] / elapsed:.0f} bookings/sec ({elapsed:.2f}s)"
+        )
+        style = self.style.SUCCESS if double_bookings == 0 else self.style.ERROR
+        self.stdout.write(style(f"Double bookings: {double_bookings}"))
+
+    def count_double_bookings(self, rooms):
+        """Bookings that overlap an earlier booking in the same room."""
+        overlapping = 0
+        rows = (
+            Booking.objects.filter(meeting_room__in=rooms)
+            .order_by('meeting_room_id', 'start_time')
+            .values_list('meeting_room_id', 'start_time', 'end_time')
+        )
+        current_room, latest_end = None, None
+        for room_id, start, end in rows:
+            if room_id != current_room:
+                current_room, latest_end = room_id, end
+                continue
+            if start < latest_end:
+                overlapping += 1
+            latest_end = max(latest_end, end)
+        return overlapping
@@ -0,0 +1,66 @@
+# bookings/management/commands/benchmark_utilisation.py
+
+import datetime
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from bookings.models import MeetingRoom, Booking
+from bookings.analytics import utilisation_report
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a year of bookings across rooms inside a transaction, times the utilisation "
+        "report and rolls everything back. Nothing is left in the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=50)
+        parser.add_argument('--per-day', type=int, default=6, help="Bookings per room per weekday.")
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        last_day = timezone.localdate()
+        first_day = last_day - datetime.timedelta(days=364)
+
+        with transaction.atomic():
+            rooms = MeetingRoom.objects.bulk_create([
+                MeetingRoom(name=f"Benchmark Room {i}", capacity=rng.choice([4, 6, 8, 12, 20]))
+                for i in range(options['rooms'])
+            ])
+            bookings = []
+            for offset in range(365):
+                day = first_day + datetime.timedelta(days=offset)
+                if day.weekday() >= 5:
+                    continue
+                day_start = timezone.make_aware(datetime.datetime.combine(day, datetime.time(8)))
+                for room in rooms:
+                    for _ in range(options['per_day']):
+                        start = day_start + datetime.timedelta(minutes=5 * rng.randrange(120))
+                        bookings.append(Booking(
+                            meeting_room=room, title="Benchmark",
+                            start_time=start, end_time=start + datetime.timedelta(minutes=5 * rng.randint(3, 24)),
+                        ))
+            self.stdout.write(f"Seeding {len(rooms)} rooms and {len(bookings)} bookings...")
+            Booking.objects.bulk_create(bookings, batch_size=5000)
+
+            timings = []
+            for _ in range(options['runs']):
+                started = time.perf_counter()
+                report = utilisation_report(first_day, last_day)
+                timings.append((time.perf_counter() - started) * 1000)
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"Overall utilisation (Mon-Fri 08-18): {report['overall_utilisation']}%")
+        self.stdout.write(self.style.SUCCESS(
+            f"utilisation_report over {options['runs']} runs: "
+            f"median {statistics.median(timings):.0f} ms, max {max(timings):.0f} ms"
+        ))
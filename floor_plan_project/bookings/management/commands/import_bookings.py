@@ -0,0 +1,51 @@
+# bookings/management/commands/import_bookings.py
+
+import sys
+import time
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.importer import parse_file, import_bookings
+
+
+class Command(BaseCommand):
+    help = "Imports bookings from a CSV (room,title,start,end[,office]) or iCalendar (.ics) file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="The .csv or .ics file to import.")
+        parser.add_argument('--format', choices=['csv', 'ics'], help="Defaults to the file extension.")
+        parser.add_argument('--user', help="Username to record as the booker.")
+        parser.add_argument('--report', help="Write the rejection report (CSV) to this path instead of stdout.")
+        parser.add_argument('--dry-run', action='store_true', help="Validate only; don't write anything.")
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+
+        booked_by = None
+        if options['user']:
+            booked_by = User.objects.filter(username=options['user']).first()
+            if booked_by is None:
+                raise CommandError(f"No user named '{options['user']}'.")
+
+        started = time.perf_counter()
+        try:
+            with path.open(encoding='utf-8-sig', newline='') as stream:
+                result = import_bookings(parse_file(stream, file_format), booked_by=booked_by, dry_run=options['dry_run'])
+        except (OSError, ValueError) as error:
+            raise CommandError(str(error))
+        elapsed = time.perf_counter() - started
+
+        if result.rejections:
+            if options['report']:
+                with open(options['report'], 'w', newline='') as report:
+                    result.write_report(report)
+            else:
+                result.write_report(sys.stdout)
+
+        verb = "Would import" if options['dry_run'] else "Imported"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result.created} booking(s), rejected {len(result.rejections)} in {elapsed:.2f}s."
+        ))
@@ -0,0 +1,13 @@
+# bookings/management/commands/rebuild_usage_rollup.py
+
+from django.core.management.base import BaseCommand
+
+from bookings.usage import rebuild_usage_rollup
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the monthly office usage rollup from the bookings and recurring series (backfills, drift repair)."
+
+    def handle(self, *args, **options):
+        row_count = rebuild_usage_rollup()
+        self.stdout.write(self.style.SUCCESS(f"Usage rollup rebuilt: {row_count} rows."))
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0002_booking_associated_office'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['meeting_room', 'start_time', 'end_time'], name='booking_room_time_idx'),
+        ),
+    ]
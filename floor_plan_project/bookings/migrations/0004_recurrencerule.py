@@ -0,0 +1,61 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:26
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0003_booking_room_time_idx'),
+        ('offices', '0006_delete_booking_delete_meetingroom'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurrenceRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('frequency', models.CharField(choices=[('daily', 'Daily'), ('weekly', 'Weekly')], max_length=10)),
+                ('interval', models.PositiveIntegerField(default=1)),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('until', models.DateField(help_text='The last date an occurrence may start on.')),
+                ('series_end', models.DateTimeField(editable=False)),
+                ('recurrence_id', models.UUIDField(default=uuid.uuid4, editable=False)),
+                ('associated_office', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='meeting_room_rules', to='offices.office')),
+                ('booked_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('meeting_room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurrence_rules', to='bookings.meetingroom')),
+            ],
+            options={
+                'ordering': ['start_time'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RecurrenceException',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_start', models.DateTimeField()),
+                ('is_cancelled', models.BooleanField(default=False)),
+                ('start_time', models.DateTimeField(blank=True, null=True)),
+                ('end_time', models.DateTimeField(blank=True, null=True)),
+                ('title', models.CharField(blank=True, max_length=200)),
+                ('rule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exceptions', to='bookings.recurrencerule')),
+            ],
+            options={
+                'ordering': ['original_start'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recurrencerule',
+            index=models.Index(fields=['meeting_room', 'start_time', 'series_end'], name='rule_room_window_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='recurrenceexception',
+            constraint=models.UniqueConstraint(fields=('rule', 'original_start'), name='unique_rule_exception'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_recurrencerule'),
+        ('offices', '0006_delete_booking_delete_meetingroom'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyOfficeUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month (local time).')),
+                ('booked_seconds', models.BigIntegerField(default=0)),
+                ('booking_count', models.PositiveIntegerField(default=0)),
+                ('office', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_usage', to='offices.office')),
+                ('rule', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='monthly_usage', to='bookings.recurrencerule')),
+            ],
+            options={
+                'ordering': ['month', 'office'],
+                'indexes': [models.Index(fields=['month', 'office'], name='usage_month_office_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('rule__isnull', True)), fields=('office', 'month'), name='unique_office_month_usage')],
+            },
+        ),
+    ]
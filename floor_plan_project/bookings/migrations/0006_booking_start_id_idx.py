@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_monthlyofficeusage'),
+        ('offices', '0006_delete_booking_delete_meetingroom'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['start_time', 'id'], name='booking_start_id_idx'),
+        ),
+    ]
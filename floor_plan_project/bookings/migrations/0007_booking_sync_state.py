@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0006_booking_start_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0007_booking_sync_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarFeedStamp',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('room', 'Room'), ('office', 'Office')], max_length=10)),
+                ('object_id', models.PositiveIntegerField()),
+                ('stamp', models.BigIntegerField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_calendar_feed_stamp')],
+            },
+        ),
+    ]
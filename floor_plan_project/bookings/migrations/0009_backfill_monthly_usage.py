@@ -0,0 +1,76 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:20
+
+import datetime
+from collections import defaultdict
+
+from dateutil import rrule
+from django.db import migrations
+from django.utils import timezone
+
+
+def _add(totals, office_id, start_time, end_time):
+    # Same attribution as bookings/usage.py: the local month the booking starts in
+    row = totals[(office_id, timezone.localtime(start_time).date().replace(day=1))]
+    row[0] += int((end_time - start_time).total_seconds())
+    row[1] += 1
+
+
+def _series_occurrences(rule, exceptions):
+    # RecurrenceRule.to_rrule() and expand_rule(), which historical models don't have
+    duration = rule.end_time - rule.start_time
+    dtstart = timezone.localtime(rule.start_time)
+    until = timezone.make_aware(datetime.datetime.combine(rule.until, datetime.time.max), dtstart.tzinfo)
+    frequency = {'daily': rrule.DAILY, 'weekly': rrule.WEEKLY}[rule.frequency]
+    changed = {exception.original_start for exception in exceptions}
+    for start_time in rrule.rrule(frequency, dtstart=dtstart, interval=rule.interval, until=until):
+        if start_time not in changed:
+            yield start_time, start_time + duration
+    for exception in exceptions:
+        if not exception.is_cancelled:
+            start_time = exception.start_time or exception.original_start
+            yield start_time, exception.end_time or start_time + duration
+
+
+def fill_usage(apps, schema_editor):
+    Booking = apps.get_model('bookings', 'Booking')
+    RecurrenceRule = apps.get_model('bookings', 'RecurrenceRule')
+    RecurrenceException = apps.get_model('bookings', 'RecurrenceException')
+    MonthlyOfficeUsage = apps.get_model('bookings', 'MonthlyOfficeUsage')
+
+    # Bookings made before 0005 were never counted: start over from the tables
+    plain = defaultdict(lambda: [0, 0])
+    bookings = Booking.objects.filter(associated_office__isnull=False).order_by().values_list(
+        'associated_office_id', 'start_time', 'end_time'
+    )
+    for office_id, start_time, end_time in bookings.iterator(chunk_size=5000):
+        _add(plain, office_id, start_time, end_time)
+    rows = [
+        MonthlyOfficeUsage(office_id=office_id, month=month, booked_seconds=seconds, booking_count=count)
+        for (office_id, month), (seconds, count) in plain.items()
+    ]
+
+    exceptions_by_rule = defaultdict(list)
+    for exception in RecurrenceException.objects.all():
+        exceptions_by_rule[exception.rule_id].append(exception)
+    for rule in RecurrenceRule.objects.filter(associated_office__isnull=False).iterator():
+        series = defaultdict(lambda: [0, 0])
+        for start_time, end_time in _series_occurrences(rule, exceptions_by_rule[rule.pk]):
+            _add(series, rule.associated_office_id, start_time, end_time)
+        rows.extend(
+            MonthlyOfficeUsage(office_id=office_id, month=month, rule=rule, booked_seconds=seconds, booking_count=count)
+            for (office_id, month), (seconds, count) in series.items()
+        )
+
+    MonthlyOfficeUsage.objects.all().delete()
+    MonthlyOfficeUsage.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0008_calendar_feed_stamp'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_usage, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,15 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
 from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from dateutil import rrule
 from offices.models import Office
+import datetime
+from collections import defaultdict
+import time
 import uuid
 
 class MeetingRoom(models.Model):
@@ -22,5 +31,294 @@ class Booking(models.Model):
     def __str__(self):
         return f'"{self.title}" in {self.meeting_room.name} from {self.start_time.strftime("%Y-%m-%d %H:%M")}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so the usage rollup can subtract the old values on save
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    class Meta:
+        ordering = ['start_time']
+        indexes = [
+            # Backs the overlap range query used by the conflict checker
+            models.Index(fields=['meeting_room', 'start_time', 'end_time'], name='booking_room_time_idx'),
+            # Keyset pagination of upcoming bookings on (start_time, id)
+            models.Index(fields=['start_time', 'id'], name='booking_start_id_idx'),
+        ]
+
+
+class RecurrenceRule(models.Model):
+    """
+    A repeating booking stored as ONE row (an RRULE-style rule) instead of one Booking per occurrence.
+    Occurrences are expanded on demand, only for the window being looked at (see bookings/recurrence.py).
+    """
+    FREQUENCY_CHOICES = [
+        ('daily', 'Daily'),
+        ('weekly', 'Weekly'),
+    ]
+    FREQUENCIES = {'daily': rrule.DAILY, 'weekly': rrule.WEEKLY}
+
+    meeting_room = models.ForeignKey(MeetingRoom, on_delete=models.CASCADE, related_name="recurrence_rules")
+    booked_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    title = models.CharField(max_length=200)
+    associated_office = models.ForeignKey(Office, on_delete=models.SET_NULL, null=True, blank=True, related_name="meeting_room_rules")
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES)
+    interval = models.PositiveIntegerField(default=1)
+    # Start and end of the FIRST occurrence; every other occurrence has the same duration
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    until = models.DateField(help_text="The last date an occurrence may start on.")
+    # End of the last occurrence, kept up to date on save so window queries can skip finished series
+    series_end = models.DateTimeField(editable=False)
+    recurrence_id = models.UUIDField(default=uuid.uuid4, editable=False)
+
+    def __str__(self):
+        return f'"{self.title}" in {self.meeting_room.name}, {self.get_frequency_display().lower()} until {self.until}'
+
+    @property
+    def duration(self):
+        return self.end_time - self.start_time
+
+    def _until_datetime(self, tzinfo):
+        return timezone.make_aware(datetime.datetime.combine(self.until, datetime.time.max), tzinfo)
+
+    def to_rrule(self):
+        # Expand in local time so a weekly 10:00 meeting stays at 10:00 across DST changes
+        dtstart = timezone.localtime(self.start_time)
+        return rrule.rrule(
+            self.FREQUENCIES[self.frequency], dtstart=dtstart, interval=self.interval,
+            until=self._until_datetime(dtstart.tzinfo)
+        )
+
+    def save(self, *args, **kwargs):
+        tzinfo = timezone.localtime(self.start_time).tzinfo
+        last_start = self.to_rrule().before(self._until_datetime(tzinfo), inc=True)
+        self.series_end = (last_start or self.start_time) + self.duration
+        super().save(*args, **kwargs)
+
+    class Meta:
+        ordering = ['start_time']
+        indexes = [
+            models.Index(fields=['meeting_room', 'start_time', 'series_end'], name='rule_room_window_idx'),
+        ]
+
+class RecurrenceException(models.Model):
+    """
+    Changes one occurrence of a RecurrenceRule: either cancels it (an EXDATE)
+    or overrides its time and/or title.
+    """
+    rule = models.ForeignKey(RecurrenceRule, on_delete=models.CASCADE, related_name="exceptions")
+    # The start time the occurrence would have had according to the rule
+    original_start = models.DateTimeField()
+    is_cancelled = models.BooleanField(default=False)
+    start_time = models.DateTimeField(null=True, blank=True)
+    end_time = models.DateTimeField(null=True, blank=True)
+    title = models.CharField(max_length=200, blank=True)
+
+    def __str__(self):
+        action = "Cancelled" if self.is_cancelled else "Override"
+        return f'{action}: {self.rule.title} on {self.original_start.strftime("%Y-%m-%d %H:%M")}'
+
+    class Meta:
+        ordering = ['original_start']
+        constraints = [
+            models.UniqueConstraint(fields=['rule', 'original_start'], name='unique_rule_exception'),
+        ]
+
+
+class MonthlyOfficeUsage(models.Model):
+    """
+    Rollup of meeting room usage: office x month -> booked seconds and booking count.
+    Rows with rule=None hold plain bookings and are kept up to date incrementally;
+    each recurring series owns its own rows, rebuilt whenever the series changes.
+    Maintained by bookings/usage.py, read by monthly_usage_report_api.
+    """
+    office = models.ForeignKey(Office, on_delete=models.CASCADE, related_name="monthly_usage")
+    month = models.DateField(help_text="First day of the month (local time).")
+    rule = models.ForeignKey(RecurrenceRule, on_delete=models.CASCADE, null=True, blank=True, related_name="monthly_usage")
+    booked_seconds = models.BigIntegerField(default=0)
+    booking_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.office} - {self.month.strftime('%b %Y')}"
+
+    class Meta:
+        ordering = ['month', 'office']
+        indexes = [
+            models.Index(fields=['month', 'office'], name='usage_month_office_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['office', 'month'], condition=models.Q(rule__isnull=True), name='unique_office_month_usage'
+            ),
+        ]
+
+
+class BookingSyncState(models.Model):
+    """
+    A single row holding the bookings version counter. It lives in the database rather
+    than the cache so every worker process sees the same value (the default cache is
+    per process).
+    """
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Bookings at version {self.version}"
+
+
+class CalendarFeedStamp(models.Model):
+    """The change stamp of one room's or office's iCal feed (see bump_feed_stamps)."""
+    KIND_CHOICES = [('room', 'Room'), ('office', 'Office')]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField()
+    stamp = models.BigIntegerField()
+
     class Meta:
-        ordering = ['start_time']
\ No newline at end of file
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_calendar_feed_stamp'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.object_id} feed at {self.stamp}"
+
+
+# --- BOOKING VERSION STAMP ---
+# Anything cached from the bookings table (e.g. the week grid) is keyed by this version.
+# It is bumped whenever a Booking, MeetingRoom or recurrence rule changes, which invalidates those entries.
+
+def get_booking_version():
+    return BookingSyncState.objects.values_list('version', flat=True).first() or 0
+
+def bump_booking_version():
+    """
+    Call this after bulk operations, which don't send model signals. The UPDATE runs in
+    the caller's transaction, so the new version becomes visible with the change itself.
+    """
+    with transaction.atomic():
+        if not BookingSyncState.objects.filter(pk=1).update(version=F('version') + 1):
+            BookingSyncState.objects.get_or_create(pk=1)
+            BookingSyncState.objects.filter(pk=1).update(version=F('version') + 1)
+
+@receiver([post_save, post_delete], sender=Booking)
+@receiver([post_save, post_delete], sender=MeetingRoom)
+@receiver([post_save, post_delete], sender=RecurrenceRule)
+@receiver([post_save, post_delete], sender=RecurrenceException)
+def invalidate_booking_caches(sender, **kwargs):
+    bump_booking_version()
+
+
+# --- CALENDAR FEED CHANGE STAMPS ---
+# One stamp per room and per office (time.time_ns() of the last change), used as the ETag and
+# Last-Modified of the iCal feeds. Pollers whose copy is current get a 304 without the
+# bookings table being read at all. The stamps are CalendarFeedStamp rows so every worker
+# hands out the same ETag.
+
+def local_days(start_time, end_time):
+    """The local dates a booking covers (a booking ending at midnight doesn't cover the next day)."""
+    day = timezone.localtime(start_time).date()
+    last_day = timezone.localtime(end_time - datetime.timedelta(microseconds=1)).date()
+    days = [day]
+    while day < last_day:
+        day += datetime.timedelta(days=1)
+        days.append(day)
+    return days
+
+def get_feed_stamp(kind, pk):
+    """kind is 'room' or 'office'. None if there is no such room or office."""
+    stamp = CalendarFeedStamp.objects.filter(kind=kind, object_id=pk).values_list('stamp', flat=True).first()
+    if stamp is None:
+        # Polling a made-up id must not leave a row behind
+        if not (MeetingRoom if kind == 'room' else Office).objects.filter(pk=pk).exists():
+            return None
+        # Never changed since stamps were kept: start from now, which at worst costs one full refetch
+        stamp = CalendarFeedStamp.objects.get_or_create(kind=kind, object_id=pk, defaults={'stamp': time.time_ns()})[0].stamp
+    return stamp
+
+def bump_feed_stamps(room_ids=(), office_ids=()):
+    """
+    Call this after bulk operations, which don't send model signals. Like
+    bump_booking_version() it writes in the caller's transaction.
+    """
+    keys = [('room', pk) for pk in set(room_ids) if pk is not None]
+    keys += [('office', pk) for pk in set(office_ids) if pk is not None]
+    if not keys:
+        return
+    now = time.time_ns()
+    match = models.Q()
+    for kind, pk in keys:
+        match |= models.Q(kind=kind, object_id=pk)
+    with transaction.atomic():
+        CalendarFeedStamp.objects.bulk_create(
+            [CalendarFeedStamp(kind=kind, object_id=pk, stamp=now) for kind, pk in keys], ignore_conflicts=True
+        )
+        # Never step backwards, even if this worker's clock is behind the last writer's
+        CalendarFeedStamp.objects.filter(match).update(stamp=Greatest(F('stamp') + 1, Value(now)))
+
+# NOTE: receivers that read _loaded_values must stay registered before
+# update_usage_on_booking_save, which refreshes it to the saved values.
+@receiver([post_save, post_delete], sender=Booking)
+def bump_booking_feed_stamps(sender, instance, **kwargs):
+    old = getattr(instance, '_loaded_values', None) or {}
+    # A booking moved to another room or office leaves both feeds
+    bump_feed_stamps(
+        {instance.meeting_room_id, old.get('meeting_room_id')},
+        {instance.associated_office_id, old.get('associated_office_id')},
+    )
+
+@receiver([post_save, post_delete], sender=Booking)
+def publish_booking_change(sender, instance, raw=False, **kwargs):
+    from core.events import publish
+    if raw:
+        return
+    # Tell open calendars which (room, day) cells to refresh: where the booking is now and where it was
+    old = getattr(instance, '_loaded_values', None) or {}
+    cells = defaultdict(set)
+    cells[instance.meeting_room_id].update(local_days(instance.start_time, instance.end_time))
+    if old.get('start_time') and old.get('end_time'):
+        cells[old.get('meeting_room_id', instance.meeting_room_id)].update(local_days(old['start_time'], old['end_time']))
+    for room_id, days in cells.items():
+        publish('bookings', {'room_id': room_id, 'days': sorted(day.isoformat() for day in days)})
+
+@receiver([post_save, post_delete], sender=RecurrenceRule)
+@receiver([post_save, post_delete], sender=RecurrenceException)
+def bump_series_feed_stamps(sender, instance, **kwargs):
+    if sender is RecurrenceRule:
+        room_id, office_id = instance.meeting_room_id, instance.associated_office_id
+    else:
+        room_id, office_id = RecurrenceRule.objects.filter(pk=instance.rule_id).values_list(
+            'meeting_room_id', 'associated_office_id'
+        ).first() or (None, None)
+    bump_feed_stamps([room_id], [office_id])
+    if room_id is not None and not kwargs.get('raw'):
+        from core.events import publish
+        # A series touches many days: calendars refresh the room's whole row
+        publish('bookings', {'room_id': room_id, 'days': None})
+
+@receiver([post_save, post_delete], sender=MeetingRoom)
+def bump_room_feed_stamp(sender, instance, **kwargs):
+    # The room name is in every event of its feed
+    bump_feed_stamps([instance.pk])
+
+
+# --- USAGE ROLLUP MAINTENANCE ---
+# Bulk inserts skip these signals; call bookings.usage.record_bookings_usage() after them.
+
+@receiver(post_save, sender=Booking)
+def update_usage_on_booking_save(sender, instance, created, raw=False, **kwargs):
+    from .usage import booking_saved
+    if not raw:
+        booking_saved(instance, created)
+
+@receiver(post_delete, sender=Booking)
+def update_usage_on_booking_delete(sender, instance, **kwargs):
+    from .usage import record_bookings_usage
+    record_bookings_usage([instance], sign=-1)
+
+@receiver(post_save, sender=RecurrenceRule)
+@receiver([post_save, post_delete], sender=RecurrenceException)
+def update_usage_on_series_change(sender, instance, raw=False, **kwargs):
+    from .usage import schedule_rule_usage_refresh
+    if not raw:
+        schedule_rule_usage_refresh(instance.pk if sender is RecurrenceRule else instance.rule_id)
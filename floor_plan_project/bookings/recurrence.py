@@ -0,0 +1,129 @@
+# bookings/recurrence.py
+#
+# The ONE place that turns stored bookings into occurrences for a time window.
+# Calendar, conflict checks and usage reports all read through here, so plain
+# Booking rows and RecurrenceRule series are treated the same everywhere.
+#
+# Every occurrence is a Booking object: real rows come straight from the database,
+# series occurrences are unsaved Booking instances (pk is None, `.rule` is set).
+
+import heapq
+from collections import defaultdict
+
+from .models import Booking, RecurrenceRule, RecurrenceException
+
+
+def _start_key(booking):
+    return booking.start_time
+
+
+def _make_occurrence(rule, start_time, end_time, title=None):
+    occurrence = Booking(
+        meeting_room_id=rule.meeting_room_id,
+        booked_by_id=rule.booked_by_id,
+        title=title or rule.title,
+        start_time=start_time,
+        end_time=end_time,
+        associated_office_id=rule.associated_office_id,
+        recurrence_id=rule.recurrence_id,
+    )
+    occurrence.rule = rule
+    # Reuse whatever the rule already loaded instead of querying it again per occurrence
+    for relation in ('meeting_room', 'booked_by', 'associated_office'):
+        if getattr(RecurrenceRule, relation).is_cached(rule):
+            setattr(occurrence, relation, getattr(rule, relation))
+    return occurrence
+
+
+def expand_rule(rule, window_start=None, window_end=None, exceptions=()):
+    """
+    Lazily yields the occurrences of `rule` that overlap [window_start, window_end), in start order.
+    Either bound may be None. Cancelled occurrences are skipped and overridden ones are moved.
+    """
+    duration = rule.duration
+    cancelled = set()
+    overridden = set()
+    moved = []
+    for exception in exceptions:
+        if exception.is_cancelled:
+            cancelled.add(exception.original_start)
+            continue
+        overridden.add(exception.original_start)
+        start_time = exception.start_time or exception.original_start
+        end_time = exception.end_time or start_time + duration
+        if (window_end is None or start_time < window_end) and (window_start is None or end_time > window_start):
+            moved.append(_make_occurrence(rule, start_time, end_time, exception.title))
+    moved.sort(key=_start_key)
+
+    def from_rule():
+        rule_set = rule.to_rrule()
+        # Anything starting at or before (window_start - duration) has already ended
+        starts = rule_set.xafter(window_start - duration) if window_start is not None else iter(rule_set)
+        for start_time in starts:
+            if window_end is not None and start_time >= window_end:
+                return
+            if start_time in cancelled or start_time in overridden:
+                continue
+            yield _make_occurrence(rule, start_time, start_time + duration)
+
+    return heapq.merge(from_rule(), moved, key=_start_key)
+
+
+def rules_in_window(window_start=None, window_end=None, meeting_room=None):
+    """Rules with at least one occurrence that can overlap the window."""
+    rules = RecurrenceRule.objects.select_related('meeting_room', 'booked_by', 'associated_office')
+    if window_end is not None:
+        rules = rules.filter(start_time__lt=window_end)
+    if window_start is not None:
+        rules = rules.filter(series_end__gt=window_start)
+    if meeting_room is not None:
+        rules = rules.filter(meeting_room=meeting_room)
+    return rules
+
+
+def expand_rules(window_start=None, window_end=None, meeting_room=None, rules=None):
+    """
+    Yields the occurrences of every rule overlapping the window, merged in start order.
+    Loads the rules and all of their exceptions in two queries.
+    """
+    if rules is None:
+        rules = rules_in_window(window_start, window_end, meeting_room)
+    # Sorted by id so that, at equal start times, occurrences come out in a stable order
+    rules = sorted(rules, key=lambda rule: rule.pk)
+    if not rules:
+        return iter(())
+
+    exceptions_by_rule = defaultdict(list)
+    for exception in RecurrenceException.objects.filter(rule__in=rules):
+        exceptions_by_rule[exception.rule_id].append(exception)
+
+    return heapq.merge(
+        *(expand_rule(rule, window_start, window_end, exceptions_by_rule[rule.pk]) for rule in rules),
+        key=_start_key
+    )
+
+
+def occurrences_in_window(window_start=None, window_end=None, meeting_room=None, bookings=None, exclude_pks=None, rules=None):
+    """
+    Every booking occurrence overlapping the window (plain rows and expanded series), in start order.
+
+    `bookings` can be a pre-filtered Booking queryset (e.g. with select_related);
+    the window and room filters are applied on top of it. `rules` likewise
+    replaces the default rules_in_window() lookup.
+    """
+    if bookings is None:
+        bookings = Booking.objects.all()
+    if window_end is not None:
+        bookings = bookings.filter(start_time__lt=window_end)
+    if window_start is not None:
+        bookings = bookings.filter(end_time__gt=window_start)
+    if meeting_room is not None:
+        bookings = bookings.filter(meeting_room=meeting_room)
+    if exclude_pks:
+        bookings = bookings.exclude(pk__in=exclude_pks)
+
+    return heapq.merge(
+        bookings.order_by('start_time').iterator(),
+        expand_rules(window_start, window_end, meeting_room, rules=rules),
+        key=_start_key
+    )
@@ -0,0 +1,58 @@
+# bookings/reservations.py
+#
+# Writing bookings without double-booking a room.
+#
+# BookingForm.clean() checks for clashes, but outside the transaction that writes the
+# booking, so two receptionists can both pass it for the same slot. Every write here
+# runs in a transaction that first locks the MeetingRoom row (SELECT ... FOR UPDATE),
+# then re-checks and saves. Writers for the same room queue up behind that lock;
+# writers for different rooms lock different rows and don't wait for each other.
+#
+# SQLite has no row locks: there the settings make every transaction BEGIN IMMEDIATE,
+# which takes SQLite's single write lock up front, so the re-check can't go stale either
+# (but all writers are serialised, whatever the room).
+
+from django.db import transaction
+
+from .models import MeetingRoom
+from .conflicts import find_conflicts, conflict_message
+from .recurrence import expand_rule
+
+
+class BookingConflictError(Exception):
+    def __init__(self, meeting_room, conflicts):
+        self.meeting_room = meeting_room
+        self.conflicts = conflicts
+        super().__init__(conflict_message(meeting_room, conflicts))
+
+
+def lock_rooms(room_ids):
+    """
+    Locks the given MeetingRoom rows until the end of the current transaction.
+    Always in pk order, so two writers locking several rooms can't deadlock.
+    """
+    return list(MeetingRoom.objects.select_for_update().filter(pk__in=room_ids).order_by('pk'))
+
+
+def save_booking(booking):
+    """Saves a new or edited Booking, or raises BookingConflictError."""
+    with transaction.atomic():
+        room, = lock_rooms([booking.meeting_room_id])
+        exclude_pks = [booking.pk] if booking.pk else None
+        conflicts = find_conflicts(room, [(booking.start_time, booking.end_time)], exclude_pks=exclude_pks)
+        if conflicts:
+            raise BookingConflictError(room, conflicts)
+        booking.save()
+    return booking
+
+
+def create_series(rule):
+    """Saves a NEW RecurrenceRule if none of its occurrences clash, or raises BookingConflictError."""
+    with transaction.atomic():
+        room, = lock_rooms([rule.meeting_room_id])
+        occurrences = [(occurrence.start_time, occurrence.end_time) for occurrence in expand_rule(rule)]
+        conflicts = find_conflicts(room, occurrences)
+        if conflicts:
+            raise BookingConflictError(room, conflicts)
+        rule.save()
+    return rule
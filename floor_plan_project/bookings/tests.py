@@ -1,3 +1,677 @@
 from django.test import TestCase
+from django.utils import timezone
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from bookings.models import MeetingRoom, Booking, RecurrenceRule, RecurrenceException, MonthlyOfficeUsage, CalendarFeedStamp, get_booking_version
+from bookings.forms import BookingForm
+from bookings.conflicts import build_occurrences, find_conflicts, sweep_overlaps
+from bookings.calendar_grid import build_week_grid, get_week_grid
+from bookings.recurrence import expand_rule, occurrences_in_window
+from bookings.availability import merge_busy, free_slots
+from bookings.usage import usage_by_office, rebuild_usage_rollup
+from bookings.importer import parse_csv, parse_ics, import_bookings
+from bookings.ical import feed_token, fold
+from bookings.analytics import utilisation_matrix, utilisation_report
+from bookings.reservations import save_booking, create_series, BookingConflictError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from offices.models import Office
+from django.apps import apps as django_apps
+import datetime
+import importlib
+import io
+from unittest import mock
 
-# Create your tests here.
+
+def aware(*args):
+    return timezone.make_aware(datetime.datetime(*args))
+
+
+class RecurringConflictTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reception', password='pass')
+        self.room = MeetingRoom.objects.create(name="Board Room", capacity=12)
+        self.other_room = MeetingRoom.objects.create(name="Small Room", capacity=4)
+
+    def test_weekly_series_expansion(self):
+        occurrences = build_occurrences(
+            aware(2030, 1, 7, 10), aware(2030, 1, 7, 11), 'weekly', datetime.date(2030, 2, 4)
+        )
+        self.assertEqual(len(occurrences), 5)
+        self.assertEqual(occurrences[-1][0], aware(2030, 2, 4, 10))
+
+    def test_sweep_reports_every_clashing_occurrence(self):
+        occurrences = [(1, 2), (3, 4), (5, 6), (7, 8)]
+        existing = [(0, 10, 'long'), (3, 4, 'exact'), (6, 7, 'touching')]
+        clashes = sweep_overlaps(occurrences, existing)
+        self.assertEqual([occ for occ, _ in clashes], occurrences)
+        self.assertEqual(clashes[1][1], ['exact', 'long'])
+
+    def test_conflict_on_later_occurrence_is_detected(self):
+        # Clashes with the third week only, which the old check never looked at
+        Booking.objects.create(
+            meeting_room=self.room, title="Existing",
+            start_time=aware(2030, 1, 21, 10, 30), end_time=aware(2030, 1, 21, 11, 30)
+        )
+        Booking.objects.create(
+            meeting_room=self.other_room, title="Other room",
+            start_time=aware(2030, 1, 7, 10), end_time=aware(2030, 1, 7, 11)
+        )
+        occurrences = build_occurrences(
+            aware(2030, 1, 7, 10), aware(2030, 1, 7, 11), 'weekly', datetime.date(2030, 2, 4)
+        )
+        conflicts = find_conflicts(self.room, occurrences)
+        self.assertEqual(len(conflicts), 1)
+        self.assertEqual(conflicts[0][0][0], aware(2030, 1, 21, 10))
+
+        form = BookingForm(data={
+            'meeting_room': self.room.pk,
+            'title': 'Weekly sync',
+            'start_time': '2030-01-07T10:00',
+            'end_time': '2030-01-07T11:00',
+            'recurrence': 'weekly',
+            'end_recurrence': '2030-02-04',
+        }, user=self.user)
+        self.assertFalse(form.is_valid())
+        self.assertIn('2030-01-21 10:00', str(form.non_field_errors()))
+
+    def test_recurring_series_created_when_free(self):
+        self.client.force_login(self.user)
+        response = self.client.post('/bookings/new/', {
+            'meeting_room': self.room.pk,
+            'title': 'Daily standup',
+            'start_time': '2030-03-04T09:00',
+            'end_time': '2030-03-04T09:15',
+            'recurrence': 'daily',
+            'end_recurrence': '2030-03-08',
+        })
+        self.assertEqual(response.status_code, 302)
+        # Stored as one rule, not five rows
+        self.assertEqual(Booking.objects.count(), 0)
+        rule = RecurrenceRule.objects.get()
+        self.assertEqual(len(list(expand_rule(rule))), 5)
+
+    def test_existing_series_blocks_new_booking(self):
+        RecurrenceRule.objects.create(
+            meeting_room=self.room, title="Standing meeting", frequency='weekly',
+            start_time=aware(2030, 1, 7, 10), end_time=aware(2030, 1, 7, 11), until=datetime.date(2030, 12, 31)
+        )
+        conflicts = find_conflicts(self.room, [(aware(2030, 6, 3, 10, 30), aware(2030, 6, 3, 12))])
+        self.assertEqual(len(conflicts), 1)
+        self.assertEqual(conflicts[0][1][0].title, "Standing meeting")
+
+
+class LockedBookingWriteTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reception', password='pass')
+        self.room = MeetingRoom.objects.create(name="Board Room", capacity=12)
+        Booking.objects.create(
+            meeting_room=self.room, title="Existing",
+            start_time=aware(2030, 1, 7, 10), end_time=aware(2030, 1, 7, 11)
+        )
+
+    def test_save_booking_rechecks_under_the_lock(self):
+        clash = Booking(meeting_room=self.room, title="Clash", start_time=aware(2030, 1, 7, 10, 30), end_time=aware(2030, 1, 7, 12))
+        with self.assertRaises(BookingConflictError):
+            save_booking(clash)
+        fine = save_booking(Booking(meeting_room=self.room, title="Fine", start_time=aware(2030, 1, 7, 11), end_time=aware(2030, 1, 7, 12)))
+        self.assertIsNotNone(fine.pk)
+
+        rule = RecurrenceRule(
+            meeting_room=self.room, title="Daily", frequency='daily',
+            start_time=aware(2030, 1, 5, 10), end_time=aware(2030, 1, 5, 10, 30), until=datetime.date(2030, 1, 10)
+        )
+        with self.assertRaises(BookingConflictError):
+            create_series(rule)
+        self.assertFalse(RecurrenceRule.objects.exists())
+
+    def test_view_rejects_a_booking_made_after_the_form_check(self):
+        # Simulate the race: someone else books the slot after BookingForm.clean() passed
+        self.client.force_login(self.user)
+        with mock.patch('bookings.forms.find_conflicts', return_value=[]):
+            response = self.client.post('/bookings/new/', {
+                'meeting_room': self.room.pk, 'title': 'Late', 'recurrence': 'none',
+                'start_time': '2030-01-07T10:30', 'end_time': '2030-01-07T11:30',
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "already booked")
+        self.assertEqual(Booking.objects.count(), 1)
+
+
+class WeekGridTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.room = MeetingRoom.objects.create(name="Board Room", capacity=12)
+        self.monday = datetime.date(2030, 1, 7)
+
+    def test_overnight_booking_appears_on_every_day(self):
+        Booking.objects.create(
+            meeting_room=self.room, title="Overnight",
+            start_time=aware(2030, 1, 8, 22), end_time=aware(2030, 1, 10, 2)
+        )
+        # Started the week before, ends exactly at midnight on Monday: not shown
+        Booking.objects.create(
+            meeting_room=self.room, title="Last week",
+            start_time=aware(2030, 1, 6, 20), end_time=aware(2030, 1, 7, 0)
+        )
+        row = build_week_grid(self.monday)[0]
+        titles = [[b.title for b in day] for day in row['days']]
+        self.assertEqual(titles[:4], [[], ['Overnight'], ['Overnight'], ['Overnight']])
+        self.assertEqual(titles[4:], [[], [], []])
+
+    def test_grid_is_cached_until_a_booking_changes(self):
+        get_week_grid(self.monday)
+        # Only the version counter is read
+        with self.assertNumQueries(1):
+            get_week_grid(self.monday)
+
+        Booking.objects.create(
+            meeting_room=self.room, title="New",
+            start_time=aware(2030, 1, 9, 9), end_time=aware(2030, 1, 9, 10)
+        )
+        grid = get_week_grid(self.monday)
+        self.assertEqual(grid[0]['days'][2][0].title, "New")
+
+    def test_version_is_shared_through_the_database(self):
+        version = get_booking_version()
+        # Another worker has its own (empty) cache but reads the same counter
+        cache.clear()
+        self.assertEqual(get_booking_version(), version)
+        Booking.objects.create(
+            meeting_room=self.room, title="New",
+            start_time=aware(2030, 1, 9, 9), end_time=aware(2030, 1, 9, 10)
+        )
+        self.assertGreater(get_booking_version(), version)
+
+    def test_calendar_row_api_returns_rendered_cells(self):
+        user = User.objects.create_user(username='staff', password='pass')
+        self.client.force_login(user)
+        Booking.objects.create(
+            meeting_room=self.room, title="New",
+            start_time=aware(2030, 1, 9, 9), end_time=aware(2030, 1, 9, 10)
+        )
+        data = self.client.get('/bookings/api/calendar-row/', {'week': '2030-01-10', 'room': self.room.pk}).json()
+        self.assertEqual(len(data['cells']), 7)
+        self.assertIn("New", data['cells']['2030-01-09'])
+        self.assertNotIn("New", data['cells']['2030-01-08'])
+        # The page itself renders the same cells
+        page = self.client.get('/bookings/', {'day': '2030-01-09'})
+        self.assertContains(page, data['cells']['2030-01-09'], html=False)
+        self.assertContains(page, f'/bookings/ical/room/{self.room.pk}.ics?token=')
+
+    def test_booking_changes_name_the_cells_to_refresh(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            booking = Booking.objects.create(
+                meeting_room=self.room, title="Overnight",
+                start_time=aware(2030, 1, 8, 22), end_time=aware(2030, 1, 9, 2)
+            )
+        published = []
+        with mock.patch('core.events.InProcessBroadcaster.publish', lambda self, *event: published.append(event)):
+            for callback in callbacks:
+                callback()
+            booking = Booking.objects.get(pk=booking.pk)
+            booking.start_time, booking.end_time = aware(2030, 1, 11, 9), aware(2030, 1, 11, 10)
+            with self.captureOnCommitCallbacks(execute=True):
+                booking.save()
+        self.assertEqual(published, [
+            ('bookings', {'room_id': self.room.pk, 'days': ['2030-01-08', '2030-01-09']}),
+            ('bookings', {'room_id': self.room.pk, 'days': ['2030-01-08', '2030-01-09', '2030-01-11']}),
+        ])
+
+
+class RecurrenceExpansionTests(TestCase):
+    def setUp(self):
+        self.room = MeetingRoom.objects.create(name="Board Room", capacity=12)
+        self.rule = RecurrenceRule.objects.create(
+            meeting_room=self.room, title="Weekly sync", frequency='weekly',
+            start_time=aware(2030, 1, 7, 10), end_time=aware(2030, 1, 7, 11), until=datetime.date(2030, 3, 31)
+        )
+
+    def test_series_end_is_last_occurrence_end(self):
+        self.assertEqual(self.rule.series_end, aware(2030, 3, 25, 11))
+
+    def test_only_the_requested_window_is_expanded(self):
+        occurrences = list(expand_rule(self.rule, aware(2030, 2, 1), aware(2030, 2, 15)))
+        self.assertEqual([o.start_time for o in occurrences], [aware(2030, 2, 4, 10), aware(2030, 2, 11, 10)])
+        self.assertIsNone(occurrences[0].pk)
+
+    def test_exceptions_cancel_and_move_occurrences(self):
+        RecurrenceException.objects.create(rule=self.rule, original_start=aware(2030, 2, 4, 10), is_cancelled=True)
+        RecurrenceException.objects.create(
+            rule=self.rule, original_start=aware(2030, 2, 11, 10),
+            start_time=aware(2030, 2, 12, 15), end_time=aware(2030, 2, 12, 16), title="Moved sync"
+        )
+        Booking.objects.create(
+            meeting_room=self.room, title="One-off",
+            start_time=aware(2030, 2, 12, 9), end_time=aware(2030, 2, 12, 10)
+        )
+        occurrences = list(occurrences_in_window(aware(2030, 2, 1), aware(2030, 2, 15)))
+        self.assertEqual(
+            [(o.title, o.start_time) for o in occurrences],
+            [("One-off", aware(2030, 2, 12, 9)), ("Moved sync", aware(2030, 2, 12, 15))]
+        )
+
+
+class AvailabilityTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='manager', password='pass')
+        self.big_room = MeetingRoom.objects.create(name="Board Room", capacity=12)
+        self.small_room = MeetingRoom.objects.create(name="Small Room", capacity=4)
+
+    def test_sweep_merges_busy_blocks_and_keeps_long_enough_gaps(self):
+        busy = merge_busy([(1, 3), (2, 4), (6, 7), (7, 8)])
+        self.assertEqual(busy, [[1, 4], [6, 8]])
+        self.assertEqual(free_slots(busy, [(0, 10)], 2), [(4, 6), (8, 10)])
+        self.assertEqual(free_slots(busy, [(0, 5), (5, 9)], 1), [(0, 1), (4, 5), (5, 6), (8, 9)])
+
+    def test_api_returns_free_slots_for_rooms_with_enough_capacity(self):
+        Booking.objects.create(
+            meeting_room=self.big_room, title="Busy",
+            start_time=aware(2030, 1, 7, 14, 30), end_time=aware(2030, 1, 7, 15)
+        )
+        RecurrenceRule.objects.create(
+            meeting_room=self.big_room, title="Daily", frequency='daily',
+            start_time=aware(2030, 1, 8, 14), end_time=aware(2030, 1, 8, 14, 30), until=datetime.date(2030, 1, 8)
+        )
+        self.client.force_login(self.user)
+        response = self.client.get('/bookings/api/availability/', {
+            'start': '2030-01-07', 'end': '2030-01-09',
+            'time_from': '14:00', 'time_to': '15:30', 'duration': 30, 'capacity': 10,
+        })
+        self.assertEqual(response.status_code, 200)
+        rooms = response.json()['rooms']
+        self.assertEqual([room['name'] for room in rooms], ["Board Room"])
+        slots = [(slot['start'], slot['end']) for slot in rooms[0]['free_slots']]
+        self.assertEqual(slots, [
+            ('2030-01-07T14:00:00Z', '2030-01-07T14:30:00Z'),
+            ('2030-01-07T15:00:00Z', '2030-01-07T15:30:00Z'),
+            ('2030-01-08T14:30:00Z', '2030-01-08T15:30:00Z'),
+        ])
+
+    def test_api_rejects_bad_windows(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/bookings/api/availability/', {'start': '2030-01-09', 'end': '2030-01-07'})
+        self.assertEqual(response.status_code, 400)
+
+
+class UsageRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='manager', password='pass')
+        self.room = MeetingRoom.objects.create(name="Board Room", capacity=12)
+        self.office = Office.objects.get(office_number=1)
+        self.other_office = Office.objects.get(office_number=2)
+
+    def usage(self, office, month):
+        return usage_by_office(month, month).get(office.pk, (0, 0))
+
+    def test_booking_changes_update_the_rollup(self):
+        booking = Booking.objects.create(
+            meeting_room=self.room, title="Review", associated_office=self.office,
+            start_time=aware(2030, 1, 10, 9), end_time=aware(2030, 1, 10, 11)
+        )
+        self.assertEqual(self.usage(self.office, datetime.date(2030, 1, 1)), (7200, 1))
+
+        booking = Booking.objects.get(pk=booking.pk)
+        booking.start_time = aware(2030, 2, 3, 9)
+        booking.end_time = aware(2030, 2, 3, 10)
+        booking.associated_office = self.other_office
+        booking.save()
+        self.assertEqual(self.usage(self.office, datetime.date(2030, 1, 1)), (0, 0))
+        self.assertEqual(self.usage(self.other_office, datetime.date(2030, 2, 1)), (3600, 1))
+
+        booking.delete()
+        self.assertEqual(self.usage(self.other_office, datetime.date(2030, 2, 1)), (0, 0))
+
+    def test_series_and_rebuild_agree(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            rule = RecurrenceRule.objects.create(
+                meeting_room=self.room, title="Weekly", frequency='weekly', associated_office=self.office,
+                start_time=aware(2030, 1, 28, 10), end_time=aware(2030, 1, 28, 11), until=datetime.date(2030, 2, 28)
+            )
+        self.assertEqual(self.usage(self.office, datetime.date(2030, 1, 1)), (3600, 1))
+        self.assertEqual(self.usage(self.office, datetime.date(2030, 2, 1)), (4 * 3600, 4))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RecurrenceException.objects.create(rule=rule, original_start=aware(2030, 2, 4, 10), is_cancelled=True)
+        self.assertEqual(self.usage(self.office, datetime.date(2030, 2, 1)), (3 * 3600, 3))
+
+        before = list(MonthlyOfficeUsage.objects.order_by('month').values_list('month', 'booked_seconds', 'booking_count'))
+        rebuild_usage_rollup()
+        after = list(MonthlyOfficeUsage.objects.order_by('month').values_list('month', 'booked_seconds', 'booking_count'))
+        self.assertEqual(before, after)
+
+    def test_bookings_made_before_the_rollup_are_backfilled_and_can_be_deleted(self):
+        bookings = [
+            Booking.objects.create(
+                meeting_room=self.room, title=f"Old {day}", associated_office=self.office,
+                start_time=aware(2030, 1, day, 9), end_time=aware(2030, 1, day, 10)
+            )
+            for day in (7, 8)
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            RecurrenceRule.objects.create(
+                meeting_room=self.room, title="Daily", frequency='daily', associated_office=self.office,
+                start_time=aware(2030, 1, 14, 10), end_time=aware(2030, 1, 14, 10, 30), until=datetime.date(2030, 1, 16)
+            )
+        expected = list(MonthlyOfficeUsage.objects.order_by('month', 'rule').values_list('month', 'rule', 'booked_seconds', 'booking_count'))
+
+        # As it was before the rollup existed: nothing counted
+        MonthlyOfficeUsage.objects.all().delete()
+        Booking.objects.create(
+            meeting_room=self.room, title="New", associated_office=self.office,
+            start_time=aware(2030, 1, 9, 9), end_time=aware(2030, 1, 9, 10)
+        )
+        for booking in bookings:
+            booking.delete()
+        self.assertEqual(self.usage(self.office, datetime.date(2030, 1, 1)), (0, 0))
+
+        importlib.import_module('bookings.migrations.0009_backfill_monthly_usage').fill_usage(django_apps, None)
+        expected[0] = (datetime.date(2030, 1, 1), None, 3600, 1)  # the two old bookings are gone, "New" is counted
+        self.assertEqual(
+            list(MonthlyOfficeUsage.objects.order_by('month', 'rule').values_list('month', 'rule', 'booked_seconds', 'booking_count')),
+            expected,
+        )
+
+    def test_api_accepts_a_month_range(self):
+        for month in (1, 2, 3):
+            Booking.objects.create(
+                meeting_room=self.room, title="Monthly", associated_office=self.office,
+                start_time=aware(2030, month, 5, 9), end_time=aware(2030, month, 5, 10, 30)
+            )
+        self.client.force_login(self.user)
+        response = self.client.get('/bookings/api/reports/usage/', {'from': '2030-01', 'to': '2030-02'})
+        row = next(item for item in response.json() if item['office_number'] == 1)
+        self.assertEqual((row['total_hours'], row['booking_count']), (3.0, 2))
+        self.assertEqual(self.client.get('/bookings/api/reports/usage/', {'from': '2030-13'}).status_code, 400)
+
+
+class UpcomingFeedTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='manager', password='pass')
+        self.room = MeetingRoom.objects.create(name="Board Room", capacity=12)
+        self.other_room = MeetingRoom.objects.create(name="Small Room", capacity=4)
+        start = timezone.now().replace(microsecond=0) + datetime.timedelta(days=1)
+        # Plain bookings and a daily series that start at the same moments, to exercise the tie-breaks
+        for day in range(5):
+            Booking.objects.create(
+                meeting_room=self.room, title=f"Booking {day}",
+                start_time=start + datetime.timedelta(days=day), end_time=start + datetime.timedelta(days=day, hours=1)
+            )
+        RecurrenceRule.objects.create(
+            meeting_room=self.other_room, title="Daily", frequency='daily',
+            start_time=start, end_time=start + datetime.timedelta(hours=1),
+            until=(start + datetime.timedelta(days=4)).date()
+        )
+        # In the past: never listed
+        Booking.objects.create(
+            meeting_room=self.room, title="Old",
+            start_time=start - datetime.timedelta(days=3), end_time=start - datetime.timedelta(days=3, hours=-1)
+        )
+
+    def walk(self, **params):
+        self.client.force_login(self.user)
+        seen, cursor = [], None
+        while True:
+            query = dict(params, page_size=3)
+            if cursor:
+                query['cursor'] = cursor
+            data = self.client.get('/bookings/api/upcoming/', query).json()
+            seen.extend(item['title'] for item in data['results'])
+            cursor = data['next_cursor']
+            if not cursor:
+                return seen
+
+    def test_pages_cover_every_upcoming_booking_once_in_order(self):
+        titles = self.walk()
+        self.assertEqual(len(titles), 10)
+        self.assertEqual(titles[:4], ["Booking 0", "Daily", "Booking 1", "Daily"])
+
+    def test_filters(self):
+        self.assertEqual(self.walk(room=self.other_room.pk), ["Daily"] * 5)
+        day_after_tomorrow = timezone.localdate() + datetime.timedelta(days=2)
+        self.assertEqual(len(self.walk(**{"from": day_after_tomorrow.isoformat(), "to": day_after_tomorrow.isoformat()})), 2)
+
+    def test_page_cost_does_not_grow_with_future_bookings(self):
+        self.client.force_login(self.user)
+        self.client.get('/bookings/reception/')
+        with self.assertNumQueries(7) as first:
+            self.client.get('/bookings/reception/')
+        start = timezone.now() + datetime.timedelta(days=30)
+        Booking.objects.bulk_create([
+            Booking(meeting_room=self.room, title="Later", start_time=start + datetime.timedelta(hours=i),
+                    end_time=start + datetime.timedelta(hours=i, minutes=30))
+            for i in range(300)
+        ])
+        with self.assertNumQueries(len(first.captured_queries)):
+            response = self.client.get('/bookings/reception/')
+        self.assertEqual(len(response.context['upcoming_bookings']), 50)
+
+
+class BookingImportTests(TestCase):
+    def setUp(self):
+        self.room = MeetingRoom.objects.create(name="Board Room", capacity=12)
+        self.office = Office.objects.get(office_number=1)
+        Booking.objects.create(
+            meeting_room=self.room, title="Existing",
+            start_time=aware(2030, 3, 4, 10), end_time=aware(2030, 3, 4, 11)
+        )
+
+    def test_csv_import_rejects_conflicts_and_bad_rows(self):
+        data = io.StringIO(
+            "room,title,start,end,office\n"
+            "board room,Fine,2030-03-04T08:00:00,2030-03-04T09:00:00,1\n"
+            "Board Room,Clashes with existing,2030-03-04T10:30:00,2030-03-04T11:30:00,\n"
+            "Board Room,First in file,2030-03-05T09:00:00,2030-03-05T10:00:00,\n"
+            "Board Room,Clashes with line 4,2030-03-05T09:30:00,2030-03-05T10:30:00,\n"
+            "Nowhere,Unknown room,2030-03-05T09:00:00,2030-03-05T10:00:00,\n"
+            "Board Room,Backwards,2030-03-06T10:00:00,2030-03-06T09:00:00,\n"
+            "Board Room,Bad date,tomorrow,2030-03-06T09:00:00,\n"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            result = import_bookings(parse_csv(data))
+
+        self.assertEqual(result.created, 2)
+        reasons = dict(result.rejections)
+        self.assertEqual(sorted(reasons), [3, 5, 6, 7, 8])
+        self.assertIn("Existing", reasons[3])
+        self.assertIn("line 4", reasons[5])
+        self.assertIn("unknown room", reasons[6])
+        self.assertEqual(
+            sorted(Booking.objects.values_list('title', flat=True)), ["Existing", "Fine", "First in file"]
+        )
+        # bulk_create skips the signals, so the import updates the rollup itself
+        self.assertEqual(MonthlyOfficeUsage.objects.get(office=self.office).booked_seconds, 3600)
+
+    def test_rows_of_different_lengths_are_checked_exactly(self):
+        Booking.objects.create(
+            meeting_room=self.room, title="Late", start_time=aware(2030, 3, 5, 16), end_time=aware(2030, 3, 5, 16, 30)
+        )
+        data = io.StringIO(
+            "room,title,start,end\n"
+            "Board Room,All day,2030-03-05T09:00:00,2030-03-05T17:00:00\n"
+            "Board Room,Short,2030-03-05T10:00:00,2030-03-05T10:30:00\n"
+        )
+        result = import_bookings(parse_csv(data))
+        # Only the long row reaches "Late"; the short one is over hours before it starts
+        self.assertEqual(result.created, 1)
+        self.assertEqual(list(dict(result.rejections)), [2])
+        self.assertIn('"Late"', dict(result.rejections)[2])
+        self.assertTrue(Booking.objects.filter(title="Short").exists())
+
+    def test_dry_run_writes_nothing(self):
+        data = io.StringIO("room,title,start,end\nBoard Room,Fine,2030-03-04T08:00:00,2030-03-04T09:00:00\n")
+        result = import_bookings(parse_csv(data), dry_run=True)
+        self.assertEqual(result.created, 1)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_ics_events_are_parsed(self):
+        data = io.StringIO(
+            "BEGIN:VCALENDAR\r\n"
+            "BEGIN:VEVENT\r\n"
+            "SUMMARY:Quarterly\r\n  review\r\n"
+            "LOCATION:Board Room\r\n"
+            "DTSTART:20300304T080000Z\r\n"
+            "DURATION:PT1H30M\r\n"
+            "END:VEVENT\r\n"
+            "BEGIN:VEVENT\r\n"
+            "SUMMARY:Weekly\r\n"
+            "LOCATION:Board Room\r\n"
+            "DTSTART:20300305T080000Z\r\n"
+            "DTEND:20300305T090000Z\r\n"
+            "RRULE:FREQ=WEEKLY\r\n"
+            "END:VEVENT\r\n"
+            "END:VCALENDAR\r\n"
+        )
+        rows = list(parse_ics(data))
+        self.assertEqual(rows[0].title, "Quarterly review")
+        self.assertEqual(rows[0].end - rows[0].start, datetime.timedelta(minutes=90))
+        self.assertIsNone(rows[0].error)
+        self.assertIn("recurring", rows[1].error)
+
+
+class ICalFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='staff', password='pass')
+        self.room = MeetingRoom.objects.create(name="Board Room", capacity=12)
+        self.office = Office.objects.get(office_number=1)
+        start = timezone.now().replace(microsecond=0) + datetime.timedelta(days=1)
+        Booking.objects.create(
+            meeting_room=self.room, title="Planning, Q3", associated_office=self.office,
+            start_time=start, end_time=start + datetime.timedelta(hours=1)
+        )
+        rule = RecurrenceRule.objects.create(
+            meeting_room=self.room, title="Standup", frequency='daily',
+            start_time=start + datetime.timedelta(hours=2), end_time=start + datetime.timedelta(hours=2, minutes=15),
+            until=(start + datetime.timedelta(days=5)).date()
+        )
+        RecurrenceException.objects.create(rule=rule, original_start=rule.start_time, is_cancelled=True)
+        self.url = f'/bookings/ical/room/{self.room.pk}.ics'
+
+    def fetch(self, url, **headers):
+        response = self.client.get(url, {'token': feed_token(self.user)}, **headers)
+        body = b''.join(response.streaming_content).decode() if response.status_code == 200 else ''
+        return response, body
+
+    def test_feed_lists_bookings_and_series(self):
+        response, body = self.fetch(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('SUMMARY:Planning\\, Q3', body)
+        self.assertIn('RRULE:FREQ=DAILY;INTERVAL=1;UNTIL=', body)
+        self.assertIn('EXDATE;TZID=', body)
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n') and body.endswith('END:VCALENDAR\r\n'))
+
+        response, body = self.fetch(f'/bookings/ical/office/{self.office.office_number}.ics')
+        self.assertIn('Planning', body)
+        self.assertNotIn('Standup', body)
+
+    def test_unchanged_feed_is_not_modified_without_reading_bookings(self):
+        response, _ = self.fetch(self.url)
+        etag = response['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response, _ = self.fetch(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # Only the feed's stamp is read
+        reads = [q['sql'] for q in queries.captured_queries if 'bookings_' in q['sql']]
+        self.assertEqual(len(reads), 1)
+        self.assertIn('bookings_calendarfeedstamp', reads[0])
+
+        # Any change to the room's bookings changes the ETag
+        Booking.objects.create(
+            meeting_room=self.room, title="New", start_time=timezone.now() + datetime.timedelta(days=3),
+            end_time=timezone.now() + datetime.timedelta(days=3, hours=1)
+        )
+        response, body = self.fetch(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('SUMMARY:New', body)
+
+    def test_etag_is_shared_through_the_database(self):
+        # Another worker has a cache of its own, so the stamp can't live there
+        response, _ = self.fetch(self.url)
+        cache.clear()
+        response, _ = self.fetch(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    async def test_feed_streams_under_asgi(self):
+        user = await User.objects.aget(username='staff')
+        response = await self.async_client.get(self.url, {'token': feed_token(user)})
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertIn('SUMMARY:Planning\\, Q3', body)
+        self.assertTrue(body.endswith('END:VCALENDAR\r\n'))
+
+    def test_calendar_page_links_each_room_feed(self):
+        # The grid rows are plain dicts, so the link must use the room's 'id'
+        self.client.force_login(self.user)
+        response = self.client.get('/bookings/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, f'href="/bookings/ical/room/{self.room.pk}.ics?token=')
+
+    def test_unknown_room_leaves_no_stamp_behind(self):
+        response, _ = self.fetch('/bookings/ical/room/999999.ics')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(CalendarFeedStamp.objects.filter(kind='room', object_id=999999).exists())
+
+    def test_token_is_required_without_a_session(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.assertEqual(self.client.get(self.url, {'token': 'forged:token'}).status_code, 403)
+
+    def test_long_lines_are_folded(self):
+        folded = fold('SUMMARY:' + 'é' * 60)
+        self.assertTrue(all(len(line.encode()) <= 75 for line in folded.split('\r\n')))
+        self.assertEqual(folded.replace('\r\n ', ''), 'SUMMARY:' + 'é' * 60 + '\r\n')
+
+
+class UtilisationHeatmapTests(TestCase):
+    def setUp(self):
+        self.room = MeetingRoom.objects.create(name="A Room", capacity=12)
+        self.empty_room = MeetingRoom.objects.create(name="B Room", capacity=4)
+        self.monday = datetime.date(2030, 1, 7)
+        self.sunday = datetime.date(2030, 1, 13)
+        Booking.objects.create(meeting_room=self.room, title="Hour", start_time=aware(2030, 1, 7, 10), end_time=aware(2030, 1, 7, 11))
+        # Inside the hour above: a room can't be more than fully used
+        Booking.objects.create(meeting_room=self.room, title="Overlap", start_time=aware(2030, 1, 7, 10, 5), end_time=aware(2030, 1, 7, 10, 15))
+        # Two thirds of one slot
+        Booking.objects.create(meeting_room=self.room, title="Short", start_time=aware(2030, 1, 8, 9, 5), end_time=aware(2030, 1, 8, 9, 15))
+        RecurrenceRule.objects.create(
+            meeting_room=self.room, title="Daily", frequency='daily',
+            start_time=aware(2030, 1, 9, 14), end_time=aware(2030, 1, 9, 14, 30), until=datetime.date(2030, 1, 11)
+        )
+
+    def test_matrix_counts_partial_slots_and_series(self):
+        matrix, days_per_weekday = utilisation_matrix(self.monday, self.sunday, [self.room.pk, self.empty_room.pk])
+        self.assertEqual(matrix.shape, (2, 7, 96))
+        self.assertEqual(list(days_per_weekday), [1] * 7)
+        self.assertEqual(list(matrix[0, 0, 39:45]), [0, 1, 1, 1, 1, 0])
+        self.assertAlmostEqual(matrix[0, 1, 36], 2 / 3)
+        for weekday in (2, 3, 4):
+            self.assertEqual(list(matrix[0, weekday, 56:58]), [1, 1])
+        self.assertEqual(matrix[1].sum(), 0)
+
+    def test_report_and_api(self):
+        report = utilisation_report(self.monday, self.sunday)
+        room, empty_room = report['rooms']
+        # (4 + 2/3 + 3 * 2) slots out of 5 days x 40 slots
+        self.assertEqual(room['utilisation'], round((4 + 2 / 3 + 6) / 200 * 100, 1))
+        self.assertEqual(room['peak'], {'weekday': 'Mon', 'time': '10:00', 'utilisation': 100.0})
+        self.assertIn({'weekday': 'Mon', 'from': '08:00', 'to': '10:00'}, room['always_idle'])
+        self.assertEqual(empty_room['always_idle'][0], {'weekday': 'Mon', 'from': '08:00', 'to': '18:00'})
+        self.assertIsNone(empty_room['peak'])
+        self.assertEqual(report['peak_hours'][0]['hour'], '10:00')
+
+        user = User.objects.create_superuser(username='manager', password='pass')
+        self.client.force_login(user)
+        data = self.client.get('/bookings/api/reports/utilisation/', {'start': '2030-01-07', 'end': '2030-01-13'}).json()
+        self.assertEqual(data['rooms'][0]['utilisation'], room['utilisation'])
+        response = self.client.get('/bookings/api/reports/utilisation/', {'start': '2030-01-07', 'end': '2031-06-01'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_report_with_none_of_the_weekdays_in_range(self):
+        # A Saturday, with the default Monday to Friday
+        saturday = datetime.date(2030, 3, 2)
+        report = utilisation_report(saturday, saturday)
+        self.assertEqual(report['weekdays'], [])
+        self.assertEqual(report['overall_utilisation'], 0.0)
+        self.assertEqual(report['peak_hours'], [])
+        self.assertEqual([room['utilisation'] for room in report['rooms']], [0.0, 0.0])
+        self.assertIsNone(report['rooms'][0]['peak'])
@@ -0,0 +1,117 @@
+# bookings/upcoming.py
+#
+# Keyset (cursor) pagination over upcoming bookings for the reception views.
+#
+# Items are ordered by (start_time, kind, id): kind 0 is a plain Booking (id = booking id),
+# kind 1 is an occurrence of a recurring series (id = rule id). A page is fetched with
+# "key > cursor", so the cost of a page doesn't depend on how many bookings come after it.
+
+import base64
+import binascii
+import datetime
+import heapq
+import itertools
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Booking
+from .recurrence import expand_rules, rules_in_window
+
+BOOKING, SERIES = 0, 1
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def sort_key(booking):
+    rule = getattr(booking, 'rule', None)
+    if rule is not None:
+        return (booking.start_time, SERIES, rule.pk)
+    return (booking.start_time, BOOKING, booking.pk)
+
+
+def encode_cursor(key):
+    start_time, kind, pk = key
+    raw = f"{start_time.isoformat()}|{kind}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Raises ValueError for anything that isn't a cursor we produced."""
+    try:
+        start, kind, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        start_time = parse_datetime(start)
+        kind, pk = int(kind), int(pk)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise ValueError("Invalid cursor")
+    if start_time is None or timezone.is_naive(start_time):
+        raise ValueError("Invalid cursor")
+    return (start_time, kind, pk)
+
+
+def upcoming_page(cursor=None, room_id=None, office_id=None, day_from=None, day_to=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Returns (bookings, next_cursor) for one page of upcoming bookings and series occurrences.
+    next_cursor is None on the last page.
+    """
+    now = timezone.now()
+    if cursor is None:
+        # Same as start_time >= now: every real key is greater than (now, -1, -1)
+        cursor = (now, -1, -1)
+    after_start, after_kind, after_pk = cursor
+
+    window_end = None
+    if day_from is not None:
+        day_start = timezone.make_aware(datetime.datetime.combine(day_from, datetime.time.min))
+        if day_start > after_start:
+            after_start, after_kind, after_pk = day_start, -1, -1
+    if day_to is not None:
+        window_end = timezone.make_aware(
+            datetime.datetime.combine(day_to + datetime.timedelta(days=1), datetime.time.min)
+        )
+
+    # Plain bookings: WHERE (start, id) > (after_start, after_pk) ... ORDER BY start, id LIMIT n + 1
+    bookings = Booking.objects.select_related('meeting_room', 'associated_office', 'booked_by')
+    if after_kind < BOOKING:
+        bookings = bookings.filter(start_time__gte=after_start)
+    elif after_kind == BOOKING:
+        bookings = bookings.filter(Q(start_time__gt=after_start) | Q(start_time=after_start, pk__gt=after_pk))
+    else:
+        bookings = bookings.filter(start_time__gt=after_start)
+
+    rules = rules_in_window(after_start, window_end)
+    if window_end is not None:
+        bookings = bookings.filter(start_time__lt=window_end)
+    if room_id is not None:
+        bookings = bookings.filter(meeting_room_id=room_id)
+        rules = rules.filter(meeting_room_id=room_id)
+    if office_id is not None:
+        bookings = bookings.filter(associated_office_id=office_id)
+        rules = rules.filter(associated_office_id=office_id)
+
+    bookings = bookings.order_by('start_time', 'pk')[:page_size + 1]
+    occurrences = (
+        occurrence for occurrence in expand_rules(after_start, window_end, rules=rules)
+        if sort_key(occurrence) > (after_start, after_kind, after_pk)
+    )
+
+    page = list(itertools.islice(heapq.merge(bookings, occurrences, key=sort_key), page_size + 1))
+    next_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_cursor = encode_cursor(sort_key(page[-1]))
+    return page, next_cursor
+
+
+def serialize_booking(booking):
+    return {
+        'id': booking.pk,
+        'series_id': booking.rule.pk if getattr(booking, 'rule', None) is not None else None,
+        'title': booking.title,
+        'room': booking.meeting_room.name,
+        'start_time': booking.start_time,
+        'end_time': booking.end_time,
+        'booked_by': booking.booked_by.username if booking.booked_by else None,
+        'associated_office': booking.associated_office.office_number if booking.associated_office else None,
+    }
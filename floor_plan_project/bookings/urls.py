@@ -9,8 +9,15 @@ from .views import (
     BookingCalendarView, 
     CreateBookingView, 
     ReceptionDashboardView,
+    ImportBookingsView,
     monthly_usage_report_api,
-    usage_report_view  # Added this import
+    usage_report_view,  # Added this import
+    room_utilisation_api,
+    room_availability_api,
+    upcoming_bookings_api,
+    room_ical_feed,
+    calendar_row_api,
+    office_ical_feed,
 )
 
 urlpatterns = [
@@ -18,8 +25,23 @@ urlpatterns = [
     path('', BookingCalendarView.as_view(), name='booking-calendar'),
     path('new/', CreateBookingView.as_view(), name='create-booking'),
     path('reception/', ReceptionDashboardView.as_view(), name='reception-dashboard'),
+    path('import/', ImportBookingsView.as_view(), name='import-bookings'),
     
     # Updated report URLs with protected view
     path('reports/usage/', usage_report_view, name='usage-report'),
     path('api/reports/usage/', monthly_usage_report_api, name='usage-report-api'),
+    path('api/reports/utilisation/', room_utilisation_api, name='room-utilisation-api'),
+
+    # Reception dashboard feed (keyset-paginated)
+    path('api/upcoming/', upcoming_bookings_api, name='upcoming-bookings-api'),
+
+    # Free-room finder
+    path('api/availability/', room_availability_api, name='room-availability-api'),
+
+    # One calendar row, for live updates
+    path('api/calendar-row/', calendar_row_api, name='calendar-row-api'),
+
+    # Calendar subscriptions (iCal)
+    path('ical/room/<int:room_id>.ics', room_ical_feed, name='room-ical-feed'),
+    path('ical/office/<int:office_number>.ics', office_ical_feed, name='office-ical-feed'),
 ]
\ No newline at end of file
@@ -0,0 +1,150 @@
+# bookings/usage.py
+#
+# Keeps the MonthlyOfficeUsage rollup in step with bookings, so the usage report
+# reads a handful of small rows instead of re-aggregating every booking.
+# Usage is attributed to the (local) month the booking starts in.
+
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Booking, RecurrenceRule, RecurrenceException, MonthlyOfficeUsage
+
+
+def month_of(moment):
+    return timezone.localtime(moment).date().replace(day=1)
+
+
+def _add_usage(deltas, office_id, start_time, end_time, sign=1):
+    if office_id is None or start_time is None or end_time is None:
+        return
+    totals = deltas[(office_id, month_of(start_time))]
+    totals[0] += sign * int((end_time - start_time).total_seconds())
+    totals[1] += sign
+
+
+def apply_usage_deltas(deltas):
+    """
+    Adds {(office_id, month): [seconds, count]} to the plain-booking rollup rows.
+    Totals never go below zero: a booking the rollup never counted (made before it
+    existed, or lost to drift) has nothing to take away.
+    """
+    for (office_id, month), (seconds, count) in deltas.items():
+        if not seconds and not count:
+            continue
+        rows = MonthlyOfficeUsage.objects.filter(office_id=office_id, month=month, rule__isnull=True)
+        changes = {
+            'booked_seconds': Greatest(F('booked_seconds') + seconds, Value(0)),
+            'booking_count': Greatest(F('booking_count') + count, Value(0)),
+        }
+        if rows.update(**changes) or seconds < 0 or count < 0:
+            continue
+        try:
+            with transaction.atomic():
+                MonthlyOfficeUsage.objects.create(
+                    office_id=office_id, month=month, booked_seconds=seconds, booking_count=count
+                )
+        except IntegrityError:
+            # Another request created the row first
+            rows.update(**changes)
+
+
+def record_bookings_usage(bookings, sign=1):
+    """
+    Adds (sign=1) or removes (sign=-1) plain bookings from the rollup.
+    This is the bulk path: call it after bulk_create(), which sends no signals.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for booking in bookings:
+        _add_usage(deltas, booking.associated_office_id, booking.start_time, booking.end_time, sign)
+    apply_usage_deltas(deltas)
+
+
+def booking_saved(booking, created):
+    deltas = defaultdict(lambda: [0, 0])
+    old = getattr(booking, '_loaded_values', None)
+    if not created and old is not None:
+        fields = ('associated_office_id', 'start_time', 'end_time')
+        if any(field not in old for field in fields):
+            # Loaded with .only()/.defer(): fetch what the rollup needs
+            old = Booking.objects.filter(pk=booking.pk).values(*fields).first() or {}
+        _add_usage(deltas, old.get('associated_office_id'), old.get('start_time'), old.get('end_time'), -1)
+    _add_usage(deltas, booking.associated_office_id, booking.start_time, booking.end_time)
+    apply_usage_deltas(deltas)
+    booking._loaded_values = dict(
+        getattr(booking, '_loaded_values', None) or {},
+        meeting_room_id=booking.meeting_room_id,
+        associated_office_id=booking.associated_office_id,
+        start_time=booking.start_time,
+        end_time=booking.end_time,
+    )
+
+
+def rule_usage_rows(rule, exceptions=()):
+    """Unsaved MonthlyOfficeUsage rows for every occurrence of one series."""
+    from .recurrence import expand_rule
+
+    if rule.associated_office_id is None:
+        return []
+    deltas = defaultdict(lambda: [0, 0])
+    for occurrence in expand_rule(rule, exceptions=exceptions):
+        _add_usage(deltas, occurrence.associated_office_id, occurrence.start_time, occurrence.end_time)
+    return [
+        MonthlyOfficeUsage(office_id=office_id, month=month, rule=rule, booked_seconds=seconds, booking_count=count)
+        for (office_id, month), (seconds, count) in deltas.items()
+    ]
+
+
+def refresh_rule_usage(rule_id):
+    """Replaces the rollup rows owned by one series (a no-op if the series is gone)."""
+    rule = RecurrenceRule.objects.filter(pk=rule_id).first()
+    with transaction.atomic():
+        MonthlyOfficeUsage.objects.filter(rule_id=rule_id).delete()
+        if rule is not None:
+            MonthlyOfficeUsage.objects.bulk_create(rule_usage_rows(rule, rule.exceptions.all()))
+
+
+def schedule_rule_usage_refresh(rule_id):
+    # After commit, so a series and its exceptions are rebuilt once they are all written
+    # (and skipped if the series itself was deleted, which cascades to its rows).
+    transaction.on_commit(lambda: refresh_rule_usage(rule_id))
+
+
+def rebuild_usage_rollup():
+    """Recomputes the whole rollup from the bookings and series tables (for backfills and drift)."""
+    deltas = defaultdict(lambda: [0, 0])
+    plain_bookings = Booking.objects.filter(associated_office__isnull=False).order_by().values_list(
+        'associated_office_id', 'start_time', 'end_time'
+    )
+    for office_id, start_time, end_time in plain_bookings.iterator(chunk_size=5000):
+        _add_usage(deltas, office_id, start_time, end_time)
+
+    exceptions_by_rule = defaultdict(list)
+    for exception in RecurrenceException.objects.all():
+        exceptions_by_rule[exception.rule_id].append(exception)
+
+    rows = [
+        MonthlyOfficeUsage(office_id=office_id, month=month, booked_seconds=seconds, booking_count=count)
+        for (office_id, month), (seconds, count) in deltas.items()
+    ]
+    for rule in RecurrenceRule.objects.filter(associated_office__isnull=False).iterator():
+        rows.extend(rule_usage_rows(rule, exceptions_by_rule[rule.pk]))
+
+    with transaction.atomic():
+        MonthlyOfficeUsage.objects.all().delete()
+        MonthlyOfficeUsage.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def usage_by_office(first_month, last_month):
+    """{office_id: (booked_seconds, booking_count)} for the months in [first_month, last_month]."""
+    totals = (
+        MonthlyOfficeUsage.objects.filter(month__gte=first_month, month__lte=last_month)
+        .values('office_id')
+        .annotate(seconds=Sum('booked_seconds'), count=Sum('booking_count'))
+        .order_by()
+    )
+    return {row['office_id']: (row['seconds'], row['count']) for row in totals}
@@ -1,31 +1,46 @@
 # bookings/views.py
 
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
+from django.http import HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.views.decorators.http import condition
 from django.views import View
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime, parse_time
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.db.models import F, ExpressionWrapper, DurationField, Sum, Q
-from django.db.models.functions import Coalesce
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 import datetime
-import uuid
+import functools
+import io
 
-from .models import MeetingRoom, Booking
+from .models import MeetingRoom, RecurrenceRule, get_feed_stamp
 from .forms import BookingForm
+from .calendar_grid import week_bounds, local_day_range, get_week_grid
+from .upcoming import upcoming_page, decode_cursor, serialize_booking, MAX_PAGE_SIZE
+from .availability import find_free_rooms
+from .usage import usage_by_office
+from .analytics import utilisation_report
+from .importer import parse_file, import_bookings
+from .reservations import save_booking, create_series, BookingConflictError
+from .ical import feed_token, user_from_feed_token, room_feed, office_feed
 from offices.models import Office
+from core.roles import has_role
+from core.streaming import streaming_content
+
+# Longest window the free-room finder will search in one request
+MAX_AVAILABILITY_WINDOW = datetime.timedelta(days=31)
 
 def is_manager_or_reception(user):
     """Helper function to check if user is manager or reception"""
-    return user.is_superuser or user.groups.filter(name__iregex=r'^(Manager|Reception)$').exists()
+    return has_role(user, 'Manager', 'Reception')
 
 # --- THIS VIEW HAS BEEN COMPLETELY REWRITTEN FOR ACCURACY AND EFFICIENCY ---
 class BookingCalendarView(LoginRequiredMixin, View):
     login_url = '/login/'
 
     def get(self, request):
-        rooms = MeetingRoom.objects.all()
         today = timezone.localdate() # Use timezone-aware local date
 
         # Get the day from the query parameter, default to today
@@ -36,35 +51,23 @@ class BookingCalendarView(LoginRequiredMixin, View):
             current_day = today
 
         # Calculate week boundaries based on the current day
-        start_of_week = current_day - datetime.timedelta(days=current_day.weekday())
-        end_of_week = start_of_week + datetime.timedelta(days=6)
+        start_of_week, end_of_week = week_bounds(current_day)
         
         # Navigation links for previous and next week
         prev_week = start_of_week - datetime.timedelta(days=7)
         next_week = start_of_week + datetime.timedelta(days=7)
 
-        # Get all bookings for the visible week
-        bookings_this_week = Booking.objects.filter(
-            start_time__date__gte=start_of_week,
-            start_time__date__lte=end_of_week
-        ).order_by('start_time')
-
-        # --- PRE-PROCESSING LOGIC ---
-        # Create a structured dictionary to make the template extremely simple
-        calendar_data = {room: {day: [] for day in [start_of_week + datetime.timedelta(days=i) for i in range(7)]} for room in rooms}
-        
-        for booking in bookings_this_week:
-            room = booking.meeting_room
-            day = booking.start_time.date()
-            if room in calendar_data and day in calendar_data[room]:
-                calendar_data[room][day].append(booking)
+        # The grid (rooms x days, bookings already bucketed) is built in one query
+        # and cached until the next booking change, so the template stays simple.
+        calendar_rows = get_week_grid(start_of_week)
         
         context = {
-            'calendar_data': calendar_data,
+            'calendar_rows': calendar_rows,
             'days_of_week': [start_of_week + datetime.timedelta(days=i) for i in range(7)],
             'prev_week_url': f"?day={prev_week.isoformat()}",
             'next_week_url': f"?day={next_week.isoformat()}",
-            'current_week_str': f"{start_of_week.strftime('%d %b')} - {end_of_week.strftime('%d %b %Y')}"
+            'current_week_str': f"{start_of_week.strftime('%d %b')} - {end_of_week.strftime('%d %b %Y')}",
+            'feed_token': feed_token(request.user),
         }
         return render(request, 'bookings/booking_calendar.html', context)
 
@@ -83,56 +86,46 @@ class CreateBookingView(LoginRequiredMixin, View):
             # Get the cleaned data from the form
             recurrence = form.cleaned_data.get('recurrence')
             end_recurrence = form.cleaned_data.get('end_recurrence')
-            start_time = form.cleaned_data.get('start_time')
-            end_time = form.cleaned_data.get('end_time')
-            
-            # This list will hold all the booking objects we need to create
-            bookings_to_create = []
+
+            # If this user is the contact person for an office, set associated office
+            tenant_office = Office.objects.filter(contact_person=request.user).first()
 
             # --- CASE 1: This is a single, non-recurring booking ---
             if recurrence == 'none' or not end_recurrence:
                 new_booking = form.save(commit=False)
                 new_booking.booked_by = request.user
 
-                # If this user is the contact person for an office, set associated office
-                tenant_office = Office.objects.filter(contact_person=request.user).first()
                 if tenant_office and not new_booking.associated_office:
                     new_booking.associated_office = tenant_office
 
-                bookings_to_create.append(new_booking)
+                booking_or_series = new_booking
 
             # --- CASE 2: This is a recurring booking ---
+            # The series is stored as ONE rule row; occurrences are expanded when viewed.
             else:
-                current_start = start_time
-                current_end = end_time
-                delta = datetime.timedelta(days=7) if recurrence == 'weekly' else datetime.timedelta(days=1)
-                new_recurrence_id = uuid.uuid4()
-                
-                while current_start.date() <= end_recurrence:
-                    new_booking = Booking(
-                        meeting_room=form.cleaned_data.get('meeting_room'),
-                        booked_by=request.user,
-                        title=form.cleaned_data.get('title'),
-                        start_time=current_start,
-                        end_time=current_end,
-                        recurrence_id=new_recurrence_id
-                    )
-
-                    # If this user is the contact person for an office, set associated office
-                    tenant_office = Office.objects.filter(contact_person=request.user).first()
-                    if tenant_office:
-                        new_booking.associated_office = tenant_office
-
+                booking_or_series = RecurrenceRule(
+                    meeting_room=form.cleaned_data.get('meeting_room'),
+                    booked_by=request.user,
+                    title=form.cleaned_data.get('title'),
                     # If manager selected an office, use that instead
-                    if form.cleaned_data.get('associated_office'):
-                        new_booking.associated_office = form.cleaned_data.get('associated_office')
+                    associated_office=form.cleaned_data.get('associated_office') or tenant_office,
+                    frequency=recurrence,
+                    start_time=form.cleaned_data.get('start_time'),
+                    end_time=form.cleaned_data.get('end_time'),
+                    until=end_recurrence,
+                )
 
-                    bookings_to_create.append(new_booking)
-                    current_start += delta
-                    current_end += delta
+            # The form's check ran outside any transaction: re-check and write under a lock on the room,
+            # so a receptionist booking the same slot at the same moment can't slip in between
+            try:
+                if isinstance(booking_or_series, RecurrenceRule):
+                    create_series(booking_or_series)
+                else:
+                    save_booking(booking_or_series)
+            except BookingConflictError as error:
+                form.add_error(None, str(error))
+                return render(request, 'bookings/create_booking.html', {'form': form})
 
-            # Save all bookings at once
-            Booking.objects.bulk_create(bookings_to_create)
             return redirect('booking-calendar')
         
         return render(request, 'bookings/create_booking.html', {'form': form})
@@ -141,72 +134,341 @@ class ReceptionDashboardView(LoginRequiredMixin, UserPassesTestMixin, View):
     login_url = '/login/'
     
     def test_func(self):
-        user = self.request.user
-        return user.is_superuser or user.groups.filter(name__iregex=r'^(Manager|Reception)$').exists()
+        return is_manager_or_reception(self.request.user)
     
     def handle_no_permission(self):
         return redirect('dashboard')
         
     def get(self, request):
-        now = timezone.now()
-        
-        # Optimize query by using select_related for related fields
-        upcoming_bookings = Booking.objects.filter(start_time__gte=now).select_related(
-            'meeting_room', 
-            'associated_office', 
-            'booked_by'
-        ).order_by('start_time')
+        try:
+            filters = _upcoming_filters(request)
+        except ValueError:
+            filters = {}
+
+        # Only the first page is rendered here; the rest is lazy-loaded from the JSON feed
+        upcoming_bookings, next_cursor = upcoming_page(**filters)
         
-        context = {'upcoming_bookings': upcoming_bookings}
+        context = {
+            'upcoming_bookings': upcoming_bookings,
+            'next_cursor': next_cursor,
+            'rooms': MeetingRoom.objects.order_by('name'),
+            'offices': Office.objects.order_by('office_number').values_list('office_number', flat=True),
+            'filters': request.GET,
+        }
         return render(request, 'bookings/reception_dashboard.html', context)
 
+def _upcoming_filters(request):
+    """Reads the reception filters (room, office, from, to, cursor, page_size) from the query string."""
+    filters = {}
+    if request.GET.get('room'):
+        filters['room_id'] = int(request.GET['room'])
+    if request.GET.get('office'):
+        filters['office_id'] = int(request.GET['office'])
+    for param, key in (('from', 'day_from'), ('to', 'day_to')):
+        if request.GET.get(param):
+            day = parse_date(request.GET[param])
+            if day is None:
+                raise ValueError(f"Invalid date: {request.GET[param]}")
+            filters[key] = day
+    if request.GET.get('cursor'):
+        filters['cursor'] = decode_cursor(request.GET['cursor'])
+    if request.GET.get('page_size'):
+        filters['page_size'] = max(1, min(int(request.GET['page_size']), MAX_PAGE_SIZE))
+    return filters
+
+@api_view(['GET'])
+@login_required
+def upcoming_bookings_api(request):
+    """
+    JSON feed behind the reception dashboard's infinite scroll.
+    Accepts the same filters as the page plus ?cursor= from the previous response.
+    """
+    if not is_manager_or_reception(request.user):
+        return Response({'error': 'Permission denied'}, status=403)
+    try:
+        filters = _upcoming_filters(request)
+    except ValueError as error:
+        return Response({'error': str(error)}, status=400)
+
+    page, next_cursor = upcoming_page(**filters)
+    return Response({
+        'results': [serialize_booking(booking) for booking in page],
+        'next_cursor': next_cursor,
+    })
+
+class ImportBookingsView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """Upload a CSV or .ics file of bookings; shows what was imported and a rejection report."""
+    login_url = '/login/'
+
+    def test_func(self):
+        return is_manager_or_reception(self.request.user)
+
+    def handle_no_permission(self):
+        return redirect('dashboard')
+
+    def get(self, request):
+        return render(request, 'bookings/import_bookings.html')
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return render(request, 'bookings/import_bookings.html', {'error': "Please choose a file."})
+
+        file_format = request.POST.get('format') or upload.name.rsplit('.', 1)[-1].lower()
+        # Stream the upload line by line instead of reading it into memory
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        try:
+            result = import_bookings(
+                parse_file(stream, file_format), booked_by=request.user, dry_run=bool(request.POST.get('dry_run'))
+            )
+        except (ValueError, UnicodeDecodeError) as error:
+            return render(request, 'bookings/import_bookings.html', {'error': str(error)})
+
+        if request.POST.get('report') == 'csv':
+            response = HttpResponse(
+                content_type='text/csv',
+                headers={'Content-Disposition': 'attachment; filename="booking_import_rejections.csv"'},
+            )
+            result.write_report(response)
+            return response
+
+        return render(request, 'bookings/import_bookings.html', {'result': result})
+
 @login_required(login_url='/login/')
 @user_passes_test(is_manager_or_reception, login_url='/dashboard/')
 def usage_report_view(request):
     return render(request, 'bookings/usage_report.html')
 
+def _parse_month(value, default):
+    """Parses 'YYYY-MM' into the first day of that month."""
+    if not value:
+        return default
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        raise ValueError(f"Invalid month: {value} (expected YYYY-MM)")
+
 @api_view(['GET'])
 @login_required
 def monthly_usage_report_api(request):
     """
-    Calculates the total meeting room hours booked per office for the current month.
+    Total meeting room hours booked per office, for the current month by default.
+    Pass ?from=YYYY-MM&to=YYYY-MM for any range of months.
+    Reads the MonthlyOfficeUsage rollup, so the cost doesn't grow with the number of bookings.
     """
     # Check permissions
     if not is_manager_or_reception(request.user):
         return Response({'error': 'Permission denied'}, status=403)
         
-    today = timezone.localdate()
-    
-    # Get all offices
-    offices = Office.objects.all().order_by('office_number')
-
-    # Calculate the total duration of bookings for each office in the current month
-    usage_data = offices.annotate(
-        # Calculate duration of each booking: end_time - start_time
-        booking_duration=ExpressionWrapper(
-            F('meeting_room_bookings__end_time') - F('meeting_room_bookings__start_time'), 
-            output_field=DurationField()
-        ),
-        # Sum up the durations, but only for bookings in the current month
-        total_hours_this_month=Coalesce(
-            Sum(
-                'booking_duration',
-                filter=Q(
-                    meeting_room_bookings__start_time__month=today.month,
-                    meeting_room_bookings__start_time__year=today.year
-                )
-            ),
-            datetime.timedelta(0)
-        )
-    ).values('office_number', 'total_hours_this_month')
+    this_month = timezone.localdate().replace(day=1)
+    try:
+        first_month = _parse_month(request.GET.get('from'), this_month)
+        last_month = _parse_month(request.GET.get('to'), first_month)
+    except ValueError as error:
+        return Response({'error': str(error)}, status=400)
+    if last_month < first_month:
+        return Response({'error': "'to' must not be before 'from'."}, status=400)
+
+    usage = usage_by_office(first_month, last_month)
     
-    # Convert timedelta to total hours for easier display
+    # Convert seconds to total hours for easier display
     report = []
-    for item in usage_data:
-        total_seconds = item['total_hours_this_month'].total_seconds()
+    for office_number in Office.objects.order_by('office_number').values_list('office_number', flat=True):
+        total_seconds, booking_count = usage.get(office_number, (0, 0))
         report.append({
-            'office_number': item['office_number'],
-            'total_hours': round(total_seconds / 3600, 2)  # Convert seconds to hours
+            'office_number': office_number,
+            'total_hours': round(total_seconds / 3600, 2),  # Convert seconds to hours
+            'booking_count': booking_count,
         })
 
-    return Response(report)
\ No newline at end of file
+    return Response(report)
+
+
+# Longest range the utilisation heatmap covers in one request
+MAX_UTILISATION_RANGE = datetime.timedelta(days=366)
+
+@api_view(['GET'])
+@login_required
+def room_utilisation_api(request):
+    """
+    When do meeting rooms sit empty? Utilisation per room x weekday x 15-minute slot.
+
+    Query parameters:
+      start, end         - date range (YYYY-MM-DD, defaults to the last 12 weeks)
+      hour_from, hour_to - opening hours the percentages are computed over (default 8 and 18)
+      weekdays           - comma-separated, 0 = Monday (default 0,1,2,3,4)
+    """
+    if not is_manager_or_reception(request.user):
+        return Response({'error': 'Permission denied'}, status=403)
+
+    today = timezone.localdate()
+    try:
+        end = parse_date(request.GET['end']) if request.GET.get('end') else today
+        start = parse_date(request.GET['start']) if request.GET.get('start') else end - datetime.timedelta(weeks=12) + datetime.timedelta(days=1)
+        hour_from = int(request.GET.get('hour_from', 8))
+        hour_to = int(request.GET.get('hour_to', 18))
+        weekdays = [int(day) for day in request.GET.get('weekdays', '0,1,2,3,4').split(',') if day.strip()]
+    except ValueError as error:
+        return Response({'error': str(error)}, status=400)
+
+    if start is None or end is None or end < start:
+        return Response({'error': 'start and end must be dates (YYYY-MM-DD), end on or after start.'}, status=400)
+    if end - start >= MAX_UTILISATION_RANGE:
+        return Response({'error': f'The range cannot be longer than {MAX_UTILISATION_RANGE.days} days.'}, status=400)
+    if not 0 <= hour_from < hour_to <= 24 or not weekdays or not all(0 <= day <= 6 for day in weekdays):
+        return Response({'error': 'Use 0 <= hour_from < hour_to <= 24 and weekdays between 0 and 6.'}, status=400)
+
+    return Response(utilisation_report(start, end, hour_from, hour_to, weekdays))
+
+
+def _parse_window_bound(value, default):
+    """Accepts an ISO date or datetime; naive values are read in the local timezone."""
+    if not value:
+        return default
+    parsed = parse_datetime(value)
+    if parsed is None:
+        parsed_date = parse_date(value)
+        if parsed_date is None:
+            raise ValueError(f"Invalid date/time: {value}")
+        parsed = datetime.datetime.combine(parsed_date, datetime.time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+@api_view(['GET'])
+@login_required
+def room_availability_api(request):
+    """
+    Free slots per meeting room.
+
+    Query parameters:
+      start, end      - search window (ISO date or datetime, defaults to the next 7 days from today)
+      duration        - minimum slot length in minutes (default 30)
+      capacity        - minimum MeetingRoom.capacity (default 0)
+      time_from, time_to - optional daily time range, e.g. 14:00 and 15:30
+    """
+    if not is_manager_or_reception(request.user):
+        return Response({'error': 'Permission denied'}, status=403)
+
+    window_start, window_end = local_day_range(timezone.localdate(), timezone.localdate() + datetime.timedelta(days=6))
+    try:
+        window_start = _parse_window_bound(request.GET.get('start'), window_start)
+        window_end = _parse_window_bound(request.GET.get('end'), window_end)
+        duration = datetime.timedelta(minutes=int(request.GET.get('duration', 30)))
+        min_capacity = int(request.GET.get('capacity', 0))
+        time_from = parse_time(request.GET['time_from']) if request.GET.get('time_from') else None
+        time_to = parse_time(request.GET['time_to']) if request.GET.get('time_to') else None
+    except ValueError as error:
+        return Response({'error': str(error)}, status=400)
+
+    if window_end <= window_start or duration <= datetime.timedelta(0):
+        return Response({'error': 'The window must end after it starts and the duration must be positive.'}, status=400)
+    if window_end - window_start > MAX_AVAILABILITY_WINDOW:
+        return Response({'error': f'The window cannot be longer than {MAX_AVAILABILITY_WINDOW.days} days.'}, status=400)
+
+    results = find_free_rooms(window_start, window_end, duration, min_capacity, time_from, time_to)
+    return Response({
+        'start': window_start,
+        'end': window_end,
+        'duration_minutes': int(duration.total_seconds() // 60),
+        'rooms': [
+            {
+                'id': item['room']['id'],
+                'name': item['room']['name'],
+                'capacity': item['room']['capacity'],
+                'free_slots': [{'start': start, 'end': end} for start, end in item['free_slots']],
+            }
+            for item in results
+        ],
+    })
+
+
+@api_view(['GET'])
+@login_required
+def calendar_row_api(request):
+    """
+    One room's row of the week calendar, as rendered cell HTML keyed by day:
+    ?week=<any date in the week>&room=<id>. Used to patch the calendar on live updates.
+    """
+    try:
+        start_of_week, _ = week_bounds(datetime.date.fromisoformat(request.GET.get('week', '')))
+        room_id = int(request.GET.get('room', ''))
+    except ValueError:
+        return Response({'error': 'week (YYYY-MM-DD) and room are required.'}, status=400)
+
+    # Served from the cached grid, so a burst of updates doesn't mean a burst of queries
+    row = next((row for row in get_week_grid(start_of_week) if row['room']['id'] == room_id), None)
+    if row is None:
+        return Response({'error': 'Unknown room.'}, status=404)
+    return Response({
+        'room_id': room_id,
+        'cells': {
+            (start_of_week + datetime.timedelta(days=i)).isoformat():
+                render_to_string('bookings/_calendar_cell.html', {'day_bookings': day_bookings})
+            for i, day_bookings in enumerate(row['days'])
+        },
+    })
+
+
+# --- ICAL FEEDS ---
+# Polled constantly by mail clients. The ETag / Last-Modified come from a per-room (or
+# per-office) change stamp (a CalendarFeedStamp row), so an unchanged feed is answered
+# with a 304 before the bookings table is touched.
+
+def feed_login_required(view):
+    """A logged-in session, or ?token= from the subscribe link (mail clients can't log in)."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            user = user_from_feed_token(request.GET.get('token'))
+            if user is None:
+                return HttpResponseForbidden("A valid feed token is required.")
+            request.user = user
+        return view(request, *args, **kwargs)
+    return wrapper
+
+def _feed_response(request, stream, filename):
+    response = StreamingHttpResponse(streaming_content(request, stream), content_type='text/calendar; charset=utf-8')
+    response['Content-Disposition'] = f'inline; filename="{filename}"'
+    # Always revalidate; the ETag makes that cheap
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+# Memoised per request: condition() asks for the ETag and Last-Modified separately
+def _room_stamp(request, room_id):
+    if not hasattr(request, '_room_feed_stamp'):
+        request._room_feed_stamp = get_feed_stamp('room', room_id)
+    return request._room_feed_stamp
+
+def _office_stamp(request, office_number):
+    if not hasattr(request, '_office_feed_stamp'):
+        office_id = Office.objects.filter(office_number=office_number).values_list('pk', flat=True).first()
+        request._office_feed_stamp = get_feed_stamp('office', office_id) if office_id else None
+    return request._office_feed_stamp
+
+def _stamp_etag(stamp):
+    return f'"{stamp}"' if stamp else None
+
+def _stamp_datetime(stamp):
+    return datetime.datetime.fromtimestamp(stamp / 1e9, tz=datetime.timezone.utc) if stamp else None
+
+@feed_login_required
+@condition(
+    etag_func=lambda request, room_id: _stamp_etag(_room_stamp(request, room_id)),
+    last_modified_func=lambda request, room_id: _stamp_datetime(_room_stamp(request, room_id)),
+)
+def room_ical_feed(request, room_id):
+    # Read the stamp before the bookings, so a change made while streaming forces a refetch next time
+    stamp = _room_stamp(request, room_id)
+    room = get_object_or_404(MeetingRoom, pk=room_id)
+    return _feed_response(request, room_feed(room, stamp), f"room-{room.pk}.ics")
+
+@feed_login_required
+@condition(
+    etag_func=lambda request, office_number: _stamp_etag(_office_stamp(request, office_number)),
+    last_modified_func=lambda request, office_number: _stamp_datetime(_office_stamp(request, office_number)),
+)
+def office_ical_feed(request, office_number):
+    stamp = _office_stamp(request, office_number)
+    office = get_object_or_404(Office, office_number=office_number)
+    return _feed_response(request, office_feed(office, stamp), f"office-{office.office_number}.ics")
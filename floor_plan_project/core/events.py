@@ -0,0 +1,95 @@
+# core/events.py
+#
+# Live updates for open pages (calendar, floor plan, ...).
+#
+# Model signals publish small events ("office 12 is now rented", "room 3 changed on
+# these days") into a broadcaster; the /events/ view streams them to browsers as
+# Server-Sent Events. The view is async, so under an ASGI server every open page is
+# just a waiting coroutine on the event loop, not a thread.
+#
+# The default broadcaster only reaches pages connected to the SAME process. For a
+# multi-process deployment point LIVE_EVENTS_BROADCASTER at a class with the same
+# publish/subscribe/unsubscribe methods that relays between processes.
+
+import asyncio
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+DEFAULT_BROADCASTER = 'core.events.InProcessBroadcaster'
+# Events a slow page may fall behind by before it's told to reload everything instead
+SUBSCRIPTION_QUEUE_SIZE = 100
+
+
+class Subscription:
+    """One open page. Events arrive on its asyncio queue, from any thread."""
+
+    def __init__(self, channels, loop, maxsize=SUBSCRIPTION_QUEUE_SIZE):
+        self.channels = frozenset(channels)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+
+    def deliver(self, channel, payload):
+        if channel in self.channels:
+            # Signals fire in whatever thread saved the model; the queue belongs to the event loop
+            self.loop.call_soon_threadsafe(self._put, channel, payload)
+
+    def _put(self, channel, payload):
+        if self.queue.full():
+            # Too far behind for patching to make sense: drop the backlog, ask for a full reload
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            channel, payload = 'resync', {}
+        self.queue.put_nowait((channel, payload))
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class InProcessBroadcaster:
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, channels):
+        """Call from the event loop that will read the subscription."""
+        subscription = Subscription(channels, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, channel, payload):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.deliver(channel, payload)
+            except RuntimeError:
+                # Its event loop is closed; the connection is gone
+                self.unsubscribe(subscription)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscriptions)
+
+
+_broadcaster = None
+_broadcaster_lock = threading.Lock()
+
+def get_broadcaster():
+    global _broadcaster
+    if _broadcaster is None:
+        with _broadcaster_lock:
+            if _broadcaster is None:
+                _broadcaster = import_string(getattr(settings, 'LIVE_EVENTS_BROADCASTER', DEFAULT_BROADCASTER))()
+    return _broadcaster
+
+def publish(channel, payload):
+    """Sends the event once the current transaction commits (right away outside one)."""
+    transaction.on_commit(lambda: get_broadcaster().publish(channel, payload))
@@ -1,3 +1,16 @@
 from django.db import models
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
 
 # Create your models here.
+
+# --- ROLE MEMO INVALIDATION ---
+# core/roles.py memoises a user's group names on the user object for the request;
+# forget them when that user's memberships change mid-request.
+
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, instance, action, reverse, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and not reverse:
+        # user.groups.add/remove/clear(...)
+        instance.__dict__.pop('_role_names', None)
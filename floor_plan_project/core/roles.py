@@ -0,0 +1,34 @@
+# core/roles.py
+#
+# One place to answer "which groups is this user in?".
+# Group names are loaded once per request and memoised on the user object
+# (request.user is the same object for the whole request).
+#
+# They are deliberately NOT cached across requests: the default cache is per process,
+# so dropping an entry when a user's groups change would only reach the worker that
+# made the change, and the others would keep granting a removed role. Keeping a
+# shared version in the database instead would cost a query per request, as much as
+# loading the names.
+
+
+def get_role_names(user):
+    """Returns the tuple of the user's group names (empty for anonymous users)."""
+    if not getattr(user, 'is_authenticated', False):
+        return ()
+
+    role_names = getattr(user, '_role_names', None)
+    if role_names is None:
+        role_names = tuple(sorted(user.groups.values_list('name', flat=True)))
+        user._role_names = role_names
+    return role_names
+
+
+def in_any_group(user, *group_names):
+    """Case-insensitive group membership check, without a query once the roles are loaded."""
+    wanted = {name.lower() for name in group_names}
+    return any(name.lower() in wanted for name in get_role_names(user))
+
+
+def has_role(user, *group_names):
+    """Superusers pass every role check, like the original helpers."""
+    return user.is_superuser or in_any_group(user, *group_names)
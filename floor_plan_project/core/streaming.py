@@ -0,0 +1,34 @@
+# core/streaming.py
+#
+# Streamed downloads (the cheque report, the iCal feeds) are built by plain generators
+# reading the database a chunk at a time. Under WSGI Django sends each chunk as it's
+# yielded. Under ASGI it can't iterate a sync generator on the event loop, so it reads
+# the WHOLE thing into a list first and only then sends it: no first bytes until the
+# end, and the full report in memory.
+#
+# streaming_content() hands those generators over in the form the server can stream:
+# unchanged under WSGI, and under ASGI as an async iterator that pulls one chunk at a
+# time in Django's sync thread (sync_to_async), where the generator's queries run.
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
+_DONE = object()
+
+
+async def _pull_in_sync_thread(chunks):
+    # thread_sensitive: every chunk comes from the same thread, which owns the DB cursor
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    try:
+        while (chunk := await next_chunk(chunks, _DONE)) is not _DONE:
+            yield chunk
+    finally:
+        # Client gone or stream done: let the generator close its cursor where it opened it
+        await sync_to_async(chunks.close, thread_sensitive=True)()
+
+
+def streaming_content(request, chunks):
+    """`chunks` (a generator) as StreamingHttpResponse content that streams under this request's server."""
+    if isinstance(request, ASGIRequest):
+        return _pull_in_sync_thread(chunks)
+    return chunks
@@ -1,9 +1,14 @@
 # core/templatetags/auth_extras.py
 from django import template
-from django.contrib.auth.models import Group
+from core.roles import get_role_names, in_any_group
 
 register = template.Library()
 
 @register.filter(name='has_group')
 def has_group(user, group_name):
-    return user.groups.filter(name__iexact=group_name).exists()
\ No newline at end of file
+    # Group names are loaded once per request, so repeated calls don't query again
+    return in_any_group(user, group_name)
+
+@register.filter(name='role_names')
+def role_names(user):
+    return get_role_names(user)
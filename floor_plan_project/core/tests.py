@@ -1,3 +1,94 @@
 from django.test import TestCase
+from django.core.cache import cache
+from django.contrib.auth.models import User, Group
+from core.roles import get_role_names, has_role
+from core.events import InProcessBroadcaster, SUBSCRIPTION_QUEUE_SIZE
+from offices.models import Office
+from asgiref.sync import sync_to_async
+import asyncio
+import threading
 
-# Create your tests here.
+
+class RoleResolverTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='frontdesk', password='pass')
+        self.reception, _ = Group.objects.get_or_create(name='Reception')
+        self.manager, _ = Group.objects.get_or_create(name='Manager')
+        self.user.groups.add(self.reception)
+
+    def test_roles_are_loaded_once(self):
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertTrue(has_role(user, 'reception'))
+            self.assertFalse(has_role(user, 'Manager', 'Accountant'))
+            get_role_names(user)
+
+    def test_group_changes_are_seen_by_the_next_request(self):
+        self.assertEqual(get_role_names(self.user), ('Reception',))
+        self.user.groups.add(self.manager)
+        self.assertEqual(get_role_names(self.user), ('Manager', 'Reception'))
+
+        # Removed by another worker: no signal reaches this process
+        User.groups.through.objects.filter(user=self.user, group=self.manager).delete()
+        self.assertEqual(get_role_names(User.objects.get(pk=self.user.pk)), ('Reception',))
+
+    def test_dashboard_queries_do_not_grow_with_role_checks(self):
+        self.client.force_login(self.user)
+        # Session, user and ONE group lookup; every other has_group check is answered from the memo
+        with self.assertNumQueries(3):
+            response = self.client.get('/')
+        self.assertContains(response, 'Reception View')
+        self.assertNotContains(response, 'Manage cheques and payments.')
+
+
+class LiveEventsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='frontdesk', password='pass')
+
+    def test_events_published_from_another_thread_reach_subscribers(self):
+        async def scenario():
+            broadcaster = InProcessBroadcaster()
+            subscription = broadcaster.subscribe({'offices'})
+            publisher = threading.Thread(target=broadcaster.publish, args=('offices', {'office_number': 1}))
+            publisher.start()
+            publisher.join()
+            broadcaster.publish('bookings', {'room_id': 1, 'days': None})  # not subscribed
+            first = await asyncio.wait_for(subscription.get(), 1)
+            broadcaster.unsubscribe(subscription)
+            return first, subscription.queue.qsize(), broadcaster.subscriber_count
+
+        self.assertEqual(asyncio.run(scenario()), (('offices', {'office_number': 1}), 0, 0))
+
+    def test_subscriber_that_falls_behind_is_told_to_resync(self):
+        async def scenario():
+            broadcaster = InProcessBroadcaster()
+            subscription = broadcaster.subscribe({'offices'})
+            for number in range(SUBSCRIPTION_QUEUE_SIZE + 1):
+                broadcaster.publish('offices', {'office_number': number})
+            await asyncio.sleep(0)
+            return [await subscription.get() for _ in range(subscription.queue.qsize())]
+
+        self.assertEqual(asyncio.run(scenario()), [('resync', {})])
+
+    async def test_office_save_is_streamed_to_open_pages(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/events/', {'channels': 'offices'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+
+        def rent_office():
+            with self.captureOnCommitCallbacks(execute=True):
+                office = Office.objects.get(office_number=1)
+                office.status = 'rented'
+                office.save()
+        await sync_to_async(rent_office)()
+
+        message = (await asyncio.wait_for(anext(stream), 1)).decode()
+        self.assertTrue(message.startswith('event: offices\n'))
+        self.assertIn('"status": "rented"', message)
+        await stream.aclose()
+
+    def test_stream_requires_login(self):
+        self.assertEqual(self.client.get('/events/', {'channels': 'offices'}).status_code, 401)
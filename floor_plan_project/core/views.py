@@ -1,10 +1,62 @@
 # core/views.py
+import asyncio
+import json
+
 from django.shortcuts import render
 from django.views import View
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, StreamingHttpResponse
+
+from .events import get_broadcaster
+
+LIVE_CHANNELS = {'bookings', 'offices', 'cheques'}
+# Comment line sent on idle connections so proxies don't time them out
+KEEPALIVE_SECONDS = 25
 
 class DashboardView(LoginRequiredMixin, View):
     login_url = '/login/'
 
     def get(self, request, *args, **kwargs):
-        return render(request, 'core/dashboard.html')
\ No newline at end of file
+        return render(request, 'core/dashboard.html')
+
+
+async def _event_stream(broadcaster, subscription):
+    try:
+        # Tell EventSource how long to wait before reconnecting
+        yield 'retry: 5000\n\n'
+        while True:
+            try:
+                channel, payload = await asyncio.wait_for(subscription.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield f'event: {channel}\ndata: {json.dumps(payload, cls=DjangoJSONEncoder)}\n\n'
+    finally:
+        # Runs when the client disconnects (Django cancels the stream)
+        broadcaster.unsubscribe(subscription)
+
+async def live_events(request):
+    """
+    Server-Sent Events: /events/?channels=bookings,offices
+    Only works under an ASGI server; under WSGI it answers 204, which tells
+    EventSource not to retry, and pages simply don't update live.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    channels = set(filter(None, request.GET.get('channels', '').split(','))) & LIVE_CHANNELS
+    if not channels:
+        return HttpResponse("Unknown or missing channels.", status=400)
+
+    broadcaster = get_broadcaster()
+    subscription = broadcaster.subscribe(channels)
+    response = StreamingHttpResponse(_event_stream(broadcaster, subscription), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -88,6 +88,13 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take SQLite's write lock when a transaction starts instead of on its first write,
+            # so check-then-write transactions (booking creation) can't race, and wait for a
+            # busy database instead of failing with "database is locked"
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -137,4 +144,19 @@ STATICFILES_DIRS = [
 ]
 
 LOGIN_REDIRECT_URL = '/' # The root URL is now the dashboard
-LOGIN_URL = '/login/' # Tell Django where our login page is
\ No newline at end of file
+LOGIN_URL = '/login/' # Tell Django where our login page is
+
+# Live updates (/events/). The default broadcaster only reaches pages connected to the same
+# process; multi-process deployments can plug in their own class with the same interface.
+LIVE_EVENTS_BROADCASTER = 'core.events.InProcessBroadcaster'
+
+# Background PDF rendering (offices/pdf_jobs.py). With PDF_RENDER_IN_WEB_PROCESS each web
+# process renders in its own pool; set it to False and run `manage.py run_pdf_worker` to
+# render somewhere else.
+PDF_RENDER_WORKERS = 2
+PDF_RENDER_IN_WEB_PROCESS = True
+
+# Rendered PDFs are cached on disk by content (offices/pdf_cache.py), least recently used
+# evicted first once the directory grows past the limit
+PDF_CACHE_DIR = os.path.join(BASE_DIR, 'pdf_cache')
+PDF_CACHE_MAX_BYTES = 100 * 1024 * 1024
@@ -3,7 +3,7 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.contrib.auth import views as auth_views
-from core.views import DashboardView
+from core.views import DashboardView, live_events
 
 urlpatterns = [
     # The admin URL correctly lives here in the main project router.
@@ -16,4 +16,7 @@ urlpatterns = [
     path('login/', auth_views.LoginView.as_view(template_name='core/login.html'), name='login'),
     path('logout/', auth_views.LogoutView.as_view(next_page='/login/'), name='logout'),
     path('accounting/', include('accounting.urls')),  # Added accounting app URLs
+
+    # Live updates (Server-Sent Events, needs an ASGI server)
+    path('events/', live_events, name='live-events'),
 ]
\ No newline at end of file
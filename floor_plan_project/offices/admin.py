@@ -1,7 +1,7 @@
 # offices/admin.py
 
 from django.contrib import admin
-from .models import Office
+from .models import Office, Floor, OfficeGeometry
 
 @admin.register(Office)
 class OfficeAdmin(admin.ModelAdmin):
@@ -23,3 +23,16 @@ class OfficeAdmin(admin.ModelAdmin):
         }),
     )
 
+
+
+class OfficeGeometryInline(admin.TabularInline):
+    model = OfficeGeometry
+    fields = ('office', 'x', 'y', 'width', 'height', 'polygon')
+    extra = 0
+
+
+@admin.register(Floor)
+class FloorAdmin(admin.ModelAdmin):
+    list_display = ('building', 'name', 'level', 'width', 'height')
+    list_filter = ('building',)
+    inlines = [OfficeGeometryInline]
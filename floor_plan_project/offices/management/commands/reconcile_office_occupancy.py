@@ -0,0 +1,18 @@
+# offices/management/commands/reconcile_office_occupancy.py
+
+from django.core.management.base import BaseCommand
+
+from offices.occupancy import reconcile_office_occupancy
+
+
+class Command(BaseCommand):
+    help = "Recounts the office occupancy counters from the offices table and repairs any drift."
+
+    def handle(self, *args, **options):
+        drift = reconcile_office_occupancy()
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Office occupancy counters are correct."))
+            return
+        for field, (stored, actual) in drift.items():
+            self.stdout.write(self.style.WARNING(f"  {field}: {stored} -> {actual}"))
+        self.stdout.write(self.style.SUCCESS(f"Repaired {len(drift)} drifted counter(s)."))
@@ -0,0 +1,34 @@
+# offices/management/commands/run_pdf_worker.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from offices.pdf_jobs import PdfRenderService
+
+
+class Command(BaseCommand):
+    help = (
+        "Renders queued PDF jobs in a process pool. Run this when PDF_RENDER_IN_WEB_PROCESS "
+        "is False; several workers can share the queue."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help="Rendering processes (default: PDF_RENDER_WORKERS).")
+        parser.add_argument('--once', action='store_true', help="Render what's queued now, then exit.")
+
+    def handle(self, *args, **options):
+        service = PdfRenderService(workers=options['workers'])
+        self.stdout.write(f"Rendering PDFs with {service.workers} process(es)...")
+        if options['once']:
+            service.drain()
+            service.executor.shutdown()
+            return
+        service.start()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping; waiting for the PDFs in progress...")
+        finally:
+            service.stop()
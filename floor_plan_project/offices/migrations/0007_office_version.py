@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:55
+
+from django.db import migrations, models
+
+
+def start_counter(apps, schema_editor):
+    # Existing offices all start at version 1
+    apps.get_model('offices', 'OfficeSyncState').objects.create(pk=1, version=1)
+    apps.get_model('offices', 'Office').objects.update(version=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('offices', '0006_delete_booking_delete_meetingroom'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OfficeSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('last_delete_version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='office',
+            name='version',
+            field=models.PositiveBigIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(start_counter, migrations.RunPython.noop),
+    ]
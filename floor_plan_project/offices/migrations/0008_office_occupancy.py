@@ -0,0 +1,45 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:58
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def fill_counters(apps, schema_editor):
+    Office = apps.get_model('offices', 'Office')
+    totals = Office.objects.aggregate(
+        total_count=Count('pk'),
+        available_count=Count('pk', filter=Q(status='available')),
+        rented_count=Count('pk', filter=Q(status='rented')),
+        rented_sqft=Sum('size_sqft', filter=Q(status='rented')),
+        rented_annual_rent=Sum('annual_rent', filter=Q(status='rented')),
+        total_annual_rent=Sum('annual_rent'),
+    )
+    apps.get_model('offices', 'OfficeOccupancy').objects.create(
+        pk=1, **{field: value or 0 for field, value in totals.items()}
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('offices', '0007_office_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OfficeOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_count', models.PositiveIntegerField(default=0)),
+                ('available_count', models.PositiveIntegerField(default=0)),
+                ('rented_count', models.PositiveIntegerField(default=0)),
+                ('rented_sqft', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('rented_annual_rent', models.BigIntegerField(default=0)),
+                ('total_annual_rent', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'office occupancy',
+            },
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
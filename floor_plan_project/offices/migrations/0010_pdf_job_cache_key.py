@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('offices', '0009_pdf_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pdfjob',
+            name='cache_key',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
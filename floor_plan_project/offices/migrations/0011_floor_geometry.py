@@ -0,0 +1,129 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The office boxes that used to be hard-coded in static/offices/js/main.js,
+# as office number: (x, y, width, height) in pixels of the 822 x 865 plan
+OFFICE_BOXES = {
+    1: (714, 468, 64, 50),
+    2: (737, 546, 64, 50),
+    3: (737, 627, 64, 50),
+    4: (625, 490, 41, 61),
+    5: (625, 581, 41, 61),
+    6: (574, 490, 41, 61),
+    7: (533, 581, 41, 61),
+    8: (533, 500, 31, 51),
+    9: (533, 445, 31, 51),
+    10: (533, 389, 31, 51),
+    11: (533, 354, 31, 31),
+    12: (574, 430, 41, 56),
+    13: (625, 430, 41, 56),
+    14: (714, 400, 51, 35),
+    15: (625, 344, 71, 51),
+    16: (625, 288, 71, 51),
+    17: (625, 227, 71, 51),
+    18: (461, 214, 46, 51),
+    19: (461, 159, 46, 51),
+    20: (553, 149, 46, 51),
+    21: (461, 76, 46, 46),
+    22: (409, 159, 46, 51),
+    23: (409, 214, 46, 51),
+    24: (358, 214, 46, 51),
+    25: (358, 159, 46, 51),
+    26: (358, 76, 46, 46),
+    27: (307, 159, 46, 51),
+    28: (302, 76, 46, 46),
+    29: (307, 214, 46, 51),
+    30: (307, 270, 46, 46),
+    31: (236, 272, 46, 46),
+    32: (236, 323, 46, 46),
+    33: (236, 374, 46, 46),
+    34: (307, 373, 46, 46),
+    35: (307, 425, 46, 46),
+    36: (184, 374, 46, 46),
+    37: (307, 476, 46, 46),
+    38: (184, 425, 46, 46),
+    39: (307, 527, 46, 46),
+    41: (307, 577, 46, 46),
+    44: (82, 582, 46, 46),
+    46: (82, 527, 46, 46),
+    47: (133, 527, 46, 46),
+    48: (82, 470, 46, 46),
+    49: (133, 470, 46, 46),
+    50: (184, 323, 46, 46),
+    51: (82, 415, 46, 46),
+    52: (184, 272, 46, 46),
+    53: (82, 360, 46, 46),
+    54: (82, 272, 46, 46),
+    55: (82, 217, 46, 46),
+    56: (82, 126, 46, 46),
+    57: (159, 76, 46, 46),
+    58: (210, 76, 46, 46),
+    60: (466, 678, 46, 46),
+    61: (307, 729, 46, 46),
+    62: (364, 729, 46, 46),
+    63: (307, 785, 46, 46),
+    64: (415, 729, 46, 46),
+    67: (645, 785, 46, 46),
+    68: (589, 785, 46, 46),
+    69: (533, 785, 46, 46),
+}
+
+
+def create_ground_floor(apps, schema_editor):
+    Office = apps.get_model('offices', 'Office')
+    Floor = apps.get_model('offices', 'Floor')
+    OfficeGeometry = apps.get_model('offices', 'OfficeGeometry')
+    floor = Floor.objects.create(
+        building='Business Center', name='Ground Floor', level=0,
+        plan_image='offices/images/floor-plan.png', width=822, height=865,
+    )
+    existing = set(Office.objects.filter(pk__in=list(OFFICE_BOXES)).values_list('pk', flat=True))
+    OfficeGeometry.objects.bulk_create([
+        OfficeGeometry(office_id=number, floor=floor, x=x, y=y, width=width, height=height)
+        for number, (x, y, width, height) in OFFICE_BOXES.items()
+        if number in existing
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('offices', '0010_pdf_job_cache_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Floor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('building', models.CharField(max_length=100)),
+                ('name', models.CharField(max_length=100)),
+                ('level', models.IntegerField(default=0)),
+                ('plan_image', models.CharField(blank=True, max_length=200)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+            ],
+            options={
+                'ordering': ['building', 'level'],
+                'constraints': [models.UniqueConstraint(fields=('building', 'level'), name='unique_floor_per_building')],
+            },
+        ),
+        migrations.CreateModel(
+            name='OfficeGeometry',
+            fields=[
+                ('office', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='geometry', serialize=False, to='offices.office')),
+                ('x', models.FloatField()),
+                ('y', models.FloatField()),
+                ('width', models.FloatField()),
+                ('height', models.FloatField()),
+                ('polygon', models.JSONField(blank=True, null=True)),
+                ('floor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='offices', to='offices.floor')),
+            ],
+            options={
+                'verbose_name_plural': 'office geometry',
+            },
+        ),
+        migrations.RunPython(create_ground_floor, migrations.RunPython.noop),
+    ]
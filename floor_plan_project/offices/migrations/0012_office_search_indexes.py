@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('offices', '0011_floor_geometry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='office',
+            index=models.Index(fields=['status', 'size_sqft'], name='office_status_size_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='office',
+            index=models.Index(fields=['expiry_date'], name='office_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('offices', '0012_office_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='officesyncstate',
+            name='geometry_stamp',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -1,6 +1,15 @@
 # offices/models.py
 
-from django.db import models
+import time
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
 
 class Office(models.Model):
     STATUS_CHOICES = [
@@ -20,7 +29,275 @@ class Office(models.Model):
     contact_person = models.CharField(max_length=200, blank=True, null=True)
     contact_email = models.EmailField(max_length=254, blank=True, null=True)
     contact_phone = models.CharField(max_length=50, blank=True, null=True)
+    # Value of the office version counter when this office last changed (see below)
+    version = models.PositiveBigIntegerField(default=0, db_index=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Office search (offices/search.py). (status, size_sqft) also serves status-only
+            # lookups as its leftmost column, so status has no index of its own.
+            models.Index(fields=['status', 'size_sqft'], name='office_status_size_idx'),
+            models.Index(fields=['expiry_date'], name='office_expiry_idx'),
+        ]
 
     def __str__(self):
         return f"Office {self.office_number}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so the occupancy counters can subtract the old values on save
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    # The version and occupancy counters are updated by the signals below: keep them in
+    # the same transaction as the office row itself
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
+
+class Floor(models.Model):
+    """
+    One floor of a building. Office geometry is in the floor's own units: pixels of the
+    plan image at its natural size, with (0, 0) at the top left.
+    """
+    building = models.CharField(max_length=100)
+    name = models.CharField(max_length=100)
+    level = models.IntegerField(default=0)
+    # Path of the plan image under the static files
+    plan_image = models.CharField(max_length=200, blank=True)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['building', 'level']
+        constraints = [
+            models.UniqueConstraint(fields=['building', 'level'], name='unique_floor_per_building'),
+        ]
+
+    def __str__(self):
+        return f"{self.building} - {self.name}"
+
+
+class OfficeGeometry(models.Model):
+    """
+    Where an office is drawn: a rectangle, or a polygon when `polygon` is set (its
+    bounding box is then kept in x/y/width/height, which is what the spatial index uses).
+    """
+    office = models.OneToOneField(Office, on_delete=models.CASCADE, primary_key=True, related_name='geometry')
+    floor = models.ForeignKey(Floor, on_delete=models.CASCADE, related_name='offices')
+    x = models.FloatField()
+    y = models.FloatField()
+    width = models.FloatField()
+    height = models.FloatField()
+    # [[x, y], ...] in floor units, or null for a plain rectangle
+    polygon = models.JSONField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "office geometry"
+
+    def __str__(self):
+        return f"Office {self.office_id} on {self.floor}"
+
+    def clean(self):
+        if self.polygon is not None:
+            if (not isinstance(self.polygon, list) or len(self.polygon) < 3
+                    or not all(isinstance(point, list) and len(point) == 2 for point in self.polygon)):
+                raise ValidationError({'polygon': "Give at least three [x, y] points."})
+
+    def save(self, *args, **kwargs):
+        if self.polygon:
+            xs = [point[0] for point in self.polygon]
+            ys = [point[1] for point in self.polygon]
+            self.x, self.y = min(xs), min(ys)
+            self.width, self.height = max(xs) - self.x, max(ys) - self.y
+        super().save(*args, **kwargs)
+
+
+class OfficeSyncState(models.Model):
+    """
+    A single row holding the offices version counter. Every Office change takes the next
+    version, so the offices API can answer 304 while the counter hasn't moved and send
+    only the offices with version > N to a client that has version N.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+    # Deletions leave nothing to send in a delta: clients older than this reload everything
+    last_delete_version = models.PositiveBigIntegerField(default=0)
+    # Moves whenever the floors or the office geometry change (see bump_geometry_stamp)
+    geometry_stamp = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Offices at version {self.version}"
+
+
+class OfficeOccupancy(models.Model):
+    """
+    A single row of running totals over all offices, kept up to date by the signals below
+    (see offices/occupancy.py). Repair drift with `manage.py reconcile_office_occupancy`.
+    """
+    total_count = models.PositiveIntegerField(default=0)
+    available_count = models.PositiveIntegerField(default=0)
+    rented_count = models.PositiveIntegerField(default=0)
+    rented_sqft = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    rented_annual_rent = models.BigIntegerField(default=0)
+    total_annual_rent = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "office occupancy"
+
+    def __str__(self):
+        return f"{self.rented_count} of {self.total_count} offices rented"
+
+
+class PdfJob(models.Model):
+    """
+    One PDF to render in the background (see offices/pdf_jobs.py). The HTML is rendered
+    when the job is queued, so a worker only has to lay it out; the result is stored on
+    the row until it's downloaded or expires.
+    """
+    QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=30)
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='pdf_jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    filename = models.CharField(max_length=200)
+    html = models.TextField()
+    base_url = models.CharField(max_length=500, blank=True)
+    pdf = models.BinaryField(null=True, editable=False)
+    # Where the finished PDF goes in the on-disk cache (offices/pdf_cache.py), if anywhere
+    cache_key = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The workers' "next queued job" and "stuck running jobs" lookups
+            models.Index(fields=['status', 'created_at'], name='pdfjob_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.status})"
+
+
+# --- GEOMETRY STAMP ---
+# Each process keeps its spatial indexes in memory (offices/spatial.py); this shared
+# stamp (OfficeSyncState.geometry_stamp) tells them when the floors or the geometry
+# changed and they must be rebuilt.
+
+def get_geometry_stamp():
+    return OfficeSyncState.objects.values_list('geometry_stamp', flat=True).first() or 0
+
+def bump_geometry_stamp():
+    """
+    Call this after bulk changes to floors or geometry, which don't send model signals.
+    The UPDATE runs in the caller's transaction, so the new stamp becomes visible with
+    the change itself.
+    """
+    # The time rather than a plain counter: a stamp is never handed out twice, even after
+    # a rolled-back change, so an index built from other geometry can't look current
+    changes = {'geometry_stamp': Greatest(F('geometry_stamp') + 1, Value(time.time_ns()))}
+    with transaction.atomic():
+        if not OfficeSyncState.objects.filter(pk=1).update(**changes):
+            OfficeSyncState.objects.get_or_create(pk=1)
+            OfficeSyncState.objects.filter(pk=1).update(**changes)
+
+@receiver([post_save, post_delete], sender=Floor)
+@receiver([post_save, post_delete], sender=OfficeGeometry)
+def geometry_changed(sender, **kwargs):
+    bump_geometry_stamp()
+
+
+# --- OFFICE VERSION COUNTER ---
+
+def current_office_version():
+    return OfficeSyncState.objects.values_list('version', flat=True).first() or 0
+
+def next_office_version(deleted=False):
+    """
+    Increments the counter and returns the new value. The UPDATE locks the counter row
+    until the surrounding transaction ends, so versions become visible in order.
+    """
+    changes = {'version': F('version') + 1}
+    if deleted:
+        changes['last_delete_version'] = F('version') + 1
+    with transaction.atomic():
+        if not OfficeSyncState.objects.filter(pk=1).update(**changes):
+            OfficeSyncState.objects.get_or_create(pk=1)
+            OfficeSyncState.objects.filter(pk=1).update(**changes)
+        return OfficeSyncState.objects.values_list('version', flat=True).get(pk=1)
+
+def touch_offices(queryset):
+    """Call this after bulk .update()s on offices, which don't send signals."""
+    return queryset.update(version=next_office_version())
+
+@receiver(pre_save, sender=Office)
+def stamp_office_version(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance.version = next_office_version()
+
+@receiver(post_delete, sender=Office)
+def record_office_delete(sender, instance, **kwargs):
+    next_office_version(deleted=True)
+
+
+# --- OCCUPANCY COUNTERS ---
+# Bulk changes go through offices.occupancy.update_offices(), which adjusts them itself.
+
+@receiver(pre_save, sender=Office)
+def remember_office_occupancy(sender, instance, **kwargs):
+    from .occupancy import office_saving
+    office_saving(instance)
+
+@receiver(post_save, sender=Office)
+def update_occupancy_on_office_save(sender, instance, created, **kwargs):
+    from .occupancy import office_saved
+    office_saved(instance, created)
+
+@receiver(post_delete, sender=Office)
+def update_occupancy_on_office_delete(sender, instance, **kwargs):
+    from .occupancy import office_deleted
+    office_deleted(instance)
+
+
+# --- CACHED PDFS ---
+# The cached available-offices list is stale once any office changes status
+# (bulk changes: see offices.occupancy.update_offices).
+
+def drop_cached_available_lists():
+    from . import pdf_cache
+    transaction.on_commit(lambda: pdf_cache.invalidate(pdf_cache.AVAILABLE_OFFICES))
+
+# Registered after remember_office_occupancy, which loads the old status when it's missing
+@receiver(pre_save, sender=Office)
+def drop_cached_lists_on_status_change(sender, instance, **kwargs):
+    old = getattr(instance, '_loaded_values', None) or {}
+    if old.get('status') != instance.status:
+        drop_cached_available_lists()
+
+@receiver(post_delete, sender=Office)
+def drop_cached_lists_on_office_delete(sender, instance, **kwargs):
+    drop_cached_available_lists()
+
+
+
+@receiver(post_save, sender=Office)
+def publish_office_change(sender, instance, raw=False, **kwargs):
+    """Lets open floor plans repaint this one office (same fields as the offices API)."""
+    from core.events import publish
+    from .serializers import OfficeSerializer
+    if not raw:
+        publish('offices', OfficeSerializer(instance).data)
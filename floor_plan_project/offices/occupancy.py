@@ -0,0 +1,133 @@
+# offices/occupancy.py
+#
+# Keeps the OfficeOccupancy counters row in step with the offices, so the statistics API
+# and the cheque dashboard read ONE row instead of counting the offices table.
+#
+# Every change is applied as a delta (subtract the office's old contribution, add the new
+# one) with F() expressions, inside the transaction that changes the office.
+# reconcile_office_occupancy() recomputes the row from scratch and reports any drift.
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import Office, OfficeOccupancy, touch_offices, drop_cached_available_lists
+
+COUNTER_FIELDS = (
+    'total_count', 'available_count', 'rented_count',
+    'rented_sqft', 'rented_annual_rent', 'total_annual_rent',
+)
+
+
+def _empty_deltas():
+    return {field: 0 for field in COUNTER_FIELDS}
+
+
+def _add_office(deltas, status, size_sqft, annual_rent, sign=1):
+    deltas['total_count'] += sign
+    deltas['total_annual_rent'] += sign * (annual_rent or 0)
+    if status == 'available':
+        deltas['available_count'] += sign
+    elif status == 'rented':
+        deltas['rented_count'] += sign
+        deltas['rented_sqft'] += sign * Decimal(size_sqft or 0)
+        deltas['rented_annual_rent'] += sign * (annual_rent or 0)
+
+
+def apply_occupancy_deltas(deltas):
+    changes = {field: F(field) + value for field, value in deltas.items() if value}
+    if not changes:
+        return
+    with transaction.atomic():
+        if not OfficeOccupancy.objects.filter(pk=1).update(**changes):
+            # No counters row yet (fresh database): build it from the table instead,
+            # which already includes this change
+            reconcile_office_occupancy()
+
+
+def office_saving(office):
+    """pre_save: makes sure the office's old values are known before they are overwritten."""
+    fields = ('status', 'size_sqft', 'annual_rent')
+    old = getattr(office, '_loaded_values', None) or {}
+    if any(field not in old for field in fields):
+        # Not loaded from the database, or loaded with .only()/.defer()
+        stored = Office.objects.filter(pk=office.pk).values(*fields).first()
+        if stored is not None:
+            office._loaded_values = dict(old, **stored)
+
+
+def office_saved(office, created):
+    deltas = _empty_deltas()
+    old = getattr(office, '_loaded_values', None) or {}
+    if not created and 'status' in old:
+        _add_office(deltas, old['status'], old['size_sqft'], old['annual_rent'], -1)
+    _add_office(deltas, office.status, office.size_sqft, office.annual_rent)
+    apply_occupancy_deltas(deltas)
+    office._loaded_values = dict(
+        old, status=office.status, size_sqft=office.size_sqft, annual_rent=office.annual_rent,
+    )
+
+
+def office_deleted(office):
+    deltas = _empty_deltas()
+    _add_office(deltas, office.status, office.size_sqft, office.annual_rent, -1)
+    apply_occupancy_deltas(deltas)
+
+
+def _totals(queryset):
+    """The counter values for a set of offices, in one aggregate query."""
+    totals = queryset.aggregate(
+        total_count=Count('pk'),
+        available_count=Count('pk', filter=Q(status='available')),
+        rented_count=Count('pk', filter=Q(status='rented')),
+        rented_sqft=Sum('size_sqft', filter=Q(status='rented')),
+        rented_annual_rent=Sum('annual_rent', filter=Q(status='rented')),
+        total_annual_rent=Sum('annual_rent'),
+    )
+    return {field: value or 0 for field, value in totals.items()}
+
+
+def update_offices(queryset, **changes):
+    """
+    queryset.update(**changes) for offices, keeping the occupancy counters, the
+    offices version and the cached available-offices PDFs right. Plain .update() sends no signals. Returns the row count.
+    """
+    with transaction.atomic():
+        pks = list(queryset.select_for_update().values_list('pk', flat=True))
+        affected = Office.objects.filter(pk__in=pks)
+        before = _totals(affected)
+        count = affected.update(**changes)
+        after = _totals(affected)
+        apply_occupancy_deltas({field: after[field] - before[field] for field in COUNTER_FIELDS})
+        touch_offices(affected)
+        if 'status' in changes:
+            drop_cached_available_lists()
+    return count
+
+
+def get_office_occupancy():
+    """The counters as a dict (one query; builds the row on first use)."""
+    occupancy = OfficeOccupancy.objects.filter(pk=1).values(*COUNTER_FIELDS).first()
+    if occupancy is None:
+        reconcile_office_occupancy()
+        occupancy = OfficeOccupancy.objects.filter(pk=1).values(*COUNTER_FIELDS).get()
+    return occupancy
+
+
+def reconcile_office_occupancy():
+    """
+    Recomputes the counters from the offices table. Returns {field: (stored, actual)}
+    for every counter that had drifted (empty when the row was right).
+    """
+    with transaction.atomic():
+        occupancy, _ = OfficeOccupancy.objects.select_for_update().get_or_create(pk=1)
+        actual = _totals(Office.objects.all())
+        drift = {
+            field: (getattr(occupancy, field), actual[field])
+            for field in COUNTER_FIELDS
+            if getattr(occupancy, field) != actual[field]
+        }
+        if drift:
+            OfficeOccupancy.objects.filter(pk=1).update(**actual)
+    return drift
@@ -0,0 +1,95 @@
+# offices/pdf_cache.py
+#
+# Content-addressed on-disk cache of rendered PDFs.
+#
+# The key is a hash of the rendered HTML, which already covers the template, the context
+# (office rows, proposal form input) and the generation date printed on the document,
+# plus the modification times of files the HTML only points to (the logo). The same
+# input therefore always finds the same file, and any change simply makes a new key.
+#
+# Files are named <kind>-<hash>.pdf, so one kind can be dropped at once (the available-
+# offices list when an office's status changes). The directory is kept under
+# PDF_CACHE_MAX_BYTES by evicting the least recently used files; a hit refreshes the
+# file's mtime, which is what "recently used" means here.
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+# The kind of the available-offices list, which depends on every office's status
+AVAILABLE_OFFICES = 'available-offices'
+
+
+def _cache_dir():
+    return Path(settings.PDF_CACHE_DIR)
+
+
+def cache_key(kind, html, files=()):
+    digest = hashlib.sha256(html.encode())
+    for path in files:
+        try:
+            digest.update(f"\0{path}:{os.stat(path).st_mtime_ns}".encode())
+        except FileNotFoundError:
+            digest.update(f"\0{path}:missing".encode())
+    return f"{kind}-{digest.hexdigest()}"
+
+
+def open_cached(key):
+    """An open binary file for the key, or None. Counts as a use for the LRU order."""
+    path = _cache_dir() / f"{key}.pdf"
+    try:
+        pdf = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        pass  # Evicted right after opening: the open handle still reads it
+    return pdf
+
+
+def store(key, data):
+    directory = _cache_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    # Write to a temporary file and rename, so a reader never sees half a PDF
+    handle, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(handle, 'wb') as file:
+        file.write(data)
+    os.replace(temporary, directory / f"{key}.pdf")
+    evict()
+
+
+def evict(max_bytes=None):
+    """Deletes the least recently used files until the cache fits. Returns how many went."""
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'PDF_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+    try:
+        entries = [(entry.stat().st_mtime_ns, entry.stat().st_size, entry.path)
+                   for entry in os.scandir(_cache_dir()) if entry.name.endswith('.pdf')]
+    except FileNotFoundError:
+        return 0
+    total = sum(size for _, size, _ in entries)
+    evicted = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        evicted += 1
+    return evicted
+
+
+def invalidate(kind):
+    """Drops every cached PDF of one kind."""
+    for path in _cache_dir().glob(f"{kind}-*.pdf"):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
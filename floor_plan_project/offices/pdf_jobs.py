@@ -0,0 +1,204 @@
+# offices/pdf_jobs.py
+#
+# Background PDF rendering. WeasyPrint takes from hundreds of milliseconds to seconds
+# per document, too long to hold a web worker for, so:
+#
+#   1. the view renders the template to HTML and queues a PdfJob row (enqueue_pdf),
+#      unless the PDF is already in the on-disk cache (offices/pdf_cache.py);
+#   2. a PdfRenderService claims queued jobs and lays them out in a process pool;
+#   3. the browser polls the job and downloads the PDF once it's done. Finished PDFs
+#      also go into the cache, so the next identical request is served from disk.
+#
+# The queue is the PdfJob table, so nothing beyond the database is needed. By default the
+# service runs inside the web process, started by the first job; with
+# PDF_RENDER_IN_WEB_PROCESS = False run `manage.py run_pdf_worker` instead. Several
+# services (one per web process, or several workers) can share the table: a job is
+# claimed with a conditional UPDATE, so only one of them gets it.
+#
+# Fairness: a free slot goes to the oldest job of whoever has the FEWEST jobs running, so
+# one user queuing ten PDFs never makes everybody else wait behind them.
+
+import datetime
+import logging
+import multiprocessing
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import pdf_cache
+from .models import PdfJob
+from .pdf_render import render_pdf
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+# How often an idle service looks at the table (new jobs from this process wake it at once)
+POLL_INTERVAL = 2.0
+# A job running longer than this belongs to a worker that died: it goes back in the queue
+STALE_AFTER = datetime.timedelta(minutes=5)
+# Finished jobs (and their PDFs) are kept this long for the download
+KEEP_FINISHED = datetime.timedelta(hours=6)
+# How many queued jobs a claim looks at when picking the fairest one
+CLAIM_WINDOW = 50
+
+
+def enqueue_pdf(kind, html, filename, user, base_url='', cache_key=''):
+    """Queues the HTML for rendering. Returns the PdfJob."""
+    job = PdfJob.objects.create(
+        kind=kind,
+        requested_by=user,
+        filename=filename,
+        html=html,
+        base_url=base_url,
+        cache_key=cache_key,
+    )
+    if getattr(settings, 'PDF_RENDER_IN_WEB_PROCESS', True):
+        transaction.on_commit(lambda: get_render_service().wake())
+    return job
+
+
+def claim_next_job():
+    """Marks the fairest queued job as running and returns it (None if the queue is empty)."""
+    while True:
+        queued = list(
+            PdfJob.objects.filter(status=PdfJob.QUEUED)
+            .order_by('created_at')
+            .values_list('pk', 'requested_by_id')[:CLAIM_WINDOW]
+        )
+        if not queued:
+            return None
+        running = Counter(
+            PdfJob.objects.filter(status=PdfJob.RUNNING).values_list('requested_by_id', flat=True)
+        )
+        # min() keeps the first (oldest) job among users with equally few running
+        job_id, _ = min(queued, key=lambda job: running[job[1]])
+        claimed = PdfJob.objects.filter(pk=job_id, status=PdfJob.QUEUED).update(
+            status=PdfJob.RUNNING, started_at=timezone.now()
+        )
+        if claimed:
+            return PdfJob.objects.only('pk', 'html', 'base_url', 'cache_key').get(pk=job_id)
+        # Another service took it first: look again
+
+
+def requeue_stale_jobs():
+    return PdfJob.objects.filter(
+        status=PdfJob.RUNNING, started_at__lt=timezone.now() - STALE_AFTER
+    ).update(status=PdfJob.QUEUED, started_at=None)
+
+
+def delete_expired_jobs():
+    return PdfJob.objects.filter(
+        status__in=[PdfJob.DONE, PdfJob.FAILED], finished_at__lt=timezone.now() - KEEP_FINISHED
+    ).delete()[0]
+
+
+def finish_job(job_id, future, cache_key=''):
+    try:
+        pdf = future.result()
+    except Exception as error:
+        logger.exception("Rendering PDF job %s failed", job_id)
+        PdfJob.objects.filter(pk=job_id).update(
+            status=PdfJob.FAILED, error=str(error) or error.__class__.__name__, html='', finished_at=timezone.now()
+        )
+    else:
+        # The HTML isn't needed any more; the PDF is what gets downloaded
+        PdfJob.objects.filter(pk=job_id).update(
+            status=PdfJob.DONE, pdf=pdf, html='', finished_at=timezone.now()
+        )
+        if cache_key:
+            try:
+                pdf_cache.store(cache_key, pdf)
+            except OSError:
+                # The job has its copy; only the next identical request misses out
+                logger.exception("Could not cache PDF job %s", job_id)
+
+
+class PdfRenderService:
+    """
+    Feeds queued jobs to a process pool, at most `workers` at a time. step() does one
+    round of bookkeeping; start() runs it on a background thread.
+    """
+
+    def __init__(self, workers=None, executor=None):
+        self.workers = workers or getattr(settings, 'PDF_RENDER_WORKERS', DEFAULT_WORKERS)
+        # 'spawn': forking a threaded web server process is unsafe, and the children
+        # only need offices.pdf_render anyway
+        self.executor = executor or ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context('spawn')
+        )
+        self.in_flight = {}  # job id -> (future, cache key)
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_cleanup = None
+
+    def wake(self):
+        self._wakeup.set()
+
+    def step(self):
+        """Stores finished renders, then fills the free slots. Returns the number of jobs in flight."""
+        for job_id, (future, cache_key) in list(self.in_flight.items()):
+            if future.done():
+                finish_job(job_id, future, cache_key)
+                del self.in_flight[job_id]
+
+        now = timezone.now()
+        if self._last_cleanup is None or now - self._last_cleanup > datetime.timedelta(minutes=1):
+            requeue_stale_jobs()
+            delete_expired_jobs()
+            self._last_cleanup = now
+
+        while len(self.in_flight) < self.workers:
+            job = claim_next_job()
+            if job is None:
+                break
+            future = self.executor.submit(render_pdf, job.html, job.base_url)
+            future.add_done_callback(lambda _: self.wake())
+            self.in_flight[job.pk] = (future, job.cache_key)
+        return len(self.in_flight)
+
+    def drain(self):
+        """Runs until the queue is empty and every job has finished (management command, tests)."""
+        while self.step():
+            self._wakeup.wait(POLL_INTERVAL)
+            self._wakeup.clear()
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                close_old_connections()
+                self.step()
+            except Exception:
+                # Keep serving; the database may just be briefly unavailable
+                logger.exception("PDF render service step failed")
+            self._wakeup.wait(POLL_INTERVAL)
+            self._wakeup.clear()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name='pdf-render-service', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.wake()
+        if self._thread is not None:
+            self._thread.join()
+        self.executor.shutdown()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_render_service():
+    """The web process's own render service, started on first use."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = PdfRenderService()
+                _service.start()
+    return _service
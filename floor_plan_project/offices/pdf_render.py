@@ -0,0 +1,10 @@
+# offices/pdf_render.py
+#
+# The part of PDF rendering that runs in the worker processes (see offices/pdf_jobs.py).
+# Kept free of Django imports so a freshly spawned process only has to load WeasyPrint.
+
+from weasyprint import HTML
+
+
+def render_pdf(html, base_url):
+    return HTML(string=html, base_url=base_url).write_pdf()
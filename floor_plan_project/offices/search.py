@@ -0,0 +1,79 @@
+# offices/search.py
+#
+# Office search for leasing staff: /floor-plan/api/offices/search/ (see OfficeViewSet).
+#
+#   status=available|rented      size_min= / size_max=       (sqft)
+#   rent_min= / rent_max=        (annual rent)               expires_after= / expires_before=  (YYYY-MM-DD)
+#   company=<part of the name>   building=<name>             floor=<floor id>
+#   ordering=office_number|size_sqft|annual_rent (prefix - for descending)
+#
+# Results come a page at a time with cursor pagination, so a deep page costs the same as
+# the first one. Status + size searches are answered from the (status, size_sqft) index;
+# the expiry window uses the expiry_date index.
+
+import math
+
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ParseError
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.pagination import CursorPagination
+
+from .models import Office
+
+
+def _param(request, name, convert, label):
+    value = request.query_params.get(name, '').strip()
+    if not value:
+        return None
+    try:
+        converted = convert(value)
+    except (TypeError, ValueError, ArithmeticError):
+        converted = None
+    if converted is None:
+        raise ParseError(f"{name} must be {label}.")
+    return converted
+
+
+def _number(value):
+    number = float(value)
+    return number if math.isfinite(number) else None
+
+
+class OfficeSearchFilter(BaseFilterBackend):
+    STATUSES = {value for value, _ in Office.STATUS_CHOICES}
+
+    def filter_queryset(self, request, queryset, view):
+        status = request.query_params.get('status', '').strip()
+        if status:
+            if status not in self.STATUSES:
+                raise ParseError(f"status must be one of: {', '.join(sorted(self.STATUSES))}.")
+            queryset = queryset.filter(status=status)
+
+        ranges = [
+            ('size_min', 'size_sqft__gte', _number, "a number"),
+            ('size_max', 'size_sqft__lte', _number, "a number"),
+            ('rent_min', 'annual_rent__gte', int, "a whole number"),
+            ('rent_max', 'annual_rent__lte', int, "a whole number"),
+            ('expires_after', 'expiry_date__gte', parse_date, "a date (YYYY-MM-DD)"),
+            ('expires_before', 'expiry_date__lte', parse_date, "a date (YYYY-MM-DD)"),
+            ('floor', 'geometry__floor_id', int, "a floor id"),
+        ]
+        for name, lookup, convert, label in ranges:
+            value = _param(request, name, convert, label)
+            if value is not None:
+                queryset = queryset.filter(**{lookup: value})
+
+        company = request.query_params.get('company', '').strip()
+        if company:
+            queryset = queryset.filter(company_name__icontains=company)
+        building = request.query_params.get('building', '').strip()
+        if building:
+            queryset = queryset.filter(geometry__floor__building__iexact=building)
+        return queryset
+
+
+class OfficeCursorPagination(CursorPagination):
+    ordering = 'office_number'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
@@ -1,14 +1,26 @@
 # offices/serializers.py
 
+from django.templatetags.static import static
 from rest_framework import serializers
-from .models import Office
+from .models import Office, Floor
 
 class OfficeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Office
         # --- ADD 'expiry_date' TO THIS LIST ---
         fields = ['office_number', 'size_sqft', 'annual_rent', 'status', 'expiry_date',
-        'company_name', 'contact_person', 'contact_email', 'contact_phone'
+        'company_name', 'contact_person', 'contact_email', 'contact_phone', 'version'
         ]
         # ------------------------------------
 
+
+
+class FloorSerializer(serializers.ModelSerializer):
+    plan_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Floor
+        fields = ['id', 'building', 'name', 'level', 'width', 'height', 'plan_url']
+
+    def get_plan_url(self, floor):
+        return static(floor.plan_image) if floor.plan_image else None
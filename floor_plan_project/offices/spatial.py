@@ -0,0 +1,133 @@
+# offices/spatial.py
+#
+# In-memory spatial index over the office shapes of a floor, for hit-testing ("which
+# office is at this point"), "offices near X" and loading only what's in the viewport.
+#
+# A uniform grid: every shape is filed under each GRID_CELL x GRID_CELL cell its bounding
+# box touches, so a query only looks at the shapes in the cells it covers instead of every
+# office on the floor. Office boxes are all roughly the same size, which is the case where
+# a grid does as well as an R-tree with a fraction of the code.
+#
+# Indexes are built per floor on first use and kept per process until the geometry
+# stamp (offices.models.get_geometry_stamp, kept in the database) moves.
+
+import math
+import threading
+from collections import defaultdict
+
+from .models import OfficeGeometry, get_geometry_stamp
+
+# Floor units (plan pixels) per grid cell: about one office box across
+GRID_CELL = 64
+
+
+class Shape:
+    __slots__ = ('office_number', 'x', 'y', 'width', 'height', 'polygon')
+
+    def __init__(self, office_number, x, y, width, height, polygon=None):
+        self.office_number = office_number
+        self.x, self.y, self.width, self.height = x, y, width, height
+        self.polygon = polygon
+
+    @property
+    def right(self):
+        return self.x + self.width
+
+    @property
+    def bottom(self):
+        return self.y + self.height
+
+    def overlaps_box(self, x0, y0, x1, y1):
+        return self.x <= x1 and self.right >= x0 and self.y <= y1 and self.bottom >= y0
+
+    def contains(self, x, y):
+        if not (self.x <= x <= self.right and self.y <= y <= self.bottom):
+            return False
+        if not self.polygon:
+            return True
+        # Ray casting: count the polygon edges crossed by a ray going right from the point
+        inside = False
+        points = self.polygon
+        for (ax, ay), (bx, by) in zip(points, points[1:] + points[:1]):
+            if (ay > y) != (by > y) and x < ax + (y - ay) * (bx - ax) / (by - ay):
+                inside = not inside
+        return inside
+
+    def distance_to(self, x, y):
+        """Distance from the point to the shape's bounding box (0 inside it)."""
+        dx = max(self.x - x, 0, x - self.right)
+        dy = max(self.y - y, 0, y - self.bottom)
+        return math.hypot(dx, dy)
+
+
+class GridIndex:
+    def __init__(self, shapes, cell_size=GRID_CELL):
+        self.cell_size = cell_size
+        self.shapes = list(shapes)
+        self.cells = defaultdict(list)
+        for shape in self.shapes:
+            for cell in self._cells(shape.x, shape.y, shape.right, shape.bottom):
+                self.cells[cell].append(shape)
+
+    def _cells(self, x0, y0, x1, y1):
+        size = self.cell_size
+        for column in range(math.floor(x0 / size), math.floor(x1 / size) + 1):
+            for row in range(math.floor(y0 / size), math.floor(y1 / size) + 1):
+                yield column, row
+
+    def _candidates(self, x0, y0, x1, y1):
+        seen = set()
+        for cell in self._cells(x0, y0, x1, y1):
+            for shape in self.cells.get(cell, ()):
+                if shape.office_number not in seen:
+                    seen.add(shape.office_number)
+                    yield shape
+
+    def in_box(self, x0, y0, x1, y1):
+        """Shapes whose bounding box overlaps the box, by office number."""
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        # A huge box (the whole floor zoomed out) is cheaper as a plain scan
+        if (x1 - x0) * (y1 - y0) >= len(self.cells) * self.cell_size ** 2:
+            matches = [shape for shape in self.shapes if shape.overlaps_box(x0, y0, x1, y1)]
+        else:
+            matches = [shape for shape in self._candidates(x0, y0, x1, y1) if shape.overlaps_box(x0, y0, x1, y1)]
+        return sorted(matches, key=lambda shape: shape.office_number)
+
+    def at_point(self, x, y):
+        """The shape under the point, or None."""
+        size = self.cell_size
+        for shape in self.cells.get((math.floor(x / size), math.floor(y / size)), ()):
+            if shape.contains(x, y):
+                return shape
+        return None
+
+    def nearby(self, x, y, radius, limit=None):
+        """(distance, shape) pairs within `radius` of the point, closest first."""
+        found = [
+            (shape.distance_to(x, y), shape)
+            for shape in self._candidates(x - radius, y - radius, x + radius, y + radius)
+        ]
+        found = sorted(
+            ((distance, shape) for distance, shape in found if distance <= radius),
+            key=lambda pair: (pair[0], pair[1].office_number),
+        )
+        return found[:limit] if limit else found
+
+
+_indexes = {}  # floor id -> (geometry stamp, GridIndex)
+_indexes_lock = threading.Lock()
+
+def floor_index(floor_id):
+    """The (cached) index of one floor's office shapes."""
+    stamp = get_geometry_stamp()
+    cached = _indexes.get(floor_id)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    rows = OfficeGeometry.objects.filter(floor_id=floor_id).values_list(
+        'office_id', 'x', 'y', 'width', 'height', 'polygon'
+    )
+    index = GridIndex(Shape(*row) for row in rows)
+    with _indexes_lock:
+        _indexes[floor_id] = (stamp, index)
+    return index
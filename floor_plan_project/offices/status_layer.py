@@ -0,0 +1,60 @@
+# offices/status_layer.py
+#
+# The floor plan's office status colours as ONE server-rendered SVG, so the plan shows
+# who's in which office on first paint, before (or without) any JavaScript.
+#
+# The SVG only changes when an office changes (offices version) or the geometry does
+# (geometry stamp), so it's rendered once per version, gzipped, and kept in the cache.
+# Its URL carries that version: browsers may keep it for a year, and a new version is
+# simply a new URL.
+
+import gzip
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.templatetags.static import static
+
+from .models import OfficeGeometry, OfficeSyncState
+
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def status_layer_version():
+    # Both counters are on the OfficeSyncState row, so every worker builds the same URL
+    version, geometry_stamp = OfficeSyncState.objects.values_list('version', 'geometry_stamp').first() or (0, 0)
+    return f"{version}-{geometry_stamp}"
+
+
+def _number(value):
+    # 714.0 -> '714' keeps the SVG small
+    return f"{value:.2f}".rstrip('0').rstrip('.')
+
+
+def render_status_svg(floor, include_plan=False):
+    offices = []
+    rows = OfficeGeometry.objects.filter(floor=floor).order_by('office_id').values_list(
+        'office_id', 'office__status', 'x', 'y', 'width', 'height', 'polygon'
+    )
+    for number, status, x, y, width, height, polygon in rows:
+        offices.append({
+            'number': number,
+            'status': status,
+            'x': _number(x), 'y': _number(y), 'width': _number(width), 'height': _number(height),
+            'points': ' '.join(f"{_number(px)},{_number(py)}" for px, py in polygon) if polygon else '',
+            'center_x': _number(x + width / 2), 'center_y': _number(y + height / 2),
+        })
+    return render_to_string('offices/floor_status.svg', {
+        'floor': floor,
+        'offices': offices,
+        'plan_url': static(floor.plan_image) if include_plan and floor.plan_image else None,
+    })
+
+
+def get_status_svg(floor, version, include_plan=False):
+    """The gzipped SVG for this floor at this version, rendered on the first request."""
+    key = f"offices:status-svg:{floor.pk}:{int(include_plan)}:{version}"
+    compressed = cache.get(key)
+    if compressed is None:
+        compressed = gzip.compress(render_status_svg(floor, include_plan).encode(), compresslevel=9, mtime=0)
+        cache.set(key, compressed, CACHE_TIMEOUT)
+    return compressed
@@ -1,3 +1,413 @@
-from django.test import TestCase
+import datetime
+import gzip
+import os
+import random
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.http import FileResponse
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User, Group
+from django.db import connection
+from django.urls import reverse
+
+from .models import (
+    Office, OfficeOccupancy, PdfJob, Floor, OfficeGeometry, current_office_version, touch_offices, bump_geometry_stamp,
+)
+from .pdf_jobs import PdfRenderService, enqueue_pdf
+from . import pdf_cache
+from .spatial import GridIndex, Shape, floor_index
+from .status_layer import status_layer_version
+from .occupancy import get_office_occupancy, reconcile_office_occupancy, update_offices
+
+
+class OfficeVersionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='frontdesk', password='pass')
+        self.client.force_login(self.user)
+
+    def test_saving_an_office_takes_the_next_version(self):
+        before = current_office_version()
+        office = Office.objects.get(office_number=1)
+        office.status = 'rented'
+        office.save()
+        office.refresh_from_db()
+        self.assertEqual(current_office_version(), before + 1)
+        self.assertEqual(office.version, before + 1)
+
+    def test_list_answers_304_while_nothing_changed(self):
+        response = self.client.get('/floor-plan/api/offices/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(response['X-Offices-Version'], str(current_office_version()))
+
+        response = self.client.get('/floor-plan/api/offices/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Office.objects.get(office_number=2).save()
+        response = self.client.get('/floor-plan/api/offices/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_changes_returns_only_offices_changed_since_the_version(self):
+        since = current_office_version()
+        office = Office.objects.get(office_number=3)
+        office.status = 'rented'
+        office.save()
+        touch_offices(Office.objects.filter(office_number=4))
+
+        response = self.client.get('/floor-plan/api/offices/changes/', {'since': since})
+        data = response.json()
+        self.assertFalse(data['full'])
+        self.assertEqual(data['version'], since + 2)
+        self.assertEqual([office['office_number'] for office in data['offices']], [3, 4])
+
+        response = self.client.get('/floor-plan/api/offices/changes/', {'since': data['version']})
+        self.assertEqual(response.json()['offices'], [])
+
+    def test_changes_after_a_delete_sends_everything(self):
+        since = current_office_version()
+        Office.objects.get(office_number=5).delete()
+        data = self.client.get('/floor-plan/api/offices/changes/', {'since': since}).json()
+        self.assertTrue(data['full'])
+        self.assertEqual(len(data['offices']), Office.objects.count())
+
+    def test_changes_requires_since(self):
+        response = self.client.get('/floor-plan/api/offices/changes/')
+        self.assertEqual(response.status_code, 400)
+
+
+class OfficeOccupancyTests(TestCase):
+    def assertCountersMatchTable(self):
+        self.assertEqual(reconcile_office_occupancy(), {})
+
+    def test_saves_and_deletes_keep_the_counters_right(self):
+        before = get_office_occupancy()
+        office = Office.objects.get(office_number=1)
+        office.status = 'rented'
+        office.save()
+        after = get_office_occupancy()
+        self.assertEqual(after['rented_count'], before['rented_count'] + 1)
+        self.assertEqual(after['available_count'], before['available_count'] - 1)
+        self.assertEqual(after['rented_sqft'], before['rented_sqft'] + office.size_sqft)
+        self.assertEqual(after['rented_annual_rent'], before['rented_annual_rent'] + office.annual_rent)
+
+        # Saving again without changes doesn't count the office twice
+        office.save()
+        self.assertEqual(get_office_occupancy(), after)
+
+        # An office saved without being loaded first, and a partially loaded one
+        Office(office_number=2, size_sqft='150.00', annual_rent=1000, status='rented').save()
+        partial = Office.objects.only('office_number', 'status').get(office_number=3)
+        partial.status = 'rented'
+        partial.save()
+        Office.objects.get(office_number=4).delete()
+        Office.objects.create(office_number=999, size_sqft='80.50', annual_rent=500)
+        self.assertCountersMatchTable()
+
+    def test_bulk_updates_adjust_the_counters(self):
+        version = current_office_version()
+        count = update_offices(Office.objects.filter(office_number__lte=5), status='rented')
+        self.assertEqual(count, 5)
+        self.assertCountersMatchTable()
+        self.assertEqual(Office.objects.get(office_number=5).version, version + 1)
+
+    def test_reconcile_repairs_drift(self):
+        OfficeOccupancy.objects.filter(pk=1).update(rented_count=999, total_count=0)
+        drift = reconcile_office_occupancy()
+        self.assertEqual(set(drift), {'rented_count', 'total_count'})
+        self.assertCountersMatchTable()
+
+    def test_statistics_endpoints_read_one_row(self):
+        user = User.objects.create_user(username='manager', password='pass')
+        user.groups.add(Group.objects.get_or_create(name='Manager')[0])
+        self.client.force_login(user)
+        # Session and user, then the counters row
+        with self.assertNumQueries(3):
+            response = self.client.get('/floor-plan/api/statistics/')
+        self.assertEqual(response.json()['total_count'], Office.objects.count())
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('cheque-dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries if 'FROM "offices_office"' in query['sql']])
+
+
+@override_settings(PDF_RENDER_IN_WEB_PROCESS=False)
+class PdfJobTests(TestCase):
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.enterContext(override_settings(PDF_CACHE_DIR=cache_dir.name))
+        manager_group, _ = Group.objects.get_or_create(name='Manager')
+        self.user = User.objects.create_user(username='manager', password='pass')
+        self.other = User.objects.create_user(username='other-manager', password='pass')
+        for user in (self.user, self.other):
+            user.groups.add(manager_group)
+        self.client.force_login(self.user)
+
+    def queue_available_list(self, user):
+        return enqueue_pdf('available-offices', '<p>Available offices</p>', 'List.pdf', user)
+
+    def render_queued(self):
+        with ThreadPoolExecutor(2) as executor:
+            PdfRenderService(workers=2, executor=executor).drain()
+
+    def test_available_list_is_rendered_in_the_background(self):
+        response = self.client.get(reverse('download-available-offices'))
+        job = PdfJob.objects.get()
+        self.assertRedirects(response, reverse('pdf-job', args=[job.pk]))
+        self.assertEqual(job.status, PdfJob.QUEUED)
+        self.assertEqual(self.client.get(reverse('pdf-job-status', args=[job.pk])).json()['download_url'], None)
+
+        # A real process pool, as in production
+        service = PdfRenderService(workers=1)
+        try:
+            service.drain()
+        finally:
+            service.executor.shutdown()
+
+        status = self.client.get(reverse('pdf-job-status', args=[job.pk])).json()
+        self.assertEqual(status['status'], PdfJob.DONE)
+        response = self.client.get(status['download_url'])
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('Available-Offices-List.pdf', response['Content-Disposition'])
+        self.assertTrue(response.content.startswith(b'%PDF'))
+
+    def test_proposal_form_queues_a_job(self):
+        response = self.client.post(reverse('generate-pdf', args=[1]), {
+            'company_name': 'ACME', 'phone_number': '123', 'proposal_date': datetime.date.today() + datetime.timedelta(days=1),
+            'proposed_lease_term': '1 year', 'annual_rent': 1000, 'security_deposit': '5%', 'admin_fees': 250,
+        })
+        job = PdfJob.objects.get()
+        self.assertRedirects(response, reverse('pdf-job', args=[job.pk]))
+        self.assertEqual(job.kind, 'proposal')
+        self.assertEqual(job.filename, 'Lease-Proposal-Office-1.pdf')
+
+    def test_users_do_not_wait_behind_each_others_jobs(self):
+        first_jobs = [self.queue_available_list(self.user) for _ in range(3)]
+        other_job = self.queue_available_list(self.other)
+        with ThreadPoolExecutor(2) as executor:
+            service = PdfRenderService(workers=2, executor=executor)
+            service.step()
+            # One slot each, although the other user queued last
+            self.assertEqual(set(service.in_flight), {first_jobs[0].pk, other_job.pk})
+            service.drain()
+        self.assertEqual(set(PdfJob.objects.values_list('status', flat=True)), {PdfJob.DONE})
+
+    def test_jobs_are_private_and_failures_are_reported(self):
+        job = self.queue_available_list(self.other)
+        self.assertEqual(self.client.get(reverse('pdf-job', args=[job.pk])).status_code, 404)
+
+        with ThreadPoolExecutor(1) as executor:
+            service = PdfRenderService(workers=1, executor=executor)
+            with mock.patch('offices.pdf_jobs.render_pdf', side_effect=ValueError("bad layout")), \
+                    self.assertLogs('offices.pdf_jobs', 'ERROR'):
+                service.drain()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (PdfJob.FAILED, "bad layout"))
+
+    def test_repeat_requests_are_served_from_the_pdf_cache(self):
+        self.client.get(reverse('download-available-offices'))
+        self.render_queued()
+
+        response = self.client.get(reverse('download-available-offices'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response, FileResponse)
+        self.assertIn('Available-Offices-List.pdf', response['Content-Disposition'])
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        self.assertEqual(PdfJob.objects.count(), 1)
+
+        # Renting an office out changes the list: the cached copy is dropped
+        office = Office.objects.get(office_number=1)
+        office.status = 'rented'
+        with self.captureOnCommitCallbacks(execute=True):
+            office.save()
+        response = self.client.get(reverse('download-available-offices'))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(PdfJob.objects.count(), 2)
+
+    def test_identical_proposals_share_the_cached_pdf(self):
+        form = {
+            'company_name': 'ACME', 'phone_number': '123', 'proposal_date': datetime.date.today() + datetime.timedelta(days=1),
+            'proposed_lease_term': '1 year', 'annual_rent': 1000, 'security_deposit': '5%', 'admin_fees': 250,
+        }
+        self.client.post(reverse('generate-pdf', args=[1]), form)
+        self.render_queued()
+        self.assertIsInstance(self.client.post(reverse('generate-pdf', args=[1]), form), FileResponse)
+
+        # Another user with the same input gets the same file; different input does not
+        self.client.force_login(self.other)
+        self.assertIsInstance(self.client.post(reverse('generate-pdf', args=[1]), form), FileResponse)
+        response = self.client.post(reverse('generate-pdf', args=[1]), dict(form, company_name='Other Co'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_cache_evicts_least_recently_used_files(self):
+        for key in ('proposal-a', 'proposal-b', 'proposal-c'):
+            pdf_cache.store(key, b'x' * 100)
+        # Ages apart, then 'a' is used again
+        for age, key in enumerate(('proposal-c', 'proposal-b', 'proposal-a')):
+            path = os.path.join(settings.PDF_CACHE_DIR, f'{key}.pdf')
+            os.utime(path, (1_000_000 - age, 1_000_000 - age))
+        pdf_cache.open_cached('proposal-a').close()
+
+        self.assertEqual(pdf_cache.evict(max_bytes=200), 1)
+        self.assertIsNone(pdf_cache.open_cached('proposal-b'))
+        with pdf_cache.open_cached('proposal-a') as cached:
+            self.assertEqual(cached.read(), b'x' * 100)
+
+
+class FloorGeometryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='frontdesk', password='pass')
+        self.client.force_login(self.user)
+        self.floor = Floor.objects.create(building='Annex', name='First Floor', level=1, width=1000, height=1000)
+        # A 10 x 10 grid of 50 x 50 offices, 100 apart, numbered 1001...
+        self.offices = []
+        for row in range(10):
+            for column in range(10):
+                office = Office.objects.create(office_number=1001 + row * 10 + column, size_sqft='100.00', annual_rent=1000)
+                OfficeGeometry.objects.create(office=office, floor=self.floor, x=column * 100, y=row * 100, width=50, height=50)
+        bump_geometry_stamp()
+
+    def url(self, action):
+        return f'/floor-plan/api/floors/{self.floor.pk}/{action}/'
+
+    def test_viewport_only_returns_the_offices_in_the_box(self):
+        data = self.client.get(self.url('offices'), {'bbox': '0,0,160,120'}).json()
+        self.assertEqual(data['fields'][:2], ['office_number', 'status'])
+        self.assertEqual([row[0] for row in data['offices']], [1001, 1002, 1011, 1012])
+        self.assertEqual(data['offices'][0][1:6], ['available', 0.0, 0.0, 50.0, 50.0])
+        self.assertEqual(len(self.client.get(self.url('offices')).json()['offices']), 100)
+
+    def test_hit_testing_and_nearby(self):
+        self.assertEqual(self.client.get(self.url('hit'), {'x': 125, 'y': 225}).json()['office'][0], 1022)
+        # Between two offices
+        self.assertIsNone(self.client.get(self.url('hit'), {'x': 75, 'y': 25}).json()['office'])
+
+        data = self.client.get(self.url('nearby'), {'x': 75, 'y': 25, 'radius': 30}).json()
+        self.assertEqual([(row[0], row[-1]) for row in data['offices']], [(1001, 25.0), (1002, 25.0)])
+        self.assertEqual(self.client.get(self.url('hit'), {'x': 'abc', 'y': 1}).status_code, 400)
+
+    def test_polygons_are_hit_tested_by_their_outline(self):
+        # A triangle over office 1001's box: its bounding box is computed on save
+        geometry = OfficeGeometry.objects.get(office_id=1001)
+        geometry.polygon = [[0, 0], [50, 0], [0, 50]]
+        geometry.save()
+        self.assertEqual((geometry.width, geometry.height), (50, 50))
+        index = floor_index(self.floor.pk)
+        self.assertEqual(index.at_point(10, 10).office_number, 1001)
+        self.assertIsNone(index.at_point(40, 40))
+
+    def test_index_is_rebuilt_when_geometry_changes(self):
+        index = floor_index(self.floor.pk)
+        self.assertIs(floor_index(self.floor.pk), index)
+        # The stamp is in the database: clearing this process's cache doesn't move it
+        cache.clear()
+        self.assertIs(floor_index(self.floor.pk), index)
+        OfficeGeometry.objects.filter(office_id=1001).first().delete()
+        self.assertIsNone(floor_index(self.floor.pk).at_point(10, 10))
+
+    def test_grid_matches_a_full_scan(self):
+        rng = random.Random(7)
+        shapes = [Shape(n, rng.uniform(0, 2000), rng.uniform(0, 2000), rng.uniform(5, 150), rng.uniform(5, 150)) for n in range(500)]
+        index = GridIndex(shapes)
+        for _ in range(200):
+            x0, y0 = rng.uniform(-100, 2000), rng.uniform(-100, 2000)
+            x1, y1 = x0 + rng.uniform(0, 400), y0 + rng.uniform(0, 400)
+            expected = sorted(shape.office_number for shape in shapes if shape.overlaps_box(x0, y0, x1, y1))
+            self.assertEqual([shape.office_number for shape in index.in_box(x0, y0, x1, y1)], expected)
+
+
+class StatusLayerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='frontdesk', password='pass')
+        user.groups.add(Group.objects.get_or_create(name='Reception')[0])
+        self.client.force_login(user)
+        self.floor = Floor.objects.get(building='Business Center')
+
+    def svg_url(self):
+        return f"{reverse('floor-status-svg', args=[self.floor.pk])}?v={status_layer_version()}"
+
+    def test_floor_plan_page_links_the_current_layer(self):
+        response = self.client.get(reverse('floor-plan'))
+        self.assertContains(response, f'src="{self.svg_url()}"'.replace('&', '&amp;'))
+
+    def test_svg_is_compressed_cached_and_long_lived(self):
+        response = self.client.get(self.svg_url(), HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+        svg = gzip.decompress(response.content).decode()
+        self.assertIn('<rect class="office available" x="714" y="468" width="64" height="50"/>', svg)
+
+        # Rendered once per version: the next request doesn't touch the geometry
+        with CaptureQueriesContext(connection) as queries:
+            plain = self.client.get(self.svg_url())
+        self.assertFalse([query for query in queries if 'offices_officegeometry' in query['sql']])
+        self.assertEqual(plain.content.decode(), svg)
+        self.assertEqual(self.client.get(self.svg_url(), HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_version_does_not_depend_on_the_cache(self):
+        # Another worker has a cache of its own: it must build the same URL
+        version = status_layer_version()
+        cache.clear()
+        self.assertEqual(status_layer_version(), version)
+
+    def test_office_changes_move_the_layer_to_a_new_url(self):
+        old_url = self.svg_url()
+        office = Office.objects.get(office_number=1)
+        office.status = 'rented'
+        office.save()
+        self.assertNotEqual(self.svg_url(), old_url)
+
+        response = self.client.get(old_url)
+        self.assertRedirects(response, self.svg_url(), fetch_redirect_response=False)
+        self.assertIn('class="office rented" x="714"', self.client.get(self.svg_url()).content.decode())
+
+
+class OfficeSearchTests(TestCase):
+    url = '/floor-plan/api/offices/search/'
+
+    def setUp(self):
+        update_offices(Office.objects.filter(office_number__in=[1, 2, 3]), status='rented', company_name='Acme Trading')
+        update_offices(Office.objects.filter(office_number=2), expiry_date=datetime.date(2030, 6, 30))
+
+    def numbers(self, **params):
+        return [office['office_number'] for office in self.client.get(self.url, params).json()['results']]
+
+    def test_filters(self):
+        expected = list(
+            Office.objects.filter(status='available', size_sqft__gte=100, size_sqft__lte=300)
+            .order_by('office_number').values_list('office_number', flat=True)[:50]
+        )
+        self.assertEqual(self.numbers(status='available', size_min=100, size_max=300), expected)
+        self.assertEqual(self.numbers(company='acme'), [1, 2, 3])
+        self.assertEqual(self.numbers(expires_after='2030-01-01', expires_before='2030-12-31'), [2])
+        office = Office.objects.get(office_number=3)
+        self.assertEqual(self.numbers(company='acme', rent_min=office.annual_rent, rent_max=office.annual_rent),
+                         list(Office.objects.filter(company_name='Acme Trading', annual_rent=office.annual_rent)
+                              .order_by('office_number').values_list('office_number', flat=True)))
+        self.assertEqual(self.client.get(self.url, {'status': 'vacant'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'size_min': 'nan'}).status_code, 400)
+
+    def test_cursor_pages_cover_every_office_once(self):
+        seen, url, params = [], self.url, {'page_size': 7, 'ordering': '-size_sqft'}
+        while url:
+            data = self.client.get(url, params).json()
+            seen.extend(office['office_number'] for office in data['results'])
+            url, params = data['next'], None
+        self.assertEqual(sorted(seen), sorted(Office.objects.values_list('office_number', flat=True)))
+
+    @skipUnless(connection.vendor == 'sqlite', "query plans are checked on SQLite")
+    def test_searches_use_the_indexes(self):
+        plan = Office.objects.filter(status='available', size_sqft__gte=100).explain()
+        self.assertIn('USING INDEX office_status_size_idx', plan)
+        plan = Office.objects.filter(status='rented').values_list('pk', 'size_sqft').explain()
+        self.assertIn('USING COVERING INDEX office_status_size_idx', plan)
+        plan = Office.objects.filter(expiry_date__gte='2030-01-01', expiry_date__lte='2030-12-31').explain()
+        self.assertIn('USING INDEX office_expiry_idx', plan)
@@ -3,9 +3,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 # Ensure all four views are imported here
-from .views import FloorPlanView, OfficeViewSet, create_proposal_view, generate_pdf_view, office_statistics_view, statistics_view, download_available_offices_pdf
+from .views import FloorPlanView, OfficeViewSet, FloorViewSet, create_proposal_view, generate_pdf_view, office_statistics_view, statistics_view, download_available_offices_pdf
+from .views import pdf_job_view, pdf_job_status_api, pdf_job_download, floor_status_svg
 router = DefaultRouter()
 router.register(r'offices', OfficeViewSet, basename='office')
+router.register(r'floors', FloorViewSet, basename='floor')
 
 urlpatterns = [
     path('', FloorPlanView.as_view(), name='floor-plan'),
@@ -17,4 +19,8 @@ urlpatterns = [
     path('proposal/generate-pdf/<int:office_number>/', generate_pdf_view, name='generate-pdf'),
     path('api/statistics/', office_statistics_view, name='office-statistics'),
     path('reports/available-list/', download_available_offices_pdf, name='download-available-offices'),
+    path('pdf-jobs/<uuid:job_id>/', pdf_job_view, name='pdf-job'),
+    path('pdf-jobs/<uuid:job_id>/download/', pdf_job_download, name='pdf-job-download'),
+    path('api/pdf-jobs/<uuid:job_id>/', pdf_job_status_api, name='pdf-job-status'),
+    path('floors/<int:floor_id>/status.svg', floor_status_svg, name='floor-status-svg'),
 ]
\ No newline at end of file
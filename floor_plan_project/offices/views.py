@@ -1,35 +1,66 @@
 # offices/views.py
 
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponse
+from django.http import HttpResponse, FileResponse
 from django.template.loader import render_to_string
+from django.urls import reverse
 from django.views.generic import View
 from django.conf import settings
 from pathlib import Path
 import datetime 
+import gzip
+import math
+from urllib.parse import urlencode
+
+from django.utils.cache import get_conditional_response
 
 from rest_framework import viewsets
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, action
 from rest_framework.response import Response
-
-from weasyprint import HTML
+from rest_framework.exceptions import ParseError
+from rest_framework.filters import OrderingFilter
 
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.decorators import login_required, user_passes_test
 
+from core.roles import has_role
+
 # --- THIS IS THE ONLY MODEL IMPORT IN THIS FILE. IT IS CORRECT. ---
-from .models import Office
+from .models import Office, Floor, OfficeSyncState, PdfJob, current_office_version
 # -----------------------------------------------------------------
 
-from .serializers import OfficeSerializer
+from .serializers import OfficeSerializer, FloorSerializer
+from .spatial import floor_index
+from .search import OfficeSearchFilter, OfficeCursorPagination
+from .status_layer import status_layer_version, get_status_svg
+from .occupancy import get_office_occupancy
+from .pdf_jobs import enqueue_pdf
+from . import pdf_cache
 from .forms import ProposalForm
 
+LOGO_PATH = Path(settings.STATICFILES_DIRS[0]) / 'offices/images/Rahet-Logo.png'
+
 # --- HELPER FUNCTIONS ---
+# Group names come from core.roles, which loads them once per request
 def is_manager(user):
-    return user.is_superuser or user.groups.filter(name__iexact='Manager').exists()
+    return has_role(user, 'Manager')
 
 def is_receptionist_or_manager(user):
-    return user.is_superuser or user.groups.filter(name__iregex=r'^(Manager|Reception)$').exists()
+    return has_role(user, 'Manager', 'Reception')
+
+def pdf_response(request, kind, template_name, context, filename):
+    """
+    Serves the PDF straight from the on-disk cache when this exact document was rendered
+    before (offices/pdf_cache.py); otherwise queues it and sends the user to the job page.
+    """
+    html = render_to_string(template_name, context)
+    # The logo is only linked from the HTML, so its mtime goes into the key separately
+    key = pdf_cache.cache_key(kind, html, files=[LOGO_PATH])
+    cached = pdf_cache.open_cached(key)
+    if cached is not None:
+        return FileResponse(cached, as_attachment=True, filename=filename, content_type='application/pdf')
+    job = enqueue_pdf(kind, html, filename, request.user, base_url=request.build_absolute_uri(), cache_key=key)
+    return redirect('pdf-job', job_id=job.pk)
 
 # --- VIEWS FOR THE OFFICES APP ---
 
@@ -40,7 +71,44 @@ class FloorPlanView(LoginRequiredMixin, UserPassesTestMixin, View):
     def handle_no_permission(self):
         return redirect('dashboard')
     def get(self, request, *args, **kwargs):
-        return render(request, 'offices/index.html')
+        # The first floor's status layer is in the page itself, so it paints without JS
+        floor = Floor.objects.first()
+        status_layer_url = None
+        if floor is not None:
+            status_layer_url = f"{reverse('floor-status-svg', args=[floor.pk])}?v={status_layer_version()}"
+        return render(request, 'offices/index.html', {'floor': floor, 'status_layer_url': status_layer_url})
+
+@login_required(login_url='/login/')
+@user_passes_test(is_receptionist_or_manager, login_url='/dashboard/')
+def floor_status_svg(request, floor_id):
+    """
+    The office status colours of one floor as an SVG (offices/status_layer.py); add
+    plan=1 to draw the plan image underneath. The URL names the version (?v=): a missing
+    or outdated one redirects to the current URL, which browsers may keep for a year.
+    """
+    floor = get_object_or_404(Floor, pk=floor_id)
+    include_plan = request.GET.get('plan') == '1'
+    version = status_layer_version()
+    if request.GET.get('v') != version:
+        query = {'v': version, **({'plan': '1'} if include_plan else {})}
+        response = redirect(f"{reverse('floor-status-svg', args=[floor.pk])}?{urlencode(query)}")
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    etag = f'"status-{floor.pk}-{int(include_plan)}-{version}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        compressed = get_status_svg(floor, version, include_plan)
+        if 'gzip' in request.headers.get('Accept-Encoding', ''):
+            response = HttpResponse(compressed, content_type='image/svg+xml')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(gzip.decompress(compressed), content_type='image/svg+xml')
+    response['ETag'] = etag
+    response['Vary'] = 'Accept-Encoding'
+    # Status data is for logged-in staff only: browsers may cache it, shared caches may not
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
 
 @login_required(login_url='/login/')
 @user_passes_test(is_manager, login_url='/dashboard/')
@@ -63,33 +131,188 @@ def generate_pdf_view(request, office_number):
         form = ProposalForm(request.POST)
         if form.is_valid():
             proposal_data = form.cleaned_data
-            logo_path_obj = Path(settings.STATICFILES_DIRS[0]) / 'offices/images/Rahet-Logo.png'
-            logo_uri = logo_path_obj.as_uri()
             context = {
                 'office': office,
                 'proposal': proposal_data,
                 'proposal_date': proposal_data.get('proposal_date').strftime("%d/%m/%Y"),
-                'logo_path': logo_uri,
+                'logo_path': LOGO_PATH.as_uri(),
             }
-            html_string = render_to_string('offices/proposal_pdf_template.html', context)
-            pdf_file = HTML(string=html_string, base_url=request.build_absolute_uri()).write_pdf()
-            response = HttpResponse(pdf_file, content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="Lease-Proposal-Office-{office.office_number}.pdf"'
-            return response
+            # Same form input, same PDF: cached, or rendered in the background (see pdf_response)
+            return pdf_response(
+                request, 'proposal', 'offices/proposal_pdf_template.html', context,
+                f"Lease-Proposal-Office-{office.office_number}.pdf",
+            )
     return create_proposal_view(request, office_number)
 
+# --- BACKGROUND PDF JOBS ---
+# Only the user who asked for a PDF can see or download it.
+
+@login_required(login_url='/login/')
+def pdf_job_view(request, job_id):
+    """'Preparing your PDF' page; polls the job and starts the download when it's done."""
+    job = get_object_or_404(PdfJob.objects.defer('html', 'pdf'), pk=job_id, requested_by=request.user)
+    return render(request, 'offices/pdf_job.html', {'job': job})
+
+@api_view(['GET'])
+@login_required(login_url='/login/')
+def pdf_job_status_api(request, job_id):
+    job = get_object_or_404(PdfJob.objects.defer('html', 'pdf'), pk=job_id, requested_by=request.user)
+    return Response({
+        'id': job.pk,
+        'status': job.status,
+        'filename': job.filename,
+        'error': job.error,
+        'download_url': reverse('pdf-job-download', args=[job.pk]) if job.status == PdfJob.DONE else None,
+    })
+
+@login_required(login_url='/login/')
+def pdf_job_download(request, job_id):
+    job = get_object_or_404(PdfJob, pk=job_id, requested_by=request.user)
+    if job.status != PdfJob.DONE:
+        # Not ready (or failed): the job page shows which
+        return redirect('pdf-job', job_id=job.pk)
+    response = HttpResponse(bytes(job.pdf), content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="{job.filename}"'
+    return response
+
 # --- API VIEWS FOR THE OFFICES APP ---
 
 class OfficeViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    The floor plan's office data. Every Office change bumps a version counter, so:
+      - the list carries ETag / X-Offices-Version and answers 304 while nothing changed;
+      - changes/?since=<version> returns only the offices changed after that version.
+    search/ is the filtered, paginated search for leasing staff.
+    """
     queryset = Office.objects.all().order_by('office_number')
     serializer_class = OfficeSerializer
+    # What search/ may be ordered by (the other actions don't use OrderingFilter)
+    ordering_fields = ['office_number', 'size_sqft', 'annual_rent']
+
+    def _versioned(self, response, version):
+        response['ETag'] = f'"offices-{version}"'
+        response['X-Offices-Version'] = str(version)
+        # Let the browser keep a copy but check back every time; the check is a 304
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        # Read the version BEFORE the offices: if one changes in between, the client gets
+        # newer data under an older version and the next delta simply resends it
+        version = current_office_version()
+        not_modified = get_conditional_response(request, etag=f'"offices-{version}"')
+        if not_modified is not None:
+            return self._versioned(not_modified, version)
+        return self._versioned(super().list(request, *args, **kwargs), version)
+
+    @action(detail=False, filter_backends=[OfficeSearchFilter, OrderingFilter], pagination_class=OfficeCursorPagination)
+    def search(self, request):
+        """Filtered, cursor-paginated office search (parameters: see offices/search.py)."""
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    @action(detail=False)
+    def changes(self, request):
+        try:
+            since = int(request.GET['since'])
+        except (KeyError, ValueError):
+            return Response({'error': 'since=<version> is required.'}, status=400)
+
+        state = OfficeSyncState.objects.values('version', 'last_delete_version').first() or {
+            'version': 0, 'last_delete_version': 0,
+        }
+        # Missed a deletion, or a version from another database: start over
+        full = since < state['last_delete_version'] or since > state['version']
+        offices = self.get_queryset() if full else self.get_queryset().filter(version__gt=since)
+        response = Response({
+            'version': state['version'],
+            'full': full,
+            'offices': self.get_serializer(offices, many=True).data,
+        })
+        return self._versioned(response, state['version'])
+
+class FloorViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Floors, and the offices drawn on them, from the spatial index (offices/spatial.py):
+      - offices/?bbox=x0,y0,x1,y1  geometry + status of what's inside the box (all without bbox);
+      - hit/?x=&y=                 the office under a point;
+      - nearby/?x=&y=&radius=&limit=  offices around a point, closest first.
+    Office rows are compact arrays in the order given by `fields`.
+    """
+    queryset = Floor.objects.all()
+    serializer_class = FloorSerializer
+
+    FIELDS = ['office_number', 'status', 'x', 'y', 'width', 'height', 'polygon']
+    MAX_NEARBY_RADIUS = 5000
+
+    def _numbers(self, request, *names):
+        values = []
+        for name in names:
+            try:
+                value = float(request.GET[name])
+            except (KeyError, ValueError):
+                raise ParseError(f"{name} must be a number.")
+            if not math.isfinite(value):
+                raise ParseError(f"{name} must be a number.")
+            values.append(value)
+        return values
+
+    def _rows(self, shapes):
+        statuses = dict(Office.objects.filter(pk__in=[shape.office_number for shape in shapes]).values_list('office_number', 'status'))
+        return [
+            [shape.office_number, statuses.get(shape.office_number), shape.x, shape.y, shape.width, shape.height, shape.polygon]
+            for shape in shapes
+        ]
+
+    @action(detail=True)
+    def offices(self, request, pk=None):
+        floor = self.get_object()
+        index = floor_index(floor.pk)
+        if 'bbox' in request.GET:
+            try:
+                x0, y0, x1, y1 = (float(value) for value in request.GET['bbox'].split(','))
+            except ValueError:
+                raise ParseError("bbox must be x0,y0,x1,y1.")
+            shapes = index.in_box(x0, y0, x1, y1)
+        else:
+            shapes = sorted(index.shapes, key=lambda shape: shape.office_number)
+        return Response({
+            'floor': floor.pk,
+            # The offices version the statuses are at, to line up with /api/offices/changes/
+            'version': current_office_version(),
+            'fields': self.FIELDS,
+            'offices': self._rows(shapes),
+        })
+
+    @action(detail=True)
+    def hit(self, request, pk=None):
+        floor = self.get_object()
+        x, y = self._numbers(request, 'x', 'y')
+        shape = floor_index(floor.pk).at_point(x, y)
+        return Response({'fields': self.FIELDS, 'office': self._rows([shape])[0] if shape else None})
+
+    @action(detail=True)
+    def nearby(self, request, pk=None):
+        floor = self.get_object()
+        x, y = self._numbers(request, 'x', 'y')
+        try:
+            radius = float(request.GET.get('radius') or 100)
+            limit = int(request.GET.get('limit') or 10)
+        except ValueError:
+            raise ParseError("radius must be a number and limit a whole number.")
+        if not math.isfinite(radius):
+            raise ParseError("radius must be a number.")
+        found = floor_index(floor.pk).nearby(x, y, min(max(radius, 0), self.MAX_NEARBY_RADIUS), limit=min(max(limit, 1), 100))
+        rows = self._rows([shape for _, shape in found])
+        return Response({
+            'fields': self.FIELDS + ['distance'],
+            'offices': [row + [round(distance, 1)] for row, (distance, _) in zip(rows, found)],
+        })
 
 @api_view(['GET'])
 def office_statistics_view(request):
-    available_count = Office.objects.filter(status='available').count()
-    rented_count = Office.objects.filter(status='rented').count()
-    data = {'available_count': available_count, 'rented_count': rented_count}
-    return Response(data)
+    # One row of running totals (offices/occupancy.py) instead of counting the table
+    return Response(get_office_occupancy())
 
 @login_required(login_url='/login/')
 @user_passes_test(is_manager, login_url='/dashboard/')
@@ -97,24 +320,16 @@ def download_available_offices_pdf(request):
     # 1. Fetch only available offices
     available_offices = Office.objects.filter(status='available').order_by('office_number')
     
-    # 2. Prepare the logo path (Windows-safe)
-    logo_path_obj = Path(settings.STATICFILES_DIRS[0]) / 'offices/images/Rahet-Logo.png'
-    logo_uri = logo_path_obj.as_uri()
-    
-    # 3. Prepare context
+    # 2. Prepare context (the logo path is Windows-safe as a file URI)
     context = {
         'offices': available_offices,
-        'logo_path': logo_uri,
+        'logo_path': LOGO_PATH.as_uri(),
         'generation_date': datetime.date.today().strftime("%d/%m/%Y"),
     }
 
-    # 4. Render HTML
-    html_string = render_to_string('offices/available_offices_pdf.html', context)
-    
-    # 5. Generate PDF
-    pdf_file = HTML(string=html_string, base_url=request.build_absolute_uri()).write_pdf()
-
-    # 6. Return response
-    response = HttpResponse(pdf_file, content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="Available-Offices-List.pdf"'
-    return response
\ No newline at end of file
+    # 3. Serve it from the PDF cache, or render it in the background (see pdf_response).
+    # Cached lists are dropped whenever an office's status changes.
+    return pdf_response(
+        request, pdf_cache.AVAILABLE_OFFICES, 'offices/available_offices_pdf.html', context,
+        'Available-Offices-List.pdf',
+    )
@@ -78,4 +78,154 @@ if (usageReportTable) {
             const tbody = usageReportTable.querySelector('tbody');
             tbody.innerHTML = '<tr><td colspan="2">Could not load the report.</td></tr>';
         });
-}
\ No newline at end of file
+}
+
+// --- USAGE REPORT: ROOM UTILISATION ---
+const utilisationTable = document.getElementById('room-utilisation-table');
+if (utilisationTable) {
+    fetch(utilisationTable.dataset.url)
+        .then(response => response.json())
+        .then(data => {
+            const tbody = utilisationTable.querySelector('tbody');
+            tbody.innerHTML = '';
+
+            if (data.rooms.length === 0) {
+                tbody.innerHTML = '<tr><td colspan="4">No meeting rooms have been set up yet.</td></tr>';
+                return;
+            }
+
+            const peaks = data.peak_hours.map(peak => `${peak.weekday} ${peak.hour} (${peak.utilisation}%)`);
+            document.getElementById('utilisation-peaks').textContent =
+                `Overall: ${data.overall_utilisation}%. Busiest hours: ${peaks.join(', ') || 'none'}.`;
+
+            data.rooms.forEach(room => {
+                const row = document.createElement('tr');
+                const peak = room.peak ? `${room.peak.weekday} ${room.peak.time} (${room.peak.utilisation}%)` : '-';
+                const idle = room.always_idle.map(range => `${range.weekday} ${range.from}-${range.to}`);
+                [room.name, `${room.utilisation}%`, peak, idle.join(', ') || '-'].forEach(value => {
+                    const cell = document.createElement('td');
+                    cell.textContent = value;
+                    row.appendChild(cell);
+                });
+                tbody.appendChild(row);
+            });
+        })
+        .catch(error => {
+            console.error("Error fetching room utilisation:", error);
+            utilisationTable.querySelector('tbody').innerHTML = '<tr><td colspan="4">Could not load utilisation.</td></tr>';
+        });
+}
+
+// --- RECEPTION DASHBOARD: LOAD MORE BOOKINGS AS YOU SCROLL ---
+// The page renders the first page only; the rest comes from the keyset-paginated JSON feed.
+const upcomingTable = document.getElementById('upcoming-bookings-table');
+const upcomingSentinel = document.getElementById('upcoming-bookings-sentinel');
+if (upcomingTable && upcomingSentinel && 'IntersectionObserver' in window) {
+    const tbody = upcomingTable.querySelector('tbody');
+    let nextCursor = upcomingTable.dataset.nextCursor;
+    let loading = false;
+
+    function escapeHtml(value) {
+        const div = document.createElement('div');
+        div.textContent = value == null ? '' : value;
+        return div.innerHTML;
+    }
+
+    function formatDateTime(value) {
+        // Matches the server-side "Y-m-d H:i" format
+        const d = new Date(value);
+        const pad = n => String(n).padStart(2, '0');
+        return `${d.getFullYear()}-${pad(d.getMonth() + 1)}-${pad(d.getDate())} ${pad(d.getHours())}:${pad(d.getMinutes())}`;
+    }
+
+    function loadNextPage() {
+        if (!nextCursor || loading) return;
+        loading = true;
+
+        // Keep the current filters and ask for the page after the last row
+        const params = new URLSearchParams(window.location.search);
+        params.set('cursor', nextCursor);
+
+        fetch(`${upcomingTable.dataset.feedUrl}?${params}`)
+            .then(response => response.json())
+            .then(data => {
+                data.results.forEach(booking => {
+                    const office = booking.associated_office
+                        ? `Office ${booking.associated_office}`
+                        : '<span style="color: #888;">N/A</span>';
+                    tbody.insertAdjacentHTML('beforeend', `
+                        <tr>
+                            <td>${escapeHtml(booking.title)}</td>
+                            <td>${escapeHtml(booking.room)}</td>
+                            <td>${formatDateTime(booking.start_time)}</td>
+                            <td>${formatDateTime(booking.end_time)}</td>
+                            <td>${escapeHtml(booking.booked_by)}</td>
+                            <td>${office}</td>
+                        </tr>
+                    `);
+                });
+                nextCursor = data.next_cursor;
+                if (!nextCursor) observer.disconnect();
+            })
+            .catch(error => console.error("Error loading more bookings:", error))
+            .finally(() => { loading = false; });
+    }
+
+    const observer = new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) loadNextPage();
+    });
+    if (nextCursor) observer.observe(upcomingSentinel);
+}
+
+// --- CALENDAR: LIVE UPDATES ---
+// The server pushes "room X changed on these days" over Server-Sent Events; only those
+// cells are re-rendered. Without an ASGI server the stream answers 204 and nothing happens.
+const bookingCalendar = document.getElementById('booking-calendar');
+if (bookingCalendar && 'EventSource' in window) {
+    // Day (YYYY-MM-DD) -> column index, from the header row
+    const columns = {};
+    bookingCalendar.querySelectorAll('thead th[data-day]').forEach(th => {
+        columns[th.dataset.day] = th.cellIndex;
+    });
+
+    function refreshRow(roomId, days) {
+        const row = bookingCalendar.querySelector(`tbody tr[data-room="${roomId}"]`);
+        if (!row) return;
+        // Nothing to do if none of the changed days is on screen
+        if (days && !days.some(day => day in columns)) return;
+
+        const params = new URLSearchParams({ week: bookingCalendar.dataset.week, room: roomId });
+        fetch(`${bookingCalendar.dataset.rowUrl}?${params}`)
+            .then(response => response.json())
+            .then(data => {
+                Object.entries(data.cells).forEach(([day, html]) => {
+                    const cell = row.cells[columns[day]];
+                    // Only touch cells whose content actually changed
+                    if (cell && cell.innerHTML !== html) {
+                        cell.innerHTML = html;
+                        cell.classList.add('just-updated');
+                        setTimeout(() => cell.classList.remove('just-updated'), 1500);
+                    }
+                });
+            })
+            .catch(error => console.error("Error refreshing calendar row:", error));
+    }
+
+    function refreshAllRows() {
+        bookingCalendar.querySelectorAll('tbody tr[data-room]').forEach(row => refreshRow(row.dataset.room, null));
+    }
+
+    const calendarEvents = new EventSource(bookingCalendar.dataset.eventsUrl);
+    let calendarStreamLost = false;
+    calendarEvents.addEventListener('bookings', event => {
+        const change = JSON.parse(event.data);
+        refreshRow(change.room_id, change.days);
+    });
+    // We fell too far behind, or reconnected after missing events: reload every row
+    calendarEvents.addEventListener('resync', refreshAllRows);
+    calendarEvents.addEventListener('error', () => { calendarStreamLost = true; });
+    calendarEvents.addEventListener('open', () => {
+        if (calendarStreamLost) refreshAllRows();
+        calendarStreamLost = false;
+    });
+}
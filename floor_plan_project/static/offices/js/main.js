@@ -57,105 +57,230 @@ document.addEventListener('DOMContentLoaded', () => {
         const modalCloseButton = document.getElementById('modal-close-button');
         const loadingIndicator = document.getElementById('loading-indicator');
 
-        fetch('/floor-plan/api/offices/')
-            .then(response => response.json())
-            .then(offices => {
-                if (loadingIndicator) loadingIndicator.style.display = 'none';
+        const floorSelect = document.getElementById('floor-select');
+        const statusLayer = document.getElementById('floor-status-layer');
+        // Office details by number (for tooltips and the tenant modal); shapes come per floor
+        const officeData = {};
+        let currentFloor = null;
+        let loadedBoxes = [];  // viewport boxes of the current floor already fetched
 
-                // Your single source of truth for the office layout.
-                const officePositions = {
-                    '1': { top: '468px', left: '714px', width: '64px', height: '50px' },
-                    '2': { top: '546px', left: '737px', width: '64px', height: '50px' },
-                    '3': { top: '627px', left: '737px', width: '64px', height: '50px' },
-                    '4': { top: '490px', left: '625px', width: '41px', height: '61px' },
-                    '5': { top: '581px', left: '625px', width: '41px', height: '61px' },
-                    '6': { top: '490px', left: '574px', width: '41px', height: '61px' },
-                    '7': { top: '581px', left: '533px', width: '41px', height: '61px' },
-                    '8': { top: '500px', left: '533px', width: '31px', height: '51px' },
-                    '9': { top: '445px', left: '533px', width: '31px', height: '51px' },
-                    '10': { top: '389px', left: '533px', width: '31px', height: '51px' },
-                    '11': { top: '354px', left: '533px', width: '31px', height: '31px' },
-                    '12': { top: '430px', left: '574px', width: '41px', height: '56px' },
-                    '13': { top: '430px', left: '625px', width: '41px', height: '56px' },
-                    '14': { top: '400px', left: '714px', width: '51px', height: '35px' },
-                    '15': { top: '344px', left: '625px', width: '71px', height: '51px' },
-                    '16': { top: '288px', left: '625px', width: '71px', height: '51px' },
-                    '17': { top: '227px', left: '625px', width: '71px', height: '51px' },
-                    '18': { top: '214px', left: '461px', width: '46px', height: '51px' },
-                    '19': { top: '159px', left: '461px', width: '46px', height: '51px' },
-                    '20': { top: '149px', left: '553px', width: '46px', height: '51px' },
-                    '21': { top: '76px', left: '461px', width: '46px', height: '46px' },
-                    '22': { top: '159px', left: '409px', width: '46px', height: '51px' },
-                    '23': { top: '214px', left: '409px', width: '46px', height: '51px' },
-                    '24': { top: '214px', left: '358px', width: '46px', height: '51px' },
-                    '25': { top: '159px', left: '358px', width: '46px', height: '51px' },
-                    '26': { top: '76px', left: '358px', width: '46px', height: '46px' },
-                    '27': { top: '159px', left: '307px', width: '46px', height: '51px' },
-                    '28': { top: '76px', left: '302px', width: '46px', height: '46px' },
-                    '29': { top: '214px', left: '307px', width: '46px', height: '51px' },
-                    '30': { top: '270px', left: '307px', width: '46px', height: '46px' },
-                    '31': { top: '272px', left: '236px', width: '46px', height: '46px' },
-                    '32': { top: '323px', left: '236px', width: '46px', height: '46px' },
-                    '33': { top: '374px', left: '236px', width: '46px', height: '46px' },
-                    '34': { top: '373px', left: '307px', width: '46px', height: '46px' },
-                    '35': { top: '425px', left: '307px', width: '46px', height: '46px' },
-                    '36': { top: '374px', left: '184px', width: '46px', height: '46px' },
-                    '37': { top: '476px', left: '307px', width: '46px', height: '46px' },
-                    '38': { top: '425px', left: '184px', width: '46px', height: '46px' },
-                    '39': { top: '527px', left: '307px', width: '46px', height: '46px' },
-                    '41': { top: '577px', left: '307px', width: '46px', height: '46px' },
-                    '44': { top: '582px', left: '82px', width: '46px', height: '46px' },
-                    '46': { top: '527px', left: '82px', width: '46px', height: '46px' },
-                    '47': { top: '527px', left: '133px', width: '46px', height: '46px' },
-                    '48': { top: '470px', left: '82px', width: '46px', height: '46px' },
-                    '49': { top: '470px', left: '133px', width: '46px', height: '46px' },
-                    '50': { top: '323px', left: '184px', width: '46px', height: '46px' },
-                    '51': { top: '415px', left: '82px', width: '46px', height: '46px' },
-                    '52': { top: '272px', left: '184px', width: '46px', height: '46px' },
-                    '53': { top: '360px', left: '82px', width: '46px', height: '46px' },
-                    '54': { top: '272px', left: '82px', width: '46px', height: '46px' },
-                    '55': { top: '217px', left: '82px', width: '46px', height: '46px' },
-                    '56': { top: '126px', left: '82px', width: '46px', height: '46px' },
-                    '57': { top: '76px', left: '159px', width: '46px', height: '46px' },
-                    '58': { top: '76px', left: '210px', width: '46px', height: '46px' },
-                    '60': { top: '678px', left: '466px', width: '46px', height: '46px' },
-                    '61': { top: '729px', left: '307px', width: '46px', height: '46px' },
-                    '62': { top: '729px', left: '364px', width: '46px', height: '46px' },
-                    '63': { top: '785px', left: '307px', width: '46px', height: '46px' },
-                    '64': { top: '729px', left: '415px', width: '46px', height: '46px' },
-                    '67': { top: '785px', left: '645px', width: '46px', height: '46px' },
-                    '68': { top: '785px', left: '589px', width: '46px', height: '46px' },
-                    '69': { top: '785px', left: '533px', width: '46px', height: '46px' }
-                };
-
-                offices.forEach(office => {
-                    const position = officePositions[office.office_number];
-                    if (!position) return;
-
-                    const officeDiv = document.createElement('div');
-                    officeDiv.id = `office-${office.office_number}`;
-                    officeDiv.className = `office ${office.status}`;
-                    officeDiv.textContent = office.office_number;
-                    Object.assign(officeDiv.style, position);
-
-                    officeDiv.dataset.sqft = office.size_sqft;
-                    officeDiv.dataset.rent = office.annual_rent;
-                    officeDiv.dataset.expiry = office.expiry_date;
-                    officeDiv.dataset.company = office.company_name;
-                    officeDiv.dataset.person = office.contact_person;
-                    officeDiv.dataset.email = office.contact_email;
-                    officeDiv.dataset.phone = office.contact_phone;
-
-                    floorPlan.appendChild(officeDiv);
-                });
+        Promise.all([loadOffices(), fetch('/floor-plan/api/floors/').then(response => response.json())])
+            .then(([offices, floors]) => {
+                if (loadingIndicator) loadingIndicator.style.display = 'none';
+                offices.forEach(office => { officeData[office.office_number] = office; });
+                if (!floors.length) return;
 
+                if (floorSelect && floors.length > 1) {
+                    floors.forEach(floor => floorSelect.add(new Option(`${floor.building} - ${floor.name}`, floor.id)));
+                    floorSelect.hidden = false;
+                    floorSelect.addEventListener('change', () => {
+                        showFloor(floors.find(floor => String(floor.id) === floorSelect.value));
+                    });
+                }
+                showFloor(floors[0]);
 
+                subscribeToOfficeUpdates();
+                // Fallback for when live updates aren't available: a delta every minute is a few bytes
+                setInterval(syncOffices, 60000);
             })
             .catch(error => {
                 console.error("Error fetching office data:", error);
                 if (loadingIndicator) loadingIndicator.textContent = 'Error: Could not load office data.';
             });
 
+        // --- FLOORS AND VIEWPORT LOADING ---
+        // Office shapes are in floor units (plan image pixels) and are placed in percent,
+        // so they stay on the plan at any width. Only the offices in (or near) the visible
+        // part of the plan are fetched; scrolling loads the rest as it comes into view.
+        function showFloor(floor) {
+            currentFloor = floor;
+            loadedBoxes = [];
+            floorPlan.querySelectorAll('.office').forEach(officeDiv => officeDiv.remove());
+            floorPlan.style.maxWidth = `${floor.width}px`;
+            floorPlan.style.aspectRatio = `${floor.width} / ${floor.height}`;
+            if (floor.plan_url) floorPlan.style.backgroundImage = `url('${floor.plan_url}')`;
+            if (statusLayer && !statusLayer.src.includes(`/floors/${floor.id}/`)) {
+                // Another floor: show its status layer until its offices are drawn
+                // (the unversioned URL redirects to the current version)
+                statusLayer.src = `/floor-plan/floors/${floor.id}/status.svg`;
+                statusLayer.hidden = false;
+            }
+            loadVisibleOffices();
+        }
+
+        function visibleBox() {
+            const rect = floorPlan.getBoundingClientRect();
+            const scale = currentFloor.width / rect.width;
+            // Half a screen of margin, so short scrolls don't need a request
+            const marginX = window.innerWidth / 2, marginY = window.innerHeight / 2;
+            return [
+                Math.max(0, -rect.left - marginX) * scale,
+                Math.max(0, -rect.top - marginY) * scale,
+                Math.min(rect.width, window.innerWidth - rect.left + marginX) * scale,
+                Math.min(rect.height, window.innerHeight - rect.top + marginY) * scale,
+            ].map(Math.round);
+        }
+
+        function loadVisibleOffices() {
+            if (!currentFloor) return;
+            const floor = currentFloor;
+            const box = visibleBox();
+            if (box[2] <= box[0] || box[3] <= box[1]) return;  // plan is off screen
+            const covered = loadedBoxes.some(loaded =>
+                loaded[0] <= box[0] && loaded[1] <= box[1] && loaded[2] >= box[2] && loaded[3] >= box[3]);
+            if (covered) return;
+            loadedBoxes.push(box);
+
+            fetch(`/floor-plan/api/floors/${floor.id}/offices/?bbox=${box.join(',')}`)
+                .then(response => response.json())
+                .then(data => {
+                    if (floor !== currentFloor) return;  // switched floors meanwhile
+                    data.offices.forEach(values => {
+                        const shape = {};
+                        data.fields.forEach((field, i) => { shape[field] = values[i]; });
+                        drawOffice(floor, shape);
+                    });
+                    // The office boxes carry the (live) colours from here on
+                    if (statusLayer) statusLayer.hidden = true;
+                })
+                .catch(error => console.error("Error fetching floor offices:", error));
+        }
+
+        function drawOffice(floor, shape) {
+            if (document.getElementById(`office-${shape.office_number}`)) return;
+            const officeDiv = document.createElement('div');
+            officeDiv.id = `office-${shape.office_number}`;
+            officeDiv.textContent = shape.office_number;
+            Object.assign(officeDiv.style, {
+                left: `${shape.x / floor.width * 100}%`,
+                top: `${shape.y / floor.height * 100}%`,
+                width: `${shape.width / floor.width * 100}%`,
+                height: `${shape.height / floor.height * 100}%`,
+            });
+            if (shape.polygon) {
+                // Polygon points relative to the shape's bounding box
+                const points = shape.polygon.map(([x, y]) =>
+                    `${(x - shape.x) / shape.width * 100}% ${(y - shape.y) / shape.height * 100}%`);
+                officeDiv.style.clipPath = `polygon(${points.join(', ')})`;
+            }
+            applyOfficeData(officeDiv, officeData[shape.office_number] || shape);
+            floorPlan.appendChild(officeDiv);
+        }
+
+        let viewportTimer = null;
+        function scheduleViewportLoad() {
+            clearTimeout(viewportTimer);
+            viewportTimer = setTimeout(loadVisibleOffices, 150);
+        }
+        window.addEventListener('scroll', scheduleViewportLoad, { passive: true });
+        window.addEventListener('resize', scheduleViewportLoad);
+
+        // Status colour and tooltip/modal details of one office box
+        function applyOfficeData(officeDiv, office) {
+            officeDiv.className = `office ${office.status}`;
+            officeDiv.dataset.sqft = office.size_sqft;
+            officeDiv.dataset.rent = office.annual_rent;
+            officeDiv.dataset.expiry = office.expiry_date;
+            officeDiv.dataset.company = office.company_name;
+            officeDiv.dataset.person = office.contact_person;
+            officeDiv.dataset.email = office.contact_email;
+            officeDiv.dataset.phone = office.contact_phone;
+        }
+
+        function updateOffice(office) {
+            officeData[office.office_number] = office;
+            const officeDiv = document.getElementById(`office-${office.office_number}`);
+            if (officeDiv) applyOfficeData(officeDiv, office);
+        }
+
+        // --- LOCAL COPY OF THE OFFICE DATA ---
+        // Kept for the browser session as {version, offices}. A repeat load only asks for
+        // what changed since that version (usually nothing) instead of the whole building.
+        const OFFICES_STORAGE_KEY = 'floorPlan.offices';
+
+        function readStoredOffices() {
+            try {
+                return JSON.parse(sessionStorage.getItem(OFFICES_STORAGE_KEY));
+            } catch (error) {
+                return null;
+            }
+        }
+
+        function storeOffices(version, officesByNumber) {
+            try {
+                sessionStorage.setItem(OFFICES_STORAGE_KEY, JSON.stringify({ version: version, offices: officesByNumber }));
+            } catch (error) {
+                // Storage full or disabled: we just fetch everything next time
+            }
+        }
+
+        function fetchAllOffices() {
+            return fetch('/floor-plan/api/offices/').then(response => {
+                const version = Number(response.headers.get('X-Offices-Version'));
+                return response.json().then(offices => {
+                    const officesByNumber = {};
+                    offices.forEach(office => { officesByNumber[office.office_number] = office; });
+                    storeOffices(version, officesByNumber);
+                    return officesByNumber;
+                });
+            });
+        }
+
+        // Applies the changes since our version to the local copy; returns [copy, changed offices]
+        function fetchOfficeChanges(stored) {
+            return fetch(`/floor-plan/api/offices/changes/?since=${stored.version}`)
+                .then(response => response.json())
+                .then(delta => {
+                    const officesByNumber = delta.full ? {} : stored.offices;
+                    delta.offices.forEach(office => { officesByNumber[office.office_number] = office; });
+                    storeOffices(delta.version, officesByNumber);
+                    return [officesByNumber, delta.offices];
+                });
+        }
+
+        function loadOffices() {
+            const stored = readStoredOffices();
+            const officesByNumber = stored
+                ? fetchOfficeChanges(stored).then(([offices]) => offices)
+                : fetchAllOffices();
+            return officesByNumber.then(offices => Object.values(offices));
+        }
+
+        function syncOffices() {
+            const stored = readStoredOffices();
+            if (!stored) return;
+            fetchOfficeChanges(stored)
+                .then(([, changed]) => changed.forEach(updateOffice))
+                .catch(error => console.error("Error syncing office data:", error));
+        }
+
+        // --- LIVE UPDATES ---
+        // Each saved Office arrives as one event and only its box is repainted.
+        // Without an ASGI server the stream answers 204 and the plan stays as loaded.
+        function subscribeToOfficeUpdates() {
+            if (!('EventSource' in window)) return;
+            const events = new EventSource('/events/?channels=offices');
+            let streamLost = false;
+            events.addEventListener('offices', event => {
+                const office = JSON.parse(event.data);
+                updateOffice(office);
+                // Refresh the local copy too, but keep its version: a delta on the next load
+                // still picks up anything this page missed
+                const stored = readStoredOffices();
+                if (stored) {
+                    stored.offices[office.office_number] = office;
+                    storeOffices(stored.version, stored.offices);
+                }
+            });
+            // Fell behind, or reconnected after missing events: catch up with a delta
+            events.addEventListener('resync', syncOffices);
+            events.addEventListener('error', () => { streamLost = true; });
+            events.addEventListener('open', () => {
+                if (streamLost) syncOffices();
+                streamLost = false;
+            });
+        }
+
         floorPlan.addEventListener('mouseover', (event) => {
             const office = event.target;
             if (office.classList.contains('office')) {